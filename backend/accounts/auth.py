@@ -2,12 +2,17 @@
 Custom authentication backend for Supabase JWT tokens.
 This module provides authentication classes for verifying Supabase JWT tokens.
 """
-import os
+import logging
+import httpx
 import jwt
 import requests
 from django.contrib.auth.models import User
 from django.contrib.auth.backends import BaseBackend
-from django.conf import settings
+
+from core.supabase_jwt import verify_supabase_token
+from .supabase_users import resolve_supabase_user
+
+logger = logging.getLogger(__name__)
 
 class SupabaseAuthBackend(BaseBackend):
     """
@@ -29,35 +34,8 @@ class SupabaseAuthBackend(BaseBackend):
             return None
         
         try:
-            # Fetch Supabase JWT verification key (JWKS) if not cached
-            jwks_url = f"{settings.SUPABASE_URL}/auth/v1/jwks"
-            jwks_response = requests.get(jwks_url)
-            jwks = jwks_response.json()
-            
-            # Get the JWT header
-            header = jwt.get_unverified_header(token)
-            
-            # Find the key that matches the kid in the header
-            key = None
-            for jwk in jwks['keys']:
-                if jwk['kid'] == header['kid']:
-                    key = jwk
-                    break
-            
-            if key is None:
-                return None
-            
-            # Convert the JWK to a public key
-            public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
-            
-            # Verify and decode the token
-            payload = jwt.decode(
-                token,
-                public_key,
-                algorithms=['RS256'],
-                audience='authenticated',
-                options={'verify_exp': True}
-            )
+            # Verify and decode the token (served from the verified-token cache when possible)
+            payload = verify_supabase_token(token)
             
             # Get the user ID from the payload
             user_id = payload.get('sub')
@@ -65,24 +43,17 @@ class SupabaseAuthBackend(BaseBackend):
             if not user_id:
                 return None
             
-            # Get or create a Django user based on the Supabase user
-            user_email = payload.get('email', f"{user_id}@example.com")
-            
-            try:
-                user = User.objects.get(username=user_id)
-            except User.DoesNotExist:
-                # Create a new user
-                user = User.objects.create_user(
-                    username=user_id,
-                    email=user_email,
-                    password=None  # No password for Supabase users
-                )
-                user.save()
+            # Get or create a Django user based on the Supabase user (cached per user ID)
+            user = resolve_supabase_user(user_id, payload.get('email'))
             
             return user
             
-        except (jwt.PyJWTError, requests.RequestException) as e:
-            print(f"Authentication error: {str(e)}")
+        except (jwt.PyJWTError, requests.RequestException, httpx.HTTPError) as e:
+            logger.info(f"Supabase token rejected: {str(e)}")
+            return None
+        except ValueError as e:
+            # A malformed SUPABASE_JWT_SECRET/SUPABASE_JWT_PUBLIC_KEY fails every login
+            logger.error(f"Supabase token verification is misconfigured: {str(e)}")
             return None
     
     def get_user(self, user_id):
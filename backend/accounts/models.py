@@ -1,7 +1,11 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .supabase_users import invalidate_supabase_user
+from .token_cache import invalidate_token
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -20,3 +24,33 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_supabase_user(sender, instance, **kwargs):
+    invalidate_supabase_user(instance.username)
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+def _token_state(user):
+    # The user fields cached tokens must not outlive; deferred fields are
+    # read from __dict__ so this never triggers a query
+    return (user.__dict__.get('is_active'), user.__dict__.get('password'))
+
+@receiver(post_init, sender=User)
+def remember_token_state(sender, instance, **kwargs):
+    instance._token_state = _token_state(instance)
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    # Cached tokens carry a copy of the user, so drop them when it is
+    # deactivated or its password changes, not on every save (e.g. last_login)
+    state = _token_state(instance)
+    changed = state != instance._token_state
+    instance._token_state = state
+    if not created and changed:
+        for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+            invalidate_token(key)
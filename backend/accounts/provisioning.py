@@ -0,0 +1,236 @@
+"""
+Bulk pre-provisioning of Django users from Supabase Auth.
+
+Pages through Supabase users with the admin API and creates the missing
+Django ``User`` and ``UserProfile`` rows in bulk, so users don't have to be
+created one by one on their first authenticated request.
+"""
+import os
+import json
+import time
+import logging
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import UserProfile
+from .supabase_users import placeholder_email
+
+logger = logging.getLogger(__name__)
+
+# Users requested from the Supabase admin API per page
+DEFAULT_PAGE_SIZE = 1000
+# Rows per bulk_create statement
+DEFAULT_CHUNK_SIZE = 500
+
+
+class SupabaseUserProvisioner:
+    """
+    Create Django users and profiles for every Supabase Auth user.
+
+    ``bulk_create`` bypasses the ``post_save`` profile signals, so profiles are
+    bulk-created explicitly.
+
+    The admin API lists users newest first, so new sign-ups land on page 1
+    and push older users to later pages. Progress is written to an optional
+    checkpoint file after each page commits. An interrupted walk resumes at
+    its next page (sign-ups since only shift users already seen onto it).
+    A complete walk records the ``created_at`` of the newest user it saw as
+    a watermark, and the next walk starts again at page 1 and stops at the
+    first page reaching users at or before the watermark.
+    """
+
+    def __init__(self, client=None, page_size=DEFAULT_PAGE_SIZE,
+                 chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None):
+        """
+        Initialize the provisioner.
+
+        Args:
+            client: SupabaseClient used to list users (defaults to the shared instance)
+            page_size: Users fetched from Supabase per page
+            chunk_size: Rows per bulk_create statement
+            checkpoint_path: Optional JSON file recording walk progress and the watermark
+        """
+        if client is None:
+            from core.supabase_utils import supabase as client
+        self.client = client
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.checkpoint_path = checkpoint_path
+
+    def load_checkpoint(self):
+        """
+        Read the checkpoint file.
+
+        Returns:
+            The checkpoint dictionary, or an empty one if there is none
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, checkpoint):
+        """Atomically replace the checkpoint file."""
+        if not self.checkpoint_path:
+            return
+        checkpoint = {**checkpoint, 'updated_at': timezone.now().isoformat()}
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def provision_page(self, supabase_users):
+        """
+        Create missing Django users and profiles for one page of Supabase users.
+
+        Args:
+            supabase_users: List of Supabase user dictionaries
+
+        Returns:
+            Tuple of (users created, profiles created)
+        """
+        by_id = {str(u['id']): u for u in supabase_users if u.get('id')}
+        if not by_id:
+            return 0, 0
+
+        with transaction.atomic():
+            existing = set(
+                User.objects.filter(username__in=list(by_id)).values_list('username', flat=True)
+            )
+
+            # One unusable password hash is enough; it never validates. Its
+            # random salt also marks the rows this call inserted, since
+            # ignore_conflicts doesn't report which rows were skipped
+            unusable_password = make_password(None)
+            new_users = []
+            for user_id, supabase_user in by_id.items():
+                if user_id in existing:
+                    continue
+                created_at = _parse_created_at(supabase_user.get('created_at'))
+                new_users.append(User(
+                    username=user_id,
+                    email=supabase_user.get('email') or placeholder_email(user_id),
+                    password=unusable_password,
+                    date_joined=created_at or timezone.now(),
+                ))
+
+            User.objects.bulk_create(new_users, batch_size=self.chunk_size, ignore_conflicts=True)
+            created_users = 0
+            if new_users:
+                # Users created concurrently, e.g. by a first request, were skipped
+                created_users = User.objects.filter(
+                    username__in=[user.username for user in new_users], password=unusable_password
+                ).count()
+
+            # Profiles for any user on this page that still lacks one
+            missing_profiles = User.objects.filter(
+                username__in=list(by_id), profile__isnull=True
+            ).values_list('pk', flat=True)
+            profiles = [UserProfile(user_id=pk) for pk in missing_profiles]
+            UserProfile.objects.bulk_create(profiles, batch_size=self.chunk_size, ignore_conflicts=True)
+
+        return created_users, len(profiles)
+
+    def run(self, start_page=None, max_pages=None, resume=True, progress=None):
+        """
+        Provision users page by page until the walk is complete.
+
+        A walk is complete on a short page, or on a page reaching users at or
+        before the watermark of the previous complete walk.
+
+        Args:
+            start_page: 1-based page to start from (overrides the checkpoint)
+            max_pages: Stop after this many pages
+            resume: Continue an interrupted walk and stop at the checkpoint's watermark
+            progress: Optional callable receiving the running stats after each page
+
+        Returns:
+            Dictionary of totals and throughput
+        """
+        checkpoint = self.load_checkpoint() if resume else {}
+        synced_until = _parse_created_at(checkpoint.get('synced_until'))
+        resuming = start_page is None and 'next_page' in checkpoint
+        if not resuming:
+            checkpoint = {'synced_until': checkpoint.get('synced_until')}
+        page = start_page or checkpoint.get('next_page', 1)
+        # Newest user when the walk started; only known if it started at page 1
+        walk_newest = checkpoint.get('walk_newest')
+
+        stats = {
+            'start_page': page,
+            'pages': 0,
+            'scanned': checkpoint.get('scanned', 0),
+            'created_users': checkpoint.get('created_users', 0),
+            'created_profiles': checkpoint.get('created_profiles', 0),
+            'complete': False,
+        }
+        run_scanned = 0
+        run_created = 0
+        started = time.monotonic()
+
+        while max_pages is None or stats['pages'] < max_pages:
+            supabase_users = self.client.list_users(page=page, per_page=self.page_size)
+            created = [_parse_created_at(user.get('created_at')) for user in supabase_users]
+            created = [created_at for created_at in created if created_at is not None]
+            if page == 1 and created:
+                walk_newest = max(created).isoformat()
+
+            created_users, created_profiles = self.provision_page(supabase_users)
+
+            stats['pages'] += 1
+            stats['last_page'] = page
+            stats['scanned'] += len(supabase_users)
+            stats['created_users'] += created_users
+            stats['created_profiles'] += created_profiles
+            run_scanned += len(supabase_users)
+            run_created += created_users
+
+            elapsed = time.monotonic() - started
+            stats['elapsed_seconds'] = elapsed
+            stats['users_per_second'] = run_scanned / elapsed if elapsed else 0.0
+            stats['created_per_second'] = run_created / elapsed if elapsed else 0.0
+
+            reached_watermark = synced_until is not None and any(
+                created_at <= synced_until for created_at in created
+            )
+            stats['complete'] = len(supabase_users) < self.page_size or reached_watermark
+
+            totals = {key: stats[key] for key in ('scanned', 'created_users', 'created_profiles')}
+            if stats['complete']:
+                # The next walk starts at page 1 again and stops at this walk's newest user
+                next_checkpoint = {'synced_until': walk_newest or checkpoint.get('synced_until'), **totals}
+            else:
+                next_checkpoint = {
+                    'next_page': page + 1,
+                    'walk_newest': walk_newest,
+                    'synced_until': checkpoint.get('synced_until'),
+                    **totals,
+                }
+            # Only record the page once its rows are committed, in case the
+            # run is wrapped in an outer transaction
+            transaction.on_commit(
+                lambda next_checkpoint=next_checkpoint: self.save_checkpoint(next_checkpoint)
+            )
+            logger.info(
+                f"Provisioned page {page}: {len(supabase_users)} scanned, "
+                f"{created_users} users and {created_profiles} profiles created"
+            )
+            if progress:
+                progress(stats)
+
+            if stats['complete']:
+                break
+            page += 1
+
+        stats['elapsed_seconds'] = time.monotonic() - started
+        return stats
+
+
+def _parse_created_at(value):
+    """Parse a Supabase ``created_at`` into an aware datetime, or None."""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    return value
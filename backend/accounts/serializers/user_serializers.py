@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from accounts.models import UserProfile
+from accounts.supabase_profiles import ProfileLoader, get_profile_loader
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,6 +18,58 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile']
         read_only_fields = ['id']
 
+class SupabaseProfileField(serializers.Field):
+    """
+    Read-only field with the user's row from the Supabase ``profiles`` table.
+
+    Profiles come from the request's batch loader. When the field is used on
+    a list, the IDs of the whole list are queued on first access, so listing
+    N users costs one query per batch of profiles instead of N queries.
+    """
+
+    def __init__(self, id_attr='username', **kwargs):
+        # The Supabase user ID is stored as the Django username
+        self.id_attr = id_attr
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def _loader(self):
+        loader = self.context.get('profile_loader')
+        if loader is not None:
+            return loader
+        request = self.context.get('request')
+        if request is not None:
+            return get_profile_loader(request)
+        root = self.root
+        if not hasattr(root, '_profile_loader'):
+            root._profile_loader = ProfileLoader()
+        return root._profile_loader
+
+    def _queue_list(self, loader):
+        # The list being serialized, when this field's serializer is its child
+        parent_list = self.parent.parent if self.parent is not None else None
+        if not isinstance(parent_list, serializers.ListSerializer) or parent_list.instance is None:
+            return
+        if getattr(parent_list, '_profiles_queued', False):
+            return
+        parent_list._profiles_queued = True
+        loader.want(getattr(user, self.id_attr) for user in parent_list.instance)
+
+    def to_representation(self, user):
+        loader = self._loader()
+        self._queue_list(loader)
+        return loader.load(getattr(user, self.id_attr))
+
+
+class SupabaseUserSerializer(UserSerializer):
+    """User with their Supabase profile, batch-loaded when serializing lists."""
+    supabase_profile = SupabaseProfileField()
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ['supabase_profile']
+
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
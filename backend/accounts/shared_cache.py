@@ -0,0 +1,15 @@
+"""
+Checks on Django's default cache for caches that rely on invalidation.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared():
+    """
+    Return True if the default cache is shared between worker processes.
+
+    A ``LocMemCache`` lives in one process, so deleting a key there leaves
+    the other workers serving their copy until it expires.
+    """
+    return not isinstance(caches['default'], LocMemCache)
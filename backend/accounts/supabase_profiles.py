@@ -0,0 +1,254 @@
+"""
+Batched loading of Supabase ``profiles`` rows.
+
+Profile IDs requested while serializing a page of users are collected and
+fetched with one ``id=in.(...)`` query per chunk instead of one query per
+user. Loaded profiles (and misses) are cached for the lifetime of the loader,
+which is normally one request.
+"""
+import asyncio
+from django.conf import settings
+
+# Profile IDs per ``in.(...)`` query; keeps the URL well under proxy limits
+DEFAULT_PROFILE_BATCH_SIZE = 100
+
+REQUEST_ATTRIBUTE = '_supabase_profile_loader'
+
+
+def _batch_size():
+    return getattr(settings, 'SUPABASE_PROFILE_BATCH_SIZE', DEFAULT_PROFILE_BATCH_SIZE)
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _columns_with_key(columns, key):
+    if columns and columns != "*" and key not in [c.strip() for c in columns.split(",")]:
+        return f"{columns},{key}"
+    return columns
+
+
+class ProfileLoader:
+    """
+    Request-scoped batch loader for Supabase profiles.
+
+    Call ``want()`` with every ID a page will need (serializers do this for
+    the whole list), then ``load()`` each one; the first ``load()`` fetches
+    all wanted IDs in chunks. Profiles that don't exist are cached as None.
+    """
+
+    def __init__(self, client=None, batch_size=None, columns="*", table="profiles", key="id"):
+        """
+        Initialize the loader.
+
+        Args:
+            client: DirectSupabaseClient to query (defaults to the shared instance)
+            batch_size: IDs per ``in.(...)`` query (default SUPABASE_PROFILE_BATCH_SIZE)
+            columns: Profile columns to fetch; the key column is always included
+            table: Table holding the profiles
+            key: Column the IDs refer to
+        """
+        if client is None:
+            from core.direct_supabase import supabase as client
+        self.client = client
+        self.batch_size = batch_size or _batch_size()
+        self.columns = _columns_with_key(columns, key)
+        self.table = table
+        self.key = key
+        self._profiles = {}
+        self._pending = []
+        self._pending_set = set()
+
+        self.queries = 0
+        self.hits = 0
+
+    def want(self, ids):
+        """
+        Queue IDs to be fetched with the next batch.
+
+        Args:
+            ids: Iterable of profile IDs (Supabase user IDs)
+        """
+        for profile_id in ids:
+            profile_id = str(profile_id)
+            if profile_id not in self._profiles and profile_id not in self._pending_set:
+                self._pending.append(profile_id)
+                self._pending_set.add(profile_id)
+
+    def dispatch(self):
+        """Fetch every queued ID, one query per chunk."""
+        pending = self._pending
+        self._pending = []
+        self._pending_set = set()
+
+        for chunk in _chunks(pending, self.batch_size):
+            rows = (self.client.query(self.table)
+                    .select(self.columns)
+                    .in_(self.key, chunk)
+                    .execute()
+                    .data)
+            self.queries += 1
+            for profile_id in chunk:
+                self._profiles[profile_id] = None
+            for row in rows or []:
+                self._profiles[str(row[self.key])] = row
+
+    def load(self, profile_id):
+        """
+        Get one profile, fetching it together with everything queued.
+
+        Args:
+            profile_id: The profile ID (Supabase user ID)
+
+        Returns:
+            The profile dictionary, or None if there is none
+        """
+        profile_id = str(profile_id)
+        if profile_id in self._profiles:
+            self.hits += 1
+            return self._profiles[profile_id]
+        self.want([profile_id])
+        self.dispatch()
+        return self._profiles.get(profile_id)
+
+    def load_many(self, ids):
+        """
+        Get several profiles in as few queries as possible.
+
+        Args:
+            ids: Iterable of profile IDs
+
+        Returns:
+            Dictionary mapping each ID to its profile or None
+        """
+        ids = [str(profile_id) for profile_id in ids]
+        self.want(ids)
+        if self._pending:
+            self.dispatch()
+        return {profile_id: self._profiles.get(profile_id) for profile_id in ids}
+
+    def stats(self):
+        return {
+            'cached': len(self._profiles),
+            'queries': self.queries,
+            'hits': self.hits,
+        }
+
+
+class AsyncProfileLoader:
+    """
+    Asyncio batch loader for Supabase profiles.
+
+    Every ``load()`` awaited in the same event loop tick (e.g. under
+    ``asyncio.gather``) is collected into one batch, and the batch's chunks
+    are fetched concurrently.
+    """
+
+    def __init__(self, client=None, batch_size=None, columns="*", table="profiles", key="id"):
+        """
+        Initialize the loader.
+
+        Args:
+            client: AsyncDirectSupabaseClient to query (defaults to the one for the running loop)
+            batch_size: IDs per ``in.(...)`` query (default SUPABASE_PROFILE_BATCH_SIZE)
+            columns: Profile columns to fetch; the key column is always included
+            table: Table holding the profiles
+            key: Column the IDs refer to
+        """
+        self._client = client
+        self.batch_size = batch_size or _batch_size()
+        self.columns = _columns_with_key(columns, key)
+        self.table = table
+        self.key = key
+        self._futures = {}
+        self._pending = []
+        self._scheduled = False
+
+        self.queries = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from core.async_supabase import get_async_supabase
+            self._client = get_async_supabase()
+        return self._client
+
+    async def _fetch(self, chunk):
+        try:
+            rows = (await (self.client.query(self.table)
+                           .select(self.columns)
+                           .in_(self.key, chunk)
+                           .execute())).data
+        except Exception as e:
+            for profile_id in chunk:
+                future = self._futures.pop(profile_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.queries += 1
+        by_id = {str(row[self.key]): row for row in rows or []}
+        for profile_id in chunk:
+            future = self._futures[profile_id]
+            if not future.done():
+                future.set_result(by_id.get(profile_id))
+
+    async def _dispatch(self):
+        pending = self._pending
+        self._pending = []
+        self._scheduled = False
+        await asyncio.gather(*(self._fetch(chunk) for chunk in _chunks(pending, self.batch_size)))
+
+    async def load(self, profile_id):
+        """
+        Get one profile; loads awaited in the same tick share a batch.
+
+        Args:
+            profile_id: The profile ID (Supabase user ID)
+
+        Returns:
+            The profile dictionary, or None if there is none
+        """
+        profile_id = str(profile_id)
+        future = self._futures.get(profile_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[profile_id] = loop.create_future()
+            self._pending.append(profile_id)
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return await asyncio.shield(future)
+
+    async def load_many(self, ids):
+        """
+        Get several profiles in as few queries as possible.
+
+        Args:
+            ids: Iterable of profile IDs
+
+        Returns:
+            Dictionary mapping each ID to its profile or None
+        """
+        ids = [str(profile_id) for profile_id in ids]
+        profiles = await asyncio.gather(*(self.load(profile_id) for profile_id in ids))
+        return dict(zip(ids, profiles))
+
+
+def get_profile_loader(request):
+    """
+    Get the profile loader for a request, creating it on first use.
+
+    Args:
+        request: A Django ``HttpRequest`` or DRF ``Request``
+
+    Returns:
+        The request's ProfileLoader
+    """
+    http_request = getattr(request, '_request', request)
+    loader = getattr(http_request, REQUEST_ATTRIBUTE, None)
+    if loader is None:
+        loader = ProfileLoader()
+        setattr(http_request, REQUEST_ATTRIBUTE, loader)
+    return loader
@@ -0,0 +1,133 @@
+"""
+Resolution of Supabase user IDs (the JWT ``sub`` claim) to Django users.
+
+Resolved users are cached per ``sub`` for a short TTL, so warm authenticated
+requests don't touch the database at all. Saves and deletes drop the cached
+user, which only reaches other workers through a shared cache; with a
+per-process cache the TTL is cut to a few seconds to bound how long another
+worker can serve a stale user.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .shared_cache import cache_is_shared
+
+# Seconds a resolved user stays cached
+DEFAULT_USER_CACHE_TTL = 60
+# Seconds a resolved user stays cached when the cache is per process
+DEFAULT_USER_LOCAL_CACHE_TTL = 5
+
+CACHE_KEY_PREFIX = 'supabase_user:'
+
+
+def _cache_key(user_id):
+    return f"{CACHE_KEY_PREFIX}{user_id}"
+
+
+def _cache_ttl():
+    ttl = getattr(settings, 'SUPABASE_USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL)
+    if not cache_is_shared():
+        ttl = min(ttl, getattr(settings, 'SUPABASE_USER_LOCAL_CACHE_TTL', DEFAULT_USER_LOCAL_CACHE_TTL))
+    return ttl
+
+
+def caching_enabled():
+    """Return True if resolved users are cached with the current settings."""
+    return bool(_cache_ttl())
+
+
+def placeholder_email(user_id):
+    """Return the email used for Supabase users whose token carries none."""
+    return f"{user_id}@example.com"
+
+
+def resolve_supabase_user(user_id, email=None):
+    """
+    Get or create the Django user for a Supabase user ID.
+
+    The user is served from the cache when possible. New users are created
+    with a single ``get_or_create`` (safe against concurrent first requests),
+    and a changed email is written with ``update()`` so no save signals fire.
+
+    Args:
+        user_id: The Supabase user ID (``sub`` claim), used as the Django username
+        email: The email from the token, if any
+
+    Returns:
+        The Django User instance
+    """
+    email = email or placeholder_email(user_id)
+    ttl = _cache_ttl()
+
+    user = cache.get(_cache_key(user_id)) if ttl else None
+    stale = user is None
+
+    if user is None:
+        user, created = User.objects.get_or_create(
+            username=user_id,
+            defaults={
+                'email': email,
+                'password': make_password(None),  # No password for Supabase users
+            }
+        )
+
+    # Update email only if it has actually changed
+    if user.email != email and email != placeholder_email(user_id):
+        User.objects.filter(pk=user.pk).update(email=email)
+        user.email = email
+        stale = True
+
+    if ttl and stale:
+        cache.set(_cache_key(user_id), user, ttl)
+
+    return user
+
+
+async def aresolve_supabase_user(user_id, email=None):
+    """
+    Async variant of ``resolve_supabase_user`` using the async cache and ORM APIs.
+
+    Args:
+        user_id: The Supabase user ID (``sub`` claim), used as the Django username
+        email: The email from the token, if any
+
+    Returns:
+        The Django User instance
+    """
+    email = email or placeholder_email(user_id)
+    ttl = _cache_ttl()
+
+    user = await cache.aget(_cache_key(user_id)) if ttl else None
+    stale = user is None
+
+    if user is None:
+        user, created = await User.objects.aget_or_create(
+            username=user_id,
+            defaults={
+                'email': email,
+                'password': make_password(None),  # No password for Supabase users
+            }
+        )
+
+    # Update email only if it has actually changed
+    if user.email != email and email != placeholder_email(user_id):
+        await User.objects.filter(pk=user.pk).aupdate(email=email)
+        user.email = email
+        stale = True
+
+    if ttl and stale:
+        await cache.aset(_cache_key(user_id), user, ttl)
+
+    return user
+
+
+def invalidate_supabase_user(user_id):
+    """
+    Drop a cached user so the next request reloads it from the database.
+
+    Args:
+        user_id: The Supabase user ID (Django username)
+    """
+    cache.delete(_cache_key(user_id))
@@ -1,3 +1,255 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts import token_cache
+from accounts.provisioning import SupabaseUserProvisioner
+from accounts.serializers.user_serializers import SupabaseUserSerializer
+from accounts.supabase_profiles import AsyncProfileLoader, ProfileLoader
+from accounts.supabase_users import resolve_supabase_user
+from core.testing import StandInTestMixin, shared_cache_settings, timestamp
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=shared_cache_settings(), SUPABASE_USER_CACHE_TTL=60)
+class SupabaseUserResolutionTests(TestCase):
+    """Supabase users resolved to Django users (user-003)."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_resolution_skips_the_database(self):
+        user = resolve_supabase_user('sb-user', 'one@example.com')
+
+        with self.assertNumQueries(0):
+            cached = resolve_supabase_user('sb-user', 'one@example.com')
+        self.assertEqual(cached.pk, user.pk)
+
+    def test_changed_email_is_written_through(self):
+        resolve_supabase_user('sb-user', 'one@example.com')
+        resolve_supabase_user('sb-user', 'new@example.com')
+
+        self.assertEqual(User.objects.get(username='sb-user').email, 'new@example.com')
+        self.assertEqual(resolve_supabase_user('sb-user', 'new@example.com').email, 'new@example.com')
+
+    def test_saved_user_is_reloaded(self):
+        resolve_supabase_user('sb-user', 'one@example.com')
+        User.objects.filter(username='sb-user').update(is_active=False)
+        User.objects.get(username='sb-user').save()
+
+        self.assertFalse(resolve_supabase_user('sb-user', 'one@example.com').is_active)
+
+    @override_settings(CACHES=LOCAL_CACHE, SUPABASE_USER_LOCAL_CACHE_TTL=5)
+    def test_per_process_cache_keeps_users_briefly(self):
+        resolve_supabase_user('sb-user', 'one@example.com')
+
+        with self.assertNumQueries(0):
+            resolve_supabase_user('sb-user', 'one@example.com')
+        with mock.patch('accounts.supabase_users.cache.set') as cache_set:
+            cache.clear()
+            resolve_supabase_user('sb-user', 'one@example.com')
+        self.assertEqual(cache_set.call_args.args[2], 5)
+
+
+@override_settings(CACHES=shared_cache_settings())
+class TokenCacheInvalidationTests(TestCase):
+    """Cached DRF tokens are dropped when they or their user change (user-007)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('token-user', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        token_cache.cache_token(self.token)
+
+    def test_deleting_the_token_drops_it(self):
+        key = self.token.key
+        self.token.delete()
+
+        self.assertIsNone(token_cache.get_cached_token(key))
+
+    def test_deactivating_the_user_drops_its_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(token_cache.get_cached_token(self.token.key))
+
+    def test_changing_the_password_drops_its_tokens(self):
+        self.user.set_password('changed')
+        self.user.save()
+
+        self.assertIsNone(token_cache.get_cached_token(self.token.key))
+
+    def test_other_saves_keep_tokens_without_a_token_query(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+
+        self.assertFalse([query for query in queries if 'authtoken_token' in query['sql']])
+        self.assertIsNotNone(token_cache.get_cached_token(self.token.key))
+
+    @override_settings(CACHES=LOCAL_CACHE)
+    def test_per_process_cache_is_not_used(self):
+        token_cache.cache_token(self.token)
+
+        self.assertIsNone(token_cache.get_cached_token(self.token.key))
+
+
+class FakeAdminClient:
+    """Lists Supabase users newest first, like the GoTrue admin API."""
+
+    def __init__(self, count=0):
+        self.users = []
+        self.sign_up(count)
+
+    def sign_up(self, count):
+        for _ in range(count):
+            i = len(self.users)
+            self.users.append({'id': f'sb-{i}', 'email': f'user{i}@example.com', 'created_at': timestamp(i)})
+
+    def list_users(self, page, per_page):
+        newest_first = self.users[::-1]
+        return newest_first[(page - 1) * per_page:page * per_page]
+
+
+class ProvisioningTests(TestCase):
+    """Bulk provisioning from Supabase Auth (user-008)."""
+
+    def setUp(self):
+        self.checkpoint = os.path.join(tempfile.mkdtemp(prefix='provisioning-'), 'checkpoint.json')
+
+    def run_provisioner(self, provisioner, **kwargs):
+        # The checkpoint is written on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return provisioner.run(**kwargs)
+
+    def read_checkpoint(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)
+
+    def test_creates_missing_users_and_profiles(self):
+        User.objects.create_user('sb-1')
+        provisioner = SupabaseUserProvisioner(client=FakeAdminClient(5), page_size=2)
+
+        stats = provisioner.run(resume=False)
+
+        self.assertEqual((stats['scanned'], stats['created_users'], stats['created_profiles']), (5, 4, 4))
+        self.assertEqual(User.objects.filter(username__startswith='sb-', profile__isnull=False).count(), 5)
+        self.assertEqual(User.objects.get(username='sb-4').date_joined.isoformat(), timestamp(4))
+
+    def test_users_created_concurrently_are_not_counted(self):
+        bulk_create = User.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # A first request creates one of the users between the lookup and the insert
+            User.objects.create_user(objs[0].username)
+            return bulk_create(objs, **kwargs)
+
+        provisioner = SupabaseUserProvisioner(client=FakeAdminClient(3), page_size=10)
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=racing_bulk_create):
+            stats = provisioner.run(resume=False)
+
+        self.assertEqual(stats['created_users'], 2)
+        self.assertEqual(User.objects.filter(username__startswith='sb-').count(), 3)
+
+    def test_later_runs_pick_up_new_sign_ups_from_page_one(self):
+        client = FakeAdminClient(5)
+        provisioner = SupabaseUserProvisioner(client=client, page_size=2, checkpoint_path=self.checkpoint)
+        self.run_provisioner(provisioner)
+        self.assertEqual(self.read_checkpoint()['synced_until'], timestamp(4))
+
+        client.sign_up(3)
+        stats = self.run_provisioner(provisioner)
+
+        # Pages 1 and 2 hold the new users; page 2 reaches the watermark
+        self.assertEqual((stats['start_page'], stats['pages'], stats['created_users']), (1, 2, 3))
+        self.assertTrue(stats['complete'])
+        self.assertEqual(User.objects.filter(username__startswith='sb-').count(), 8)
+        self.assertEqual(self.read_checkpoint()['synced_until'], timestamp(7))
+
+    def test_interrupted_walk_resumes_without_missing_users(self):
+        client = FakeAdminClient(5)
+        provisioner = SupabaseUserProvisioner(client=client, page_size=2, checkpoint_path=self.checkpoint)
+        self.run_provisioner(provisioner, max_pages=1)
+        self.assertEqual(self.read_checkpoint()['next_page'], 2)
+
+        # New sign-ups shift users already seen onto the remaining pages
+        client.sign_up(1)
+        stats = self.run_provisioner(provisioner)
+
+        # Totals carry over for the whole walk
+        self.assertEqual((stats['start_page'], stats['created_users']), (2, 5))
+        self.assertEqual(User.objects.filter(username__startswith='sb-').count(), 5)
+
+        # The walk's watermark is its first page, so the next run provisions the new user
+        stats = self.run_provisioner(provisioner)
+        self.assertEqual((stats['start_page'], stats['created_users']), (1, 1))
+        self.assertTrue(User.objects.filter(username='sb-5').exists())
+
+    def test_checkpoint_waits_for_the_transaction(self):
+        provisioner = SupabaseUserProvisioner(client=FakeAdminClient(1), checkpoint_path=self.checkpoint)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            with transaction.atomic():
+                provisioner.run()
+
+        self.assertFalse(os.path.exists(self.checkpoint))
+        self.assertEqual(len(callbacks), 1)
+
+
+class ProfileLoaderTests(StandInTestMixin, SimpleTestCase):
+    """Batched id=in.(...) profile lookups (user-018)."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin.seed('profiles', [{'id': f'sb-{i}', 'full_name': f'User {i}'} for i in range(5)])
+
+    def test_wanted_ids_are_fetched_one_query_per_chunk(self):
+        loader = ProfileLoader(client=self.direct_client(), batch_size=2)
+
+        profiles = loader.load_many([f'sb-{i}' for i in range(6)])
+
+        self.assertEqual(profiles['sb-3']['full_name'], 'User 3')
+        self.assertIsNone(profiles['sb-5'])
+        self.assertEqual((loader.queries, self.standin.requests), (3, 3))
+
+    def test_loaded_profiles_and_misses_are_not_fetched_again(self):
+        loader = ProfileLoader(client=self.direct_client())
+        loader.load_many(['sb-0', 'missing'])
+
+        self.assertEqual(loader.load('sb-0')['id'], 'sb-0')
+        self.assertIsNone(loader.load('missing'))
+        self.assertEqual((loader.queries, loader.stats()['hits']), (1, 2))
+
+    def test_serializing_a_list_queues_every_profile(self):
+        loader = ProfileLoader(client=self.direct_client(), batch_size=2)
+        users = [User(username=f'sb-{i}') for i in range(5)]
+
+        data = SupabaseUserSerializer(users, many=True, context={'profile_loader': loader}).data
+
+        self.assertEqual([row['supabase_profile']['full_name'] for row in data], [f'User {i}' for i in range(5)])
+        self.assertEqual(loader.queries, 3)
+
+    def test_async_loads_in_the_same_tick_share_a_batch(self):
+        loader = AsyncProfileLoader(client=self.async_direct_client(), batch_size=10)
+
+        async def load():
+            return await asyncio.gather(*(loader.load(f'sb-{i}') for i in range(5)), loader.load('missing'))
+
+        profiles = asyncio.run(load())
+
+        self.assertEqual([profile['id'] for profile in profiles[:5]], [f'sb-{i}' for i in range(5)])
+        self.assertIsNone(profiles[5])
+        self.assertEqual(loader.queries, 1)
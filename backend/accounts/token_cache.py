@@ -0,0 +1,76 @@
+"""
+Shared cache of DRF auth token keys to their tokens and users.
+
+Lets ``api.authentication.CachedTokenAuthentication`` authenticate warm
+requests without the ``Token`` + ``User`` join. Caching is off unless the
+cache backend is shared between processes, since a deleted token or a
+deactivated user would otherwise stay authenticated on the other workers.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+
+from .shared_cache import cache_is_shared
+
+# Seconds a token key stays cached
+DEFAULT_AUTH_TOKEN_CACHE_TTL = 300
+
+CACHE_KEY_PREFIX = 'auth_token:'
+
+
+def _cache_key(key):
+    # Token keys are credentials, so only their digest goes into the cache
+    return f"{CACHE_KEY_PREFIX}{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+
+def _cache_ttl():
+    if not cache_is_shared():
+        return 0
+    return getattr(settings, 'AUTH_TOKEN_CACHE_TTL', DEFAULT_AUTH_TOKEN_CACHE_TTL)
+
+
+def caching_enabled():
+    """Return True if token lookups are cached with the current settings."""
+    return bool(_cache_ttl())
+
+
+def get_cached_token(key):
+    """
+    Get a cached token.
+
+    Args:
+        key: The token key from the Authorization header
+
+    Returns:
+        The Token instance with its user loaded, or None on a miss
+    """
+    if not _cache_ttl():
+        return None
+    return cache.get(_cache_key(key))
+
+
+def cache_token(token):
+    """
+    Cache a token together with its user.
+
+    Called when a token is authenticated from the database and when it is
+    issued, so the first request after login is already warm.
+
+    Args:
+        token: The Token instance
+    """
+    ttl = _cache_ttl()
+    if ttl:
+        # Make sure the user travels with the token
+        token.user
+        cache.set(_cache_key(token.key), token, ttl)
+
+
+def invalidate_token(key):
+    """
+    Drop a cached token key.
+
+    Args:
+        key: The token key
+    """
+    cache.delete(_cache_key(key))
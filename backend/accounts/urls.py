@@ -2,13 +2,12 @@
 URL Configuration for accounts app.
 """
 from django.urls import path
-from .views import RegisterView, LoginView, UserProfileView
-from rest_framework.authtoken.views import obtain_auth_token
+from .views import RegisterView, LoginView, UserProfileView, CachedObtainAuthToken
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('profile/', UserProfileView.as_view(), name='profile'),
-    # Django REST Framework token auth
-    path('token/', obtain_auth_token, name='api_token_auth'),
+    # Django REST Framework token auth (pre-warms the token cache)
+    path('token/', CachedObtainAuthToken.as_view(), name='api_token_auth'),
 ] 
\ No newline at end of file
@@ -14,6 +14,7 @@ from sendgrid.helpers.mail import Mail
 
 from .serializers.user_serializers import UserSerializer, RegisterSerializer
 from .models import UserProfile
+from .token_cache import cache_token
 
 # Create your views here.
 
@@ -27,6 +28,7 @@ class RegisterView(generics.CreateAPIView):
         if serializer.is_valid():
             user = serializer.save()
             token, created = Token.objects.get_or_create(user=user)
+            cache_token(token)
             
             # Send welcome email
             try:
@@ -66,12 +68,27 @@ class LoginView(ObtainAuthToken):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         token, created = Token.objects.get_or_create(user=user)
+        cache_token(token)
         return Response({
             'token': token.key,
             'user': UserSerializer(user).data
         })
 
 
+class CachedObtainAuthToken(ObtainAuthToken):
+    """
+    DRF's obtain_auth_token view, pre-warming the token cache at issue time.
+    """
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        token, created = Token.objects.get_or_create(user=user)
+        cache_token(token)
+        return Response({'token': token.key})
+
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -2,15 +2,20 @@
 Supabase JWT authentication for Django REST Framework.
 """
 import jwt
+import httpx
 import requests
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
-from rest_framework.authentication import BaseAuthentication
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
 import os
 from dotenv import load_dotenv
 
+from accounts.supabase_users import resolve_supabase_user, aresolve_supabase_user
+from accounts.token_cache import get_cached_token, cache_token
+from core.supabase_jwt import verify_supabase_token, averify_supabase_token, UnknownSigningKeyError
+
 # Load environment variables
 load_dotenv()
 
@@ -24,9 +29,9 @@ class SupabaseJWTAuthentication(BaseAuthentication):
     Authorization header and authenticates the corresponding user.
     """
     
-    def authenticate(self, request):
+    def get_token(self, request):
         """
-        Authenticate the request and return a two-tuple of (user, token).
+        Extract the bearer token from the Authorization header.
         """
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -38,84 +43,120 @@ class SupabaseJWTAuthentication(BaseAuthentication):
         if not token:
             return None
         
-        # Supabase URL from environment variables
-        supabase_url = os.getenv("SUPABASE_URL")
+        return token
+    
+    def authenticate(self, request):
+        """
+        Authenticate the request and return a two-tuple of (user, token).
+        """
+        token = self.get_token(request)
+        
+        if token is None:
+            return None
         
         try:
-            # Fetch Supabase JWT verification key (JWKS)
-            jwks_url = f"{supabase_url}/auth/v1/jwks"
-            jwks_response = requests.get(jwks_url)
-            jwks = jwks_response.json()
-            
-            # Get the JWT header
-            header = jwt.get_unverified_header(token)
+            # Verify and decode the token (served from the verified-token cache when possible)
+            payload = verify_supabase_token(token)
             
-            # Find the key that matches the kid in the header
-            key = None
-            for jwk in jwks['keys']:
-                if jwk['kid'] == header['kid']:
-                    key = jwk
-                    break
-            
-            if key is None:
-                raise AuthenticationFailed('Invalid token: No matching key found')
-            
-            # Convert the JWK to a public key
-            public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
+            # Get the user ID from the payload
+            user_id = self.get_user_id(payload)
             
-            # Verify and decode the token
-            payload = jwt.decode(
-                token,
-                public_key,
-                algorithms=['RS256'],
-                audience='authenticated',
-                options={'verify_exp': True}
-            )
+            # Get or create user in Django (cached per Supabase user ID)
+            user = resolve_supabase_user(user_id, payload.get('email'))
             
-            # Get the user ID from the payload
-            user_id = payload.get('sub')
+            return (user, payload)
             
-            if not user_id:
-                raise AuthenticationFailed('Invalid token: No user ID in payload')
+        except Exception as e:
+            raise self.authentication_failed(e)
+    
+    def get_user_id(self, payload):
+        """
+        Get the Supabase user ID from a verified payload.
+        """
+        user_id = payload.get('sub')
+        
+        if not user_id:
+            raise AuthenticationFailed('Invalid token: No user ID in payload')
+        
+        return user_id
+    
+    def authentication_failed(self, exc):
+        """
+        Map an error raised during authentication to AuthenticationFailed.
+        """
+        if isinstance(exc, AuthenticationFailed):
+            return exc
+        if isinstance(exc, UnknownSigningKeyError):
+            return AuthenticationFailed('Invalid token: No matching key found')
+        if isinstance(exc, jwt.ExpiredSignatureError):
+            return AuthenticationFailed('Expired token')
+        if isinstance(exc, jwt.InvalidTokenError):
+            return AuthenticationFailed('Invalid token')
+        if isinstance(exc, (requests.RequestException, httpx.HTTPError)):
+            return AuthenticationFailed(f'Error verifying token: {str(exc)}')
+        return AuthenticationFailed(f'Authentication error: {str(exc)}')
+    
+    def authenticate_header(self, request):
+        """
+        Return the authentication header format.
+        """
+        return 'Bearer'
+
+
+class AsyncSupabaseJWTAuthentication(SupabaseJWTAuthentication):
+    """
+    Supabase JWT authentication with an async path for async views.
+    
+    ``aauthenticate`` returns the same (user, payload) tuple as ``authenticate``
+    without blocking the event loop: JWKS keys are fetched with a non-blocking
+    HTTP client, users are resolved through the async cache and ORM APIs, and
+    signature checks can be offloaded with SUPABASE_JWT_VERIFY_IN_THREAD.
+    Sync DRF views can keep using this class through ``authenticate``.
+    """
+    
+    async def aauthenticate(self, request):
+        """
+        Authenticate the request and return a two-tuple of (user, token).
+        """
+        token = self.get_token(request)
+        
+        if token is None:
+            return None
+        
+        try:
+            payload = await averify_supabase_token(token)
             
-            # Get user email from payload
-            user_email = payload.get('email', f"{user_id}@example.com")
+            user_id = self.get_user_id(payload)
             
-            # Get or create user in Django
-            try:
-                user = User.objects.get(username=user_id)
-                
-                # Update email if it has changed
-                if user.email != user_email and user_email != f"{user_id}@example.com":
-                    user.email = user_email
-                    user.save()
-                    
-            except User.DoesNotExist:
-                # Create a new user
-                user = User.objects.create_user(
-                    username=user_id,
-                    email=user_email,
-                    password=None  # No password for Supabase users
-                )
-                
-                # You might want to fetch additional user data from Supabase here
-                # and set user.first_name, user.last_name, etc.
-                
-                user.save()
+            user = await aresolve_supabase_user(user_id, payload.get('email'))
             
             return (user, payload)
             
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Expired token')
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed('Invalid token')
-        except requests.RequestException as e:
-            raise AuthenticationFailed(f'Error verifying token: {str(e)}')
         except Exception as e:
-            raise AuthenticationFailed(f'Authentication error: {str(e)}')
+            raise self.authentication_failed(e)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    DRF token authentication backed by a shared cache.
     
-    def authenticate_header(self, request):
+    Token key lookups are served from the Django cache, so warm requests skip
+    the Token + User join. Entries are invalidated when a token is deleted or
+    rotated and when its user is saved, and are pre-warmed when a token is issued.
+    """
+    
+    def authenticate_credentials(self, key):
         """
-        Return the authentication header format.
+        Authenticate the token key and return a two-tuple of (user, token).
         """
-        return 'Bearer' 
\ No newline at end of file
+        token = get_cached_token(key)
+        
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache_token(token)
+            return (user, token)
+        
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        
+        return (token.user, token)
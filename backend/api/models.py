@@ -15,7 +15,8 @@ class Course(models.Model):
         return self.title
 
 class CourseEnrollment(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
+    # core.CourseEnrollment owns User.enrollments
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
     enrolled_at = models.DateTimeField(auto_now_add=True)
     
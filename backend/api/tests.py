@@ -1,3 +1,216 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.contrib.auth.models import User
+from django.test import TestCase, RequestFactory, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.auth import SupabaseAuthBackend
+from api.authentication import AsyncSupabaseJWTAuthentication, CachedTokenAuthentication
+from core import supabase_jwt
+from core.jwks import get_jwks_store
+from core.supabase_standin import TokenMinter
+from core.testing import StandInTestMixin, shared_cache_settings
+
+
+class SupabaseJWTTestCase(StandInTestMixin, TestCase):
+    """Verifies tokens minted by a stand-in against its JWKS endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.minter = self.standin.minter
+        self.jwks_url = f"{self.server.url}/auth/v1/jwks"
+        settings_override = override_settings(
+            SUPABASE_JWKS_URL=self.jwks_url,
+            SUPABASE_JWT_VERIFICATION_MODE='jwks',
+            SUPABASE_JWKS_MIN_REFRESH_INTERVAL=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # The key store and token caches are process-wide, and a port can be
+        # reused by a later test's server
+        store = get_jwks_store(self.jwks_url)
+        store.clear()
+        self.refreshes = store.stats()['refreshes']
+        supabase_jwt.get_token_cache().clear()
+        supabase_jwt.get_negative_cache().clear()
+        supabase_jwt.rejections.reset()
+
+        decode = mock.patch('core.supabase_jwt._decode', wraps=supabase_jwt._decode)
+        self.decode = decode.start()
+        self.addCleanup(decode.stop)
+
+    def jwks_fetches(self):
+        return get_jwks_store(self.jwks_url).stats()['refreshes'] - self.refreshes
+
+
+class VerifiedTokenCacheTests(SupabaseJWTTestCase):
+    """Verified token claims cached by digest (user-002)."""
+
+    def test_verified_token_is_served_from_cache(self):
+        token = self.minter.mint('user-1', 'one@example.com')
+        hits = supabase_jwt.get_token_cache().stats()['hits']
+
+        first = supabase_jwt.verify_supabase_token(token)
+        second = supabase_jwt.verify_supabase_token(token)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['sub'], 'user-1')
+        self.assertEqual(self.decode.call_count, 1)
+        self.assertEqual(self.jwks_fetches(), 1)
+        self.assertEqual(supabase_jwt.get_token_cache().stats()['hits'], hits + 1)
+
+    def test_cached_token_is_verified_again_once_its_key_is_gone(self):
+        token = self.minter.mint('user-1', 'one@example.com')
+        supabase_jwt.verify_supabase_token(token)
+
+        get_jwks_store(self.jwks_url).clear()
+        supabase_jwt.verify_supabase_token(token)
+
+        self.assertEqual(self.decode.call_count, 2)
+
+    def test_callers_get_their_own_copy(self):
+        token = self.minter.mint('user-1', 'one@example.com')
+        supabase_jwt.verify_supabase_token(token)['sub'] = 'changed'
+
+        self.assertEqual(supabase_jwt.verify_supabase_token(token)['sub'], 'user-1')
+
+
+class LocalVerificationTests(SupabaseJWTTestCase):
+    """Offline verification from configured keys (user-004)."""
+
+    secret = 'local-test-secret-with-at-least-32-bytes'
+
+    def test_local_mode_verifies_without_jwks(self):
+        hs256 = jwt.encode({'sub': 'user-1', 'aud': 'authenticated', 'exp': 4102444800}, self.secret,
+                           algorithm='HS256')
+        rs256 = self.minter.mint('user-2', 'two@example.com')
+
+        with override_settings(SUPABASE_JWT_VERIFICATION_MODE='local', SUPABASE_JWT_SECRET=self.secret,
+                               SUPABASE_JWT_PUBLIC_KEY=json.dumps(self.minter.public_jwk)):
+            self.assertEqual(supabase_jwt.verify_supabase_token(hs256)['sub'], 'user-1')
+            self.assertEqual(supabase_jwt.verify_supabase_token(rs256)['sub'], 'user-2')
+
+        self.assertEqual(self.jwks_fetches(), 0)
+
+    def test_backend_authenticates_a_valid_token(self):
+        user = SupabaseAuthBackend().authenticate(None, token=self.minter.mint('user-1', 'one@example.com'))
+
+        self.assertEqual((user.username, user.email), ('user-1', 'one@example.com'))
+
+    def test_backend_rejects_when_the_public_key_is_malformed(self):
+        token = self.minter.mint('user-1', 'one@example.com')
+
+        with override_settings(SUPABASE_JWT_VERIFICATION_MODE='local', SUPABASE_JWT_PUBLIC_KEY='{not json'), \
+                self.assertLogs('accounts.auth', 'ERROR'):
+            self.assertIsNone(SupabaseAuthBackend().authenticate(None, token=token))
+
+    def test_backend_rejects_when_jwks_is_unreachable(self):
+        self.server.close()
+
+        with override_settings(SUPABASE_JWKS_URL='http://127.0.0.1:9/auth/v1/jwks'):
+            self.assertIsNone(SupabaseAuthBackend().authenticate(None, token=self.minter.mint('u', 'u@example.com')))
+
+
+class AsyncAuthenticationTests(SupabaseJWTTestCase):
+    """Async authentication path for ASGI views (user-005)."""
+
+    def request(self, token):
+        return RequestFactory().get('/api/courses/', HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    async def test_matches_the_sync_path_without_blocking_fetches(self):
+        token = self.minter.mint('user-1', 'one@example.com')
+
+        with mock.patch('core.jwks.requests.get', side_effect=AssertionError('blocking JWKS fetch')):
+            user, payload = await AsyncSupabaseJWTAuthentication().aauthenticate(self.request(token))
+
+        self.assertEqual((user.username, user.email, payload['sub']), ('user-1', 'one@example.com', 'user-1'))
+        sync_user, sync_payload = AsyncSupabaseJWTAuthentication().authenticate(self.request(token))
+        self.assertEqual((sync_user.pk, sync_payload), (user.pk, payload))
+
+    @override_settings(SUPABASE_JWT_VERIFY_IN_THREAD=True)
+    async def test_verifies_signatures_in_a_thread(self):
+        user, payload = await AsyncSupabaseJWTAuthentication().aauthenticate(
+            self.request(self.minter.mint('user-2', 'two@example.com'))
+        )
+
+        self.assertEqual(user.username, 'user-2')
+        self.assertEqual(self.decode.call_count, 1)
+
+    async def test_rejects_an_invalid_token(self):
+        forged = TokenMinter(kid=self.minter.kid).mint('user-1', 'one@example.com')
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Invalid token'):
+            await AsyncSupabaseJWTAuthentication().aauthenticate(self.request(forged))
+
+    async def test_unreachable_jwks_fails_authentication(self):
+        self.server.close()
+
+        with override_settings(SUPABASE_JWKS_URL='http://127.0.0.1:9/auth/v1/async-jwks'):
+            with self.assertRaisesMessage(AuthenticationFailed, 'Error verifying token'):
+                await AsyncSupabaseJWTAuthentication().aauthenticate(self.request(self.minter.mint('u', 'u@x.io')))
+
+
+class NegativeTokenCacheTests(SupabaseJWTTestCase):
+    """Cheap rejection of invalid and forged tokens (user-006)."""
+
+    def test_forged_token_is_rejected_from_the_negative_cache(self):
+        token = TokenMinter(kid=self.minter.kid).mint('user-1', 'one@example.com')
+
+        for _ in range(3):
+            with self.assertRaises(jwt.InvalidSignatureError):
+                supabase_jwt.verify_supabase_token(token)
+
+        self.assertEqual(self.decode.call_count, 1)
+        self.assertEqual(supabase_jwt.rejections.stats(), {'bad_signature': 1, 'negative_cache': 2})
+
+    def test_expired_and_malformed_tokens_never_reach_the_key_store(self):
+        expired = self.minter.mint('user-1', 'one@example.com', lifetime=-60)
+
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            supabase_jwt.verify_supabase_token(expired)
+        with self.assertRaises(jwt.DecodeError):
+            supabase_jwt.verify_supabase_token('not-a-jwt')
+
+        self.assertEqual(self.jwks_fetches(), 0)
+        self.decode.assert_not_called()
+
+    def test_unknown_kid_is_not_remembered(self):
+        token = TokenMinter(kid='rotated-in').mint('user-1', 'one@example.com')
+
+        with self.assertRaises(supabase_jwt.UnknownSigningKeyError):
+            supabase_jwt.verify_supabase_token(token)
+
+        # The key may be published shortly, so the rejection isn't cached
+        self.assertEqual(len(supabase_jwt.get_negative_cache()), 0)
+
+
+@override_settings(CACHES=shared_cache_settings())
+class CachedTokenAuthenticationTests(TestCase):
+    """DRF token lookups through the shared cache (user-007)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('token-user', password='secret')
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self):
+        request = RequestFactory().get('/api/courses/', HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_warm_lookup_skips_the_database(self):
+        self.authenticate()
+
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_deactivated_user_is_rejected_while_cached(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
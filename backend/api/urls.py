@@ -8,6 +8,11 @@ from .views import (
     CourseEnrollmentViewSet,
     SupabaseCourseListView,
     SupabaseUserProfileView,
+    SupabaseLearnerListView,
+    SupabaseMetricsView,
+    NotificationInboxView,
+    NotificationUnreadCountView,
+    notification_stream,
     StripeWebhookView,
     StripePaymentIntentView
 )
@@ -25,6 +30,11 @@ urlpatterns = [
     # Add Supabase-based endpoints
     path('supabase/courses/', SupabaseCourseListView.as_view(), name='supabase-courses'),
     path('supabase/profile/', SupabaseUserProfileView.as_view(), name='supabase-profile'),
+    path('supabase/learners/', SupabaseLearnerListView.as_view(), name='supabase-learners'),
+    path('supabase/metrics/', SupabaseMetricsView.as_view(), name='supabase-metrics'),
+    path('notifications/', NotificationInboxView.as_view(), name='notification-inbox'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     
     # Add Stripe payment endpoints
     path('webhook/stripe/', StripeWebhookView.as_view(), name='stripe-webhook'),
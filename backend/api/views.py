@@ -6,9 +6,12 @@ from rest_framework.response import Response
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
+from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 import stripe
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
@@ -25,7 +28,14 @@ from core.serializers import (
 from core.direct_supabase import supabase as direct_supabase
 from core.email import send_course_enrollment_confirmation, send_payment_receipt
 from core.payment import validate_webhook_signature, PaymentError, create_payment_intent
-from api.authentication import SupabaseJWTAuthentication
+from api.authentication import SupabaseJWTAuthentication, AsyncSupabaseJWTAuthentication
+from accounts.serializers.user_serializers import SupabaseUserSerializer
+from accounts.supabase_profiles import get_profile_loader
+from core.course_mirror import mirrored_courses
+from core.supabase_metrics import get_recorder, PrometheusSink, RingBufferSink
+from core.notification_hub import get_notification_hub
+from core.notification_counts import unread_count
+from core.notification_inbox import inbox_page, DEFAULT_PAGE_SIZE as INBOX_PAGE_SIZE
 
 # Create your views here.
 
@@ -119,6 +129,10 @@ class CourseEnrollmentViewSet(viewsets.ReadOnlyModelViewSet):
 class SupabaseCourseListView(APIView):
     """
     API view to retrieve courses from Supabase.
+    
+    Served from the local course mirror while it is within
+    SUPABASE_COURSE_MIRROR_MAX_STALENESS, otherwise read from Supabase.
+    The X-Catalog-Source response header says which.
     """
     authentication_classes = [SupabaseJWTAuthentication]
     permission_classes = [AllowAny]
@@ -132,6 +146,11 @@ class SupabaseCourseListView(APIView):
             limit = request.query_params.get('limit', 10)
             order = request.query_params.get('order', 'created_at.desc')
             
+            # Serve from the local mirror when it is fresh enough
+            courses = mirrored_courses(int(limit), order)
+            if courses is not None:
+                return Response(courses, status=status.HTTP_200_OK, headers={'X-Catalog-Source': 'mirror'})
+            
             # Query courses from Supabase using DirectSupabaseClient
             courses = direct_supabase.select(
                 'courses',
@@ -140,7 +159,7 @@ class SupabaseCourseListView(APIView):
             )
             
             # Return the data
-            return Response(courses or [], status=status.HTTP_200_OK)
+            return Response(courses or [], status=status.HTTP_200_OK, headers={'X-Catalog-Source': 'supabase'})
             
         except Exception as e:
             return Response(
@@ -163,15 +182,11 @@ class SupabaseUserProfileView(APIView):
         user = request.user
         
         try:
-            # Query user profile from Supabase using DirectSupabaseClient
-            profiles = direct_supabase.select(
-                'profiles',
-                filters={'id': user.username}  # The username is the Supabase user ID
-            )
+            # Query user profile from Supabase through the request's batch loader
+            profile_data = get_profile_loader(request).load(user.username)  # The username is the Supabase user ID
             
             # If user profile exists in Supabase
-            if profiles and len(profiles) > 0:
-                profile_data = profiles[0]
+            if profile_data:
                 
                 # Combine Django user data with Supabase profile data
                 user_data = {
@@ -205,6 +220,187 @@ class SupabaseUserProfileView(APIView):
             )
 
 
+class SupabaseLearnerListView(APIView):
+    """
+    API view listing learners with their Supabase profiles (admin only).
+    """
+    authentication_classes = [SupabaseJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """
+        Handle GET requests to list users with their Supabase profiles.
+        
+        Profiles for the whole page are fetched in batched ``id=in.(...)``
+        queries rather than one query per user.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), 500)
+            offset = int(request.query_params.get('offset', 0))
+            
+            users = list(
+                User.objects.filter(is_active=True)
+                .select_related('profile')
+                .order_by('id')[offset:offset + limit]
+            )
+            serializer = SupabaseUserSerializer(users, many=True, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class SupabaseMetricsView(APIView):
+    """
+    API view exposing Supabase call metrics (admin only).
+    """
+    authentication_classes = [SupabaseJWTAuthentication]
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        """
+        Handle GET requests for Supabase call metrics.
+        
+        Returns Prometheus text exposition by default, or the recent-call
+        summary from the ring buffer with ``?format=json``.
+        """
+        recorder = get_recorder()
+        
+        if request.query_params.get('format') == 'json':
+            ring = recorder.sink(RingBufferSink)
+            return Response(
+                {'recent_calls': ring.summary() if ring else {}},
+                status=status.HTTP_200_OK
+            )
+        
+        prometheus = recorder.sink(PrometheusSink)
+        if prometheus is None:
+            return Response(
+                {'error': 'The prometheus sink is not enabled in SUPABASE_METRICS_SINKS'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return HttpResponse(prometheus.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class NotificationInboxView(APIView):
+    """
+    API view listing the authenticated user's notifications, newest first.
+    """
+    authentication_classes = [SupabaseJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Handle GET requests for a page of the notification inbox.
+        
+        Query parameters: ``status`` (all, unread or read), ``type``,
+        ``limit`` and ``cursor``, the ``next_cursor`` of the previous page.
+        Pages are keyset-paginated, so deep pages cost the same as the first.
+        """
+        try:
+            limit = int(request.query_params.get('limit', INBOX_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # The username is the Supabase user ID
+            page = inbox_page(
+                request.user.username,
+                status=request.query_params.get('status', 'all'),
+                notification_type=request.query_params.get('type'),
+                limit=limit,
+                cursor=request.query_params.get('cursor'),
+            )
+            return Response(page, status=status.HTTP_200_OK)
+            
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class NotificationUnreadCountView(APIView):
+    """
+    API view returning the authenticated user's unread notification count.
+    """
+    authentication_classes = [SupabaseJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Handle GET requests for the notification badge count.
+        
+        Reads the user's trigger-maintained counter row instead of counting
+        their notifications.
+        """
+        try:
+            # The username is the Supabase user ID
+            return Response({'unread': unread_count(request.user.username)}, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class NotificationStreamAuthentication(AsyncSupabaseJWTAuthentication):
+    """
+    Supabase JWT authentication that also accepts an ``access_token`` query parameter.
+    
+    Browsers' EventSource can't send an Authorization header. Tokens in URLs
+    can end up in access logs, so prefer the header where the client allows it.
+    """
+    
+    def get_token(self, request):
+        return super().get_token(request) or request.GET.get('access_token') or None
+
+
+async def notification_stream(request):
+    """
+    Stream the authenticated user's new notifications as Server-Sent Events.
+    
+    Resumes after the ``Last-Event-ID`` header (or ``last_event_id`` query
+    parameter) by replaying the notifications created since. The stream ends
+    when the token expires; clients reconnect with a fresh token.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI, Django buffers an async stream until it ends, and each
+        # request would start its own hub and LISTEN connection. Streams are
+        # routed to the separate ASGI process instead (see DEPLOYMENT_AWS.md)
+        return JsonResponse(
+            {'error': 'Notification streams are served by the ASGI stream server (myproject.asgi)'},
+            status=501
+        )
+    
+    try:
+        result = await NotificationStreamAuthentication().aauthenticate(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+    
+    if result is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided'}, status=401)
+    
+    user, payload = result
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    
+    stream = get_notification_hub().stream(payload['sub'], last_event_id, expires_at=payload.get('exp'))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class StripeWebhookView(APIView):
     """
@@ -0,0 +1,527 @@
+"""
+Asyncio Supabase REST client.
+Async counterpart of ``core.direct_supabase.DirectSupabaseClient`` built on
+``httpx.AsyncClient``, so async views and management commands can fan out
+PostgREST calls concurrently instead of one after another.
+"""
+import os
+import time
+import asyncio
+import logging
+import weakref
+from urllib.parse import urlsplit
+import httpx
+from dotenv import load_dotenv
+
+from core.direct_supabase import select_params, keyset_params, Query, QueryResult
+from core.supabase_cache import get_select_cache, select_cache_key
+from core.singleflight import AsyncSingleFlight
+from core.supabase_bulk import abulk_send, upsert_request
+from core.supabase_metrics import record_response
+from core.http_pool import (
+    _setting,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRIES,
+)
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Connections kept by the shared pool across all hosts
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE = 20
+# Requests in flight to one host at a time
+DEFAULT_MAX_PER_HOST = 20
+
+
+class AsyncDirectSupabaseClient:
+    """
+    Async client for the Supabase REST and auth APIs.
+
+    One ``httpx.AsyncClient`` (and so one connection pool) is shared by every
+    coroutine using the instance, and a semaphore per host bounds how many
+    requests are in flight to it. Both are bound to the event loop they are
+    first used on; use ``get_async_supabase()`` to get the instance for the
+    running loop.
+    """
+
+    def __init__(self, supabase_url=None, anon_key=None, service_key=None,
+                 max_per_host=None, max_connections=None, max_keepalive=None,
+                 timeout=None, transport=None):
+        """
+        Initialize the client.
+
+        Args:
+            supabase_url: Project URL (defaults to SUPABASE_URL)
+            anon_key: Anon API key (defaults to SUPABASE_KEY)
+            service_key: Service role key (defaults to SUPABASE_SERVICE_KEY)
+            max_per_host: Maximum concurrent requests per host
+            max_connections: Maximum connections in the shared pool
+            max_keepalive: Maximum idle kept-alive connections
+            timeout: ``httpx.Timeout`` (defaults to the pooled HTTP timeouts)
+            transport: Optional ``httpx.AsyncBaseTransport``, e.g. a local stand-in
+        """
+        self.supabase_url = (supabase_url or os.getenv("SUPABASE_URL") or "").rstrip("/")
+        self.anon_key = anon_key or os.getenv("SUPABASE_KEY")
+        self.service_key = service_key if service_key is not None else os.getenv("SUPABASE_SERVICE_KEY", "")
+
+        if not self.supabase_url or not self.anon_key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+
+        self.max_per_host = max_per_host or _setting('SUPABASE_ASYNC_MAX_PER_HOST', DEFAULT_MAX_PER_HOST, int)
+        self.limits = httpx.Limits(
+            max_connections=max_connections or _setting('SUPABASE_ASYNC_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS, int),
+            max_keepalive_connections=max_keepalive or _setting('SUPABASE_ASYNC_MAX_KEEPALIVE', DEFAULT_MAX_KEEPALIVE, int),
+        )
+        self.timeout = timeout or httpx.Timeout(
+            _setting('SUPABASE_HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT, float),
+            connect=_setting('SUPABASE_HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT, float),
+        )
+        self._transport = transport
+        # Shared with the sync client for the same project, so writes through either invalidate both
+        self.select_cache = get_select_cache(self.supabase_url)
+        # Concurrent identical selects share one upstream request
+        self.select_flights = AsyncSingleFlight()
+        self._client = None
+        self._semaphores = {}
+
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def client(self):
+        """The shared ``httpx.AsyncClient``, created on first use."""
+        if self._client is None:
+            transport = self._transport
+            if transport is None:
+                # httpx retries connection failures only, never a sent request
+                transport = httpx.AsyncHTTPTransport(
+                    limits=self.limits,
+                    retries=_setting('SUPABASE_HTTP_RETRIES', DEFAULT_RETRIES, int),
+                )
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=transport,
+            )
+        return self._client
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return semaphore
+
+    def _url(self, endpoint):
+        # Auth endpoints live under /auth/v1, tables under /rest/v1
+        if endpoint.startswith("auth/"):
+            return f"{self.supabase_url}/auth/v1/{endpoint[len('auth/'):]}"
+        return f"{self.supabase_url}/rest/v1/{endpoint}"
+
+    def _headers(self, use_service_key=False):
+        api_key = self.service_key if use_service_key and self.service_key else self.anon_key
+        return {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Prefer": "return=representation"
+        }
+
+    async def _send(self, method, url, **kwargs):
+        async with self._semaphore(url):
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            started = time.perf_counter()
+            response = None
+            error = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                self.errors += 1
+                logger.error(f"API request error: {str(e)}")
+                if isinstance(e, httpx.HTTPStatusError):
+                    logger.error(f"Response status: {e.response.status_code}")
+                    logger.error(f"Response text: {e.response.text}")
+                else:
+                    error = e
+                raise
+            finally:
+                self.in_flight -= 1
+                request_bytes = len(response.request.content) if response is not None else 0
+                record_response('async', method, url, response, time.perf_counter() - started,
+                                error=error, request_bytes=request_bytes)
+
+    async def _request(self, endpoint, method="GET", data=None, params=None, use_service_key=False,
+                       headers=None):
+        """
+        Send a REST API request to Supabase and return the raw response.
+
+        Args:
+            endpoint: The API endpoint to call, without the base URL
+            method: HTTP method (GET, HEAD, POST, PUT, PATCH, DELETE)
+            data: Request body data for POST/PUT/PATCH requests
+            params: URL query parameters, as a dictionary or a list of pairs
+            use_service_key: Whether to use the service role key instead of anon key
+            headers: Extra headers, overriding the defaults (e.g. ``Prefer``)
+
+        Returns:
+            The ``httpx.Response``
+
+        Raises:
+            httpx.HTTPError: On connection errors, timeouts and error statuses
+        """
+        if method not in ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        kwargs = {"headers": {**self._headers(use_service_key), **(headers or {})}, "params": params}
+        if method in ("POST", "PUT", "PATCH"):
+            kwargs["json"] = data
+
+        return await self._send(method, self._url(endpoint), **kwargs)
+
+    async def _api_request(self, endpoint, method="GET", data=None, params=None, use_service_key=False,
+                           headers=None):
+        """
+        Make a REST API request to Supabase.
+
+        Args:
+            endpoint: The API endpoint to call, without the base URL
+            method: HTTP method (GET, POST, PUT, PATCH, DELETE)
+            data: Request body data for POST/PUT/PATCH requests
+            params: URL query parameters
+            use_service_key: Whether to use the service role key instead of anon key
+            headers: Extra headers, overriding the defaults (e.g. ``Prefer``)
+
+        Returns:
+            The JSON response from the API
+
+        Raises:
+            httpx.HTTPError: On connection errors, timeouts and error statuses
+        """
+        response = await self._request(endpoint, method, data, params, use_service_key, headers)
+        if response.content:
+            return response.json()
+        return None
+
+    # Query builder
+    def query(self, table):
+        """
+        Start a query with server-side filters, embedding, ranges and counts.
+
+        Args:
+            table: The table name
+
+        Returns:
+            A Query; await ``execute()`` or ``count_only()`` to run it
+        """
+        return Query(self, table)
+
+    async def _run_query(self, query, head=False):
+        if query.service_role and not self.service_key:
+            # Falling back to the anon key would let RLS silently drop rows
+            raise ValueError(f"SUPABASE_SERVICE_KEY must be set to query {query.table} with the service key")
+        params, headers = query.build()
+        response = await self._request(query.table, method="HEAD" if head else "GET", params=params,
+                                       use_service_key=query.service_role, headers=headers)
+        return QueryResult.from_response(response)
+
+    # Table operations
+    async def select(self, table, columns="*", filters=None, limit=None, order=None, fresh=False):
+        """
+        Select data from a table.
+
+        Results are served from the select cache for tables with a cache TTL,
+        and concurrent identical selects share a single upstream request.
+
+        Args:
+            table: The table name
+            columns: Columns to select (default "*")
+            filters: Dictionary of column/value pairs to filter by
+            limit: Maximum number of records to return
+            order: Order by clause
+            fresh: Skip the cache and in-flight requests and read from Supabase
+                (the result is still cached)
+
+        Returns:
+            List of records
+        """
+        key = select_cache_key(table, columns, filters, limit, order)
+        if fresh:
+            self.select_cache.record_bypass()
+        else:
+            cached = self.select_cache.get(key)
+            if cached is not None:
+                return cached
+
+        generation = self.select_cache.generation(table)
+        params = select_params(columns, filters, limit, order)
+
+        async def load():
+            result = await self._api_request(table, params=params)
+            self.select_cache.set(key, result, generation)
+            return result
+
+        if fresh:
+            return await load()
+        # A write bumps the generation, so later callers don't join a flight that started before it
+        return await self.select_flights.do((key, generation), load)
+
+    async def iter_pages(self, table, columns="*", filters=None, page_size=1000, key="id", start_after=None):
+        """
+        Walk a table in pages ordered by a unique key, using keyset pagination.
+
+        The next page is requested as soon as the current one arrives, so it
+        downloads while the caller processes the current page. Pages bypass
+        the select cache.
+
+        Args:
+            table: The table name
+            columns: Columns to select (default "*"); the key column is always included
+            filters: Dictionary of column/value pairs to filter by
+            page_size: Records per request
+            key: Unique, sortable column to page by
+            start_after: Resume after this key value
+
+        Yields:
+            Lists of records
+        """
+        def fetch(after):
+            params = keyset_params(columns, filters, page_size, key, after)
+            return asyncio.ensure_future(self._api_request(table, params=params))
+
+        next_page = fetch(start_after)
+        try:
+            while next_page is not None:
+                page = await next_page or []
+                next_page = fetch(page[-1][key]) if len(page) >= page_size else None
+                if page:
+                    yield page
+        finally:
+            # The caller stopped early; don't leave the prefetch running
+            if next_page is not None and not next_page.done():
+                next_page.cancel()
+
+    async def iter_rows(self, table, columns="*", filters=None, page_size=1000, key="id", start_after=None):
+        """
+        Stream every matching record of a table in constant memory.
+
+        Args:
+            table: The table name
+            columns: Columns to select (default "*"); the key column is always included
+            filters: Dictionary of column/value pairs to filter by
+            page_size: Records per request
+            key: Unique, sortable column to page by
+            start_after: Resume after this key value
+
+        Yields:
+            Records, in key order
+        """
+        async for page in self.iter_pages(table, columns, filters, page_size, key, start_after):
+            for row in page:
+                yield row
+
+    async def insert(self, table, data):
+        """
+        Insert data into a table.
+
+        Args:
+            table: The table name
+            data: Record or records to insert
+
+        Returns:
+            Inserted record(s)
+        """
+        try:
+            return await self._api_request(table, method="POST", data=data)
+        finally:
+            self.select_cache.invalidate(table)
+
+    async def bulk_upsert(self, table, rows, chunk_size=None, on_conflict=None, returning="minimal",
+                          ignore_duplicates=False, max_concurrency=None):
+        """
+        Insert or update many rows in chunked, concurrent requests.
+
+        Args:
+            table: The table name
+            rows: Any iterable of records; it is consumed lazily
+            chunk_size: Records per request (default SUPABASE_BULK_CHUNK_SIZE)
+            on_conflict: Comma-separated unique columns to upsert on (default: primary key)
+            returning: "minimal" (no response body) or "representation" (collect the rows)
+            ignore_duplicates: Skip conflicting records instead of merging them
+            max_concurrency: Requests in flight at once (default SUPABASE_BULK_CONCURRENCY)
+
+        Returns:
+            Dictionary with row and chunk counts, per-chunk errors and elapsed time
+        """
+        async def send(chunk):
+            params, headers = upsert_request(chunk, on_conflict, returning, ignore_duplicates)
+            return await self._api_request(table, method="POST", data=chunk, params=params, headers=headers)
+
+        try:
+            return await abulk_send(send, rows, chunk_size, max_concurrency, returning)
+        finally:
+            self.select_cache.invalidate(table)
+
+    async def update(self, table, data, column, value):
+        """
+        Update records in a table.
+
+        Args:
+            table: The table name
+            data: Data to update
+            column: Column to filter by
+            value: Value to filter by
+
+        Returns:
+            Updated record(s)
+        """
+        params = {column: f"eq.{value}"}
+        try:
+            return await self._api_request(table, method="PATCH", data=data, params=params)
+        finally:
+            self.select_cache.invalidate(table)
+
+    async def delete(self, table, column, value):
+        """
+        Delete records from a table.
+
+        Args:
+            table: The table name
+            column: Column to filter by
+            value: Value to filter by
+
+        Returns:
+            Deleted record(s)
+        """
+        params = {column: f"eq.{value}"}
+        try:
+            return await self._api_request(table, method="DELETE", params=params)
+        finally:
+            self.select_cache.invalidate(table)
+
+    async def rpc(self, function, params=None, use_service_key=False):
+        """
+        Call a Postgres function exposed under ``/rest/v1/rpc``.
+
+        Args:
+            function: The function name
+            params: Named arguments, as a dictionary
+            use_service_key: Whether to use the service role key instead of anon key
+
+        Returns:
+            The function's result
+        """
+        return await self._api_request(f"rpc/{function}", method="POST", data=params or {},
+                                       use_service_key=use_service_key)
+
+    # Auth operations
+    async def sign_up(self, email, password, metadata=None):
+        """
+        Sign up a new user.
+
+        Args:
+            email: User's email
+            password: User's password
+            metadata: Optional user metadata
+
+        Returns:
+            User data
+        """
+        data = {
+            "email": email,
+            "password": password,
+            "data": metadata or {}
+        }
+        return await self._api_request("auth/signup", method="POST", data=data)
+
+    async def sign_in(self, email, password):
+        """
+        Sign in a user.
+
+        Args:
+            email: User's email
+            password: User's password
+
+        Returns:
+            Session data including access token
+        """
+        data = {
+            "email": email,
+            "password": password
+        }
+        return await self._api_request("auth/token?grant_type=password", method="POST", data=data)
+
+    async def get_user(self, jwt):
+        """
+        Get user data using a JWT.
+
+        Args:
+            jwt: JWT token
+
+        Returns:
+            User data
+        """
+        headers = {
+            "apikey": self.anon_key,
+            "Authorization": f"Bearer {jwt}"
+        }
+        response = await self._send("GET", f"{self.supabase_url}/auth/v1/user", headers=headers)
+        return response.json()
+
+    def stats(self):
+        """
+        Get request counters.
+
+        Returns:
+            Dictionary with calls, errors and the peak number of concurrent requests
+        """
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_per_host': self.max_per_host,
+            'select_flights': self.select_flights.stats(),
+        }
+
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+# One client per event loop: httpx connections and asyncio semaphores are loop-bound
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_supabase():
+    """
+    Get the shared async client for the running event loop.
+
+    Returns:
+        The AsyncDirectSupabaseClient for the current loop
+
+    Raises:
+        RuntimeError: When called outside a running event loop
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncDirectSupabaseClient()
+    return client
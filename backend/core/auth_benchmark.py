@@ -0,0 +1,318 @@
+"""
+Benchmark harness for the authentication hot paths.
+
+Measures session auth, DRF token auth, ``SupabaseJWTAuthentication`` and
+``accounts.auth.SupabaseAuthBackend``, each cold (all auth caches cleared
+before every request) and warm. A path with no cache in effect under the
+current settings is measured once, as ``<path>.uncached``, and the reason is
+reported in ``AuthBenchmark.notes``. Supabase tokens are minted locally with a
+throwaway RS256 key and verified against a local JWKS stand-in, so runs are
+reproducible and need no network. Database changes are rolled back.
+"""
+import json
+import time
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import caches
+from django.db import transaction
+from django.test import Client, RequestFactory, override_settings
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from accounts import supabase_users, token_cache
+from accounts.auth import SupabaseAuthBackend
+from accounts.supabase_users import invalidate_supabase_user
+from accounts.token_cache import invalidate_token
+from api.authentication import SupabaseJWTAuthentication, CachedTokenAuthentication
+from core import supabase_jwt
+from core.jwks import get_jwks_store
+from core.supabase_standin import TokenMinter
+
+BENCHMARK_KID = 'benchmark-key'
+
+# Allowed slowdown against the baseline before a path counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+class LocalJWKSServer:
+    """
+    Minimal JWKS endpoint on localhost serving a single RSA public key.
+    """
+
+    def __init__(self, public_jwk):
+        """
+        Start the server on a free port.
+
+        Args:
+            public_jwk: The public key as a JWK dictionary
+        """
+        body = json.dumps({'keys': [public_jwk]}).encode('utf-8')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/auth/v1/jwks"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(durations):
+    """
+    Summarize request durations.
+
+    Args:
+        durations: Durations in seconds
+
+    Returns:
+        Dictionary with p50/p95/p99 latency in milliseconds and requests per second
+    """
+    ordered = sorted(durations)
+    total = sum(ordered)
+    return {
+        'requests': len(ordered),
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'rps': len(ordered) / total if total else 0.0,
+    }
+
+
+def reset_supabase_caches():
+    """Clear every Supabase auth cache so the next request takes the cold path."""
+    get_jwks_store().clear()
+    token_cache = supabase_jwt.get_token_cache()
+    if token_cache is not None:
+        token_cache.clear()
+    negative_cache = supabase_jwt.get_negative_cache()
+    if negative_cache is not None:
+        negative_cache.clear()
+
+
+class AuthBenchmark:
+    """
+    Runs each authentication path cold and warm and collects latency stats.
+    """
+
+    PATHS = ['session', 'drf_token', 'supabase_jwt', 'supabase_backend']
+
+    def __init__(self, iterations=200, paths=None):
+        """
+        Initialize the benchmark.
+
+        Args:
+            iterations: Measured requests per path and mode
+            paths: Subset of PATHS to run (default: all)
+        """
+        self.iterations = iterations
+        self.paths = paths or self.PATHS
+        self.factory = RequestFactory()
+        self.notes = []
+        self._token_keys = []
+
+    def _time(self, call, before=None):
+        durations = []
+        for _ in range(self.iterations):
+            if before:
+                before()
+            started = time.perf_counter()
+            call()
+            durations.append(time.perf_counter() - started)
+        return durations
+
+    def _measure(self, call, make_cold, uncached_reason=None):
+        """
+        Time a path cold and then warm.
+
+        With an ``uncached_reason`` nothing is cached for the path, so cold
+        and warm would do the same work; it is timed once as ``uncached``.
+        """
+        if uncached_reason:
+            self.notes.append(uncached_reason)
+            return {'uncached': self._time(call)}
+        cold = self._time(call, before=make_cold)
+        call()
+        return {'cold': cold, 'warm': self._time(call)}
+
+    def _bench_session(self, user):
+        client = Client()
+        client.force_login(user)
+        session_cookie = client.cookies['sessionid'].value
+        session_middleware = SessionMiddleware(lambda request: None)
+        auth_middleware = AuthenticationMiddleware(lambda request: None)
+        authenticator = SessionAuthentication()
+
+        def call():
+            http_request = self.factory.get('/api/courses/')
+            http_request.COOKIES['sessionid'] = session_cookie
+            session_middleware.process_request(http_request)
+            auth_middleware.process_request(http_request)
+            if authenticator.authenticate(Request(http_request)) is None:
+                raise RuntimeError('Benchmark request was not authenticated')
+
+        # Only cached_db has a cold path: dropping its cache entry makes the
+        # next request read the database. The db engine always reads the
+        # database and the cache engine keeps sessions nowhere else
+        store = session_middleware.SessionStore(session_cookie)
+
+        def make_cold():
+            caches[settings.SESSION_CACHE_ALIAS].delete(store.cache_key)
+
+        uncached_reason = None
+        if not isinstance(store, CachedDBSessionStore):
+            uncached_reason = f"session: {settings.SESSION_ENGINE} has no separate cold and warm path"
+        return self._measure(call, make_cold, uncached_reason)
+
+    def _bench_drf_token(self, user):
+        token, created = Token.objects.get_or_create(user=user)
+        self._token_keys.append(token.key)
+        authenticator = CachedTokenAuthentication()
+        header = f"Token {token.key}"
+
+        def call():
+            http_request = self.factory.get('/api/courses/', HTTP_AUTHORIZATION=header)
+            if authenticator.authenticate(Request(http_request)) is None:
+                raise RuntimeError('Benchmark request was not authenticated')
+
+        uncached_reason = None
+        if not token_cache.caching_enabled():
+            uncached_reason = ('drf_token: the token cache is off (it needs a shared cache such as '
+                               'Redis via REDIS_URL, or AUTH_TOKEN_CACHE_TTL is 0)')
+        return self._measure(call, lambda: invalidate_token(token.key), uncached_reason)
+
+    def _bench_supabase_jwt(self, token, user_id):
+        authenticator = SupabaseJWTAuthentication()
+        header = f"Bearer {token}"
+
+        def call():
+            http_request = self.factory.get('/api/courses/', HTTP_AUTHORIZATION=header)
+            if authenticator.authenticate(http_request) is None:
+                raise RuntimeError('Benchmark request was not authenticated')
+
+        def make_cold():
+            reset_supabase_caches()
+            invalidate_supabase_user(user_id)
+
+        return self._measure(call, make_cold)
+
+    def _bench_supabase_backend(self, token, user_id):
+        backend = SupabaseAuthBackend()
+
+        def call():
+            if backend.authenticate(None, token=token) is None:
+                raise RuntimeError('Benchmark token was not authenticated')
+
+        def make_cold():
+            reset_supabase_caches()
+            invalidate_supabase_user(user_id)
+
+        return self._measure(call, make_cold)
+
+    def run(self):
+        """
+        Run the selected paths.
+
+        Returns:
+            Dictionary keyed by ``<path>.<cold|warm|uncached>`` with latency summaries
+        """
+        minter = TokenMinter(kid=BENCHMARK_KID)
+        server = LocalJWKSServer(minter.public_jwk)
+        supabase_user_id = str(uuid.uuid4())
+        token = minter.mint(supabase_user_id, f"{supabase_user_id[:8]}@benchmark.local")
+        results = {}
+        self.notes = []
+        if not supabase_users.caching_enabled():
+            self.notes.append('supabase_jwt, supabase_backend: the Supabase user cache is off '
+                              '(SUPABASE_USER_CACHE_TTL is 0), so warm runs still query the user')
+
+        try:
+            with override_settings(
+                SUPABASE_JWKS_URL=server.url,
+                SUPABASE_JWT_VERIFICATION_MODE='jwks',
+                SUPABASE_JWKS_MIN_REFRESH_INTERVAL=0,
+            ):
+                try:
+                    with transaction.atomic():
+                        user = User.objects.create_user(
+                            username=f"benchmark-{uuid.uuid4().hex[:12]}",
+                            password=uuid.uuid4().hex,
+                        )
+
+                        for path in self.paths:
+                            if path == 'session':
+                                timings = self._bench_session(user)
+                            elif path == 'drf_token':
+                                timings = self._bench_drf_token(user)
+                            elif path == 'supabase_jwt':
+                                timings = self._bench_supabase_jwt(token, supabase_user_id)
+                            elif path == 'supabase_backend':
+                                timings = self._bench_supabase_backend(token, supabase_user_id)
+                            else:
+                                raise ValueError(f"Unknown authentication path: {path}")
+
+                            for mode, durations in timings.items():
+                                results[f"{path}.{mode}"] = summarize(durations)
+
+                        # Never keep benchmark users, tokens or sessions
+                        transaction.set_rollback(True)
+                finally:
+                    # Still inside the override, so this clears the benchmark's
+                    # JWKS store and not the one for the configured Supabase URL
+                    reset_supabase_caches()
+                    # Cached entries would outlive the rolled-back rows
+                    invalidate_supabase_user(supabase_user_id)
+                    for key in self._token_keys:
+                        invalidate_token(key)
+        finally:
+            server.close()
+
+        return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results against a stored baseline.
+
+    Args:
+        results: Output of ``AuthBenchmark.run``
+        baseline: A previous ``AuthBenchmark.run`` output
+        tolerance: Allowed relative p95 slowdown (0.25 = 25%)
+
+    Returns:
+        List of ``(name, baseline p95, current p95)`` tuples for regressed paths
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('p95_ms'):
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append((name, previous['p95_ms'], current['p95_ms']))
+    return regressions
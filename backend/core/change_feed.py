@@ -0,0 +1,523 @@
+"""
+Postgres LISTEN/NOTIFY change feed.
+
+One connection LISTENs on the configured channels. Notifications are decoded
+into ``ChangeEvent`` objects, queued, and dispatched to the handlers
+subscribed to their channel (for example select cache invalidation, or
+pushing to connected clients). This replaces polling tables for changes.
+
+- Backpressure: when ``queue_size`` events are waiting, the feed stops reading
+  the socket (Postgres holds further notifications for the session) and
+  resumes once the queue has drained to half.
+- Reconnect: a lost connection is re-established with exponential backoff.
+  After LISTENing again, rows committed while disconnected are replayed from
+  the channel's catch-up query, starting at the newest ``created_at`` seen.
+  Events are de-duplicated by ID, so overlaps are harmless.
+- Metrics: per-channel counts and lag from ``created_at`` to dispatch.
+
+LISTEN needs a session-mode connection; Supabase's transaction pooler
+(port 6543) doesn't deliver notifications, so use the direct connection.
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNELS = 'new_notification'
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_WORKERS = 1
+DEFAULT_RECONNECT_DELAY = 1.0
+DEFAULT_MAX_RECONNECT_DELAY = 30.0
+# Seconds before the newest seen created_at that catch-up starts from, for
+# rows whose transactions committed out of created_at order
+DEFAULT_CATCH_UP_OVERLAP = 5.0
+# Rows per catch-up query
+CATCH_UP_PAGE_SIZE = 500
+# Event IDs remembered per channel for de-duplication
+SEEN_IDS_SIZE = 10000
+# Lag samples kept per channel for percentiles
+LAG_SAMPLES = 1000
+
+# Rows missed while disconnected, per channel. Each query returns the same
+# fields as the channel's NOTIFY payload and pages on (created_at, id).
+CATCH_UP_QUERIES = {
+    'new_notification': """
+        SELECT id, type, user_id, created_at
+        FROM public.notifications
+        WHERE created_at > %(since)s OR (created_at = %(since)s AND id::text > %(after_id)s)
+        ORDER BY created_at, id::text
+        LIMIT %(limit)s
+    """,
+}
+
+# Tables whose select cache entries a channel's events invalidate
+CHANNEL_TABLES = {
+    'new_notification': 'notifications',
+}
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        parsed = value
+    elif value:
+        parsed = parse_datetime(str(value))
+    else:
+        return None
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class ChangeEvent:
+    """One decoded notification, live or replayed by catch-up."""
+
+    def __init__(self, channel, payload, replayed=False):
+        """
+        Initialize the event.
+
+        Args:
+            channel: The NOTIFY channel
+            payload: The decoded payload dictionary
+            replayed: True when the event came from a catch-up query
+        """
+        self.channel = channel
+        self.payload = payload
+        self.replayed = replayed
+        self.received_at = time.time()
+        self.id = payload.get('id')
+        self.created_at = _parse_timestamp(payload.get('created_at'))
+
+    @classmethod
+    def from_notify(cls, channel, raw):
+        """Decode a NOTIFY payload; non-JSON payloads are wrapped as ``{'raw': ...}``."""
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            payload = {'raw': raw}
+        if not isinstance(payload, dict):
+            payload = {'value': payload}
+        return cls(channel, payload)
+
+    def __repr__(self):
+        return f"ChangeEvent({self.channel!r}, {self.payload!r}, replayed={self.replayed})"
+
+
+class ChannelStats:
+    """Counters and dispatch lag for one channel."""
+
+    def __init__(self):
+        self.received = 0
+        self.replayed = 0
+        self.duplicates = 0
+        self.dispatched = 0
+        self.handler_errors = 0
+        self.last_event_at = None
+        self._lags = deque(maxlen=LAG_SAMPLES)
+
+    def record_lag(self, seconds):
+        self._lags.append(seconds)
+
+    def stats(self):
+        lags = sorted(self._lags)
+
+        def percentile(fraction):
+            return lags[int(fraction * (len(lags) - 1))] * 1000 if lags else None
+
+        return {
+            'received': self.received,
+            'replayed': self.replayed,
+            'duplicates': self.duplicates,
+            'dispatched': self.dispatched,
+            'handler_errors': self.handler_errors,
+            'last_event_at': self.last_event_at.isoformat() if self.last_event_at else None,
+            'lag_p50_ms': percentile(0.50),
+            'lag_p95_ms': percentile(0.95),
+            'lag_max_ms': lags[-1] * 1000 if lags else None,
+        }
+
+
+def connection_params():
+    """
+    Get psycopg2 connection parameters for the listener.
+
+    Uses SUPABASE_CHANGE_FEED_DSN when set, else the default Django database.
+
+    Returns:
+        Keyword arguments for ``psycopg2.connect``
+    """
+    dsn = getattr(settings, 'SUPABASE_CHANGE_FEED_DSN', '')
+    if dsn:
+        params = {'dsn': dsn}
+    else:
+        database = settings.DATABASES['default']
+        if 'postgresql' not in database['ENGINE']:
+            raise ValueError('The change feed needs PostgreSQL; set SUPABASE_CHANGE_FEED_DSN')
+        params = {
+            'dbname': database.get('NAME'),
+            'user': database.get('USER'),
+            'password': database.get('PASSWORD'),
+            'host': database.get('HOST'),
+            'port': database.get('PORT'),
+            **database.get('OPTIONS', {}),
+        }
+    # TCP keepalives make a silently dropped connection fail instead of hang
+    return {
+        'keepalives': 1,
+        'keepalives_idle': 30,
+        'keepalives_interval': 10,
+        'keepalives_count': 3,
+        **params,
+    }
+
+
+def handlers_from_settings():
+    """
+    Load the handlers configured in SUPABASE_CHANGE_FEED_HANDLERS.
+
+    Returns:
+        Dictionary mapping channels to lists of handler callables
+    """
+    configured = getattr(settings, 'SUPABASE_CHANGE_FEED_HANDLERS', {})
+    return {
+        channel: [import_string(path) if isinstance(path, str) else path for path in paths]
+        for channel, paths in configured.items()
+    }
+
+
+def invalidate_select_cache(event):
+    """Handler dropping cached selects of the table behind an event's channel."""
+    table = CHANNEL_TABLES.get(event.channel)
+    if table is None:
+        return
+    from core.supabase_cache import get_select_cache
+    get_select_cache(settings.SUPABASE_URL).invalidate(table)
+
+
+class ChangeFeed:
+    """
+    Asyncio LISTEN/NOTIFY listener dispatching events to subscribed handlers.
+
+    Handlers take a ``ChangeEvent``. Coroutine functions are awaited on the
+    loop; plain functions run in a worker thread, so they may use the ORM.
+    Subscribe to ``'*'`` to receive every channel.
+    """
+
+    def __init__(self, channels=None, queue_size=None, workers=None, catch_up_queries=None,
+                 catch_up_overlap=None, reconnect_delay=DEFAULT_RECONNECT_DELAY,
+                 max_reconnect_delay=DEFAULT_MAX_RECONNECT_DELAY, since=None, connect_params=None):
+        """
+        Initialize the feed.
+
+        Args:
+            channels: Channels to LISTEN on (default SUPABASE_CHANGE_FEED_CHANNELS)
+            queue_size: Queued events at which reading pauses (default SUPABASE_CHANGE_FEED_QUEUE_SIZE)
+            workers: Concurrent dispatchers; 1 keeps events in order (default SUPABASE_CHANGE_FEED_WORKERS)
+            catch_up_queries: Channel to SQL mapping for replaying missed rows (default CATCH_UP_QUERIES)
+            catch_up_overlap: Seconds of overlap when replaying (default SUPABASE_CHANGE_FEED_CATCH_UP_OVERLAP)
+            reconnect_delay: Initial seconds between reconnect attempts
+            max_reconnect_delay: Upper bound for the reconnect backoff
+            since: Replay rows created after this datetime on the first connect too
+            connect_params: psycopg2 connection parameters (default ``connection_params()``)
+        """
+        if channels is None:
+            channels = getattr(settings, 'SUPABASE_CHANGE_FEED_CHANNELS', DEFAULT_CHANNELS)
+        if isinstance(channels, str):
+            channels = [channel.strip() for channel in channels.split(',') if channel.strip()]
+        self.channels = list(channels)
+        self.queue_size = queue_size or getattr(settings, 'SUPABASE_CHANGE_FEED_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.workers = workers or getattr(settings, 'SUPABASE_CHANGE_FEED_WORKERS', DEFAULT_WORKERS)
+        self.catch_up_queries = CATCH_UP_QUERIES if catch_up_queries is None else catch_up_queries
+        if catch_up_overlap is None:
+            catch_up_overlap = getattr(settings, 'SUPABASE_CHANGE_FEED_CATCH_UP_OVERLAP', DEFAULT_CATCH_UP_OVERLAP)
+        self.catch_up_overlap = timedelta(seconds=catch_up_overlap)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._connect_params = connect_params
+
+        self._handlers = {}
+        # Newest created_at received per channel, where catch-up resumes
+        self._watermarks = {channel: since for channel in self.channels} if since else {}
+        self._seen = {}
+        self._channel_stats = {channel: ChannelStats() for channel in self.channels}
+
+        self._loop = None
+        self._queue = None
+        self._room = None
+        self._stopping = None
+        self._conn = None
+        self._lost = None
+        self._reading = False
+
+        self.connected = False
+        self.reconnects = 0
+        self.pauses = 0
+
+    def subscribe(self, channel, handler):
+        """
+        Register a handler for a channel's events.
+
+        Args:
+            channel: Channel name, or ``'*'`` for all channels
+            handler: Callable or coroutine function taking a ChangeEvent
+        """
+        self._handlers.setdefault(channel, []).append(handler)
+        return handler
+
+    def unsubscribe(self, channel, handler):
+        handlers = self._handlers.get(channel, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    # Queueing and dispatch
+    def _setup(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._stopping = asyncio.Event()
+
+    def _accept(self, event):
+        """Queue an event unless it was already seen; returns False for duplicates."""
+        stats = self._channel_stats.setdefault(event.channel, ChannelStats())
+        if event.id is not None:
+            seen = self._seen.setdefault(event.channel, OrderedDict())
+            if event.id in seen:
+                stats.duplicates += 1
+                return False
+            seen[event.id] = None
+            if len(seen) > SEEN_IDS_SIZE:
+                seen.popitem(last=False)
+
+        stats.received += 1
+        if event.replayed:
+            stats.replayed += 1
+        if event.created_at is not None:
+            watermark = self._watermarks.get(event.channel)
+            if watermark is None or event.created_at > watermark:
+                self._watermarks[event.channel] = event.created_at
+
+        self._queue.put_nowait(event)
+        if self._queue.qsize() >= self.queue_size:
+            self._room.clear()
+            self._pause_reading()
+        return True
+
+    async def _wait_for_room(self):
+        await self._room.wait()
+
+    def _drained(self):
+        if not self._room.is_set() and self._queue.qsize() <= self.queue_size // 2:
+            self._room.set()
+            self._resume_reading()
+
+    async def _dispatch(self, event):
+        stats = self._channel_stats[event.channel]
+        for handler in self._handlers.get(event.channel, []) + self._handlers.get('*', []):
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(event)
+                else:
+                    await asyncio.to_thread(handler, event)
+            except Exception:
+                stats.handler_errors += 1
+                logger.exception(f"Change feed handler {handler!r} failed for {event!r}")
+
+        stats.dispatched += 1
+        now = datetime.now(timezone.utc)
+        stats.last_event_at = now
+        # Without created_at in the payload, lag is the time spent queued
+        if event.created_at is not None:
+            stats.record_lag(max(0.0, (now - event.created_at).total_seconds()))
+        else:
+            stats.record_lag(max(0.0, time.time() - event.received_at))
+
+    async def _worker(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self._dispatch(event)
+            finally:
+                self._queue.task_done()
+                self._drained()
+
+    # Connection
+    def _pause_reading(self):
+        if self._reading and self._conn is not None:
+            self._loop.remove_reader(self._conn.fileno())
+            self._reading = False
+            self.pauses += 1
+            logger.warning(f"Change feed paused: {self._queue.qsize()} events queued")
+
+    def _resume_reading(self):
+        # Not during catch-up, which uses the connection from a worker thread
+        if not self._reading and self.connected:
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+            self._reading = True
+            # Notifications may have arrived while paused
+            self._on_readable()
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            self._connection_lost(e)
+            return
+        self._take_notifies()
+
+    def _take_notifies(self):
+        while self._conn.notifies and self._room.is_set():
+            notify = self._conn.notifies.pop(0)
+            self._accept(ChangeEvent.from_notify(notify.channel, notify.payload))
+
+    def _connection_lost(self, error):
+        if self._reading:
+            self._loop.remove_reader(self._conn.fileno())
+            self._reading = False
+        if self._lost is not None and not self._lost.done():
+            self._lost.set_exception(error)
+
+    def _connect(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+        from psycopg2 import sql
+
+        conn = psycopg2.connect(**(self._connect_params or connection_params()))
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            for channel in self.channels:
+                cursor.execute(sql.SQL('LISTEN {}').format(sql.Identifier(channel)))
+        return conn
+
+    def _fetch_missed(self, channel, since, after_id):
+        with self._conn.cursor() as cursor:
+            cursor.execute(self.catch_up_queries[channel], {
+                'since': since,
+                'after_id': after_id,
+                'limit': CATCH_UP_PAGE_SIZE,
+            })
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    async def _catch_up(self):
+        """Replay rows created since each channel's watermark."""
+        for channel in self.channels:
+            watermark = self._watermarks.get(channel)
+            if watermark is None or channel not in self.catch_up_queries:
+                continue
+            since = watermark - self.catch_up_overlap
+            after_id = ''
+            replayed = 0
+            while True:
+                rows = await asyncio.to_thread(self._fetch_missed, channel, since, after_id)
+                for row in rows:
+                    await self._wait_for_room()
+                    # Match the JSON the trigger would have sent
+                    payload = {
+                        key: value.isoformat() if isinstance(value, datetime) else
+                        str(value) if isinstance(value, uuid.UUID) else value
+                        for key, value in row.items()
+                    }
+                    if self._accept(ChangeEvent(channel, payload, replayed=True)):
+                        replayed += 1
+                if len(rows) < CATCH_UP_PAGE_SIZE:
+                    break
+                since, after_id = rows[-1]['created_at'], str(rows[-1]['id'])
+            if replayed:
+                logger.info(f"Change feed replayed {replayed} missed {channel} events")
+
+    async def _listen_once(self):
+        """Connect, LISTEN, replay missed rows and read until the connection is lost or the feed stops."""
+        self._conn = await asyncio.to_thread(self._connect)
+        self._lost = self._loop.create_future()
+        try:
+            # LISTEN is active before the catch-up query, so nothing falls in between;
+            # notifications arriving meanwhile are buffered on the connection
+            await self._catch_up()
+            self.connected = True
+            logger.info(f"Change feed listening on {', '.join(self.channels)}")
+
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+            self._reading = True
+            self._take_notifies()
+
+            stopping = asyncio.ensure_future(self._stopping.wait())
+            try:
+                await asyncio.wait([self._lost, stopping], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                stopping.cancel()
+            if self._lost.done():
+                self._lost.result()
+        finally:
+            self.connected = False
+            if self._reading:
+                self._loop.remove_reader(self._conn.fileno())
+                self._reading = False
+            if not self._lost.done():
+                self._lost.cancel()
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def run(self):
+        """
+        Listen and dispatch until ``stop()`` is called, reconnecting as needed.
+        """
+        self._setup()
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+        delay = self.reconnect_delay
+        try:
+            while not self._stopping.is_set():
+                connected_at = time.monotonic()
+                try:
+                    await self._listen_once()
+                except Exception as e:
+                    logger.warning(f"Change feed connection failed: {e}")
+                if self._stopping.is_set():
+                    break
+
+                # A connection that stayed up for a while starts the backoff over
+                if time.monotonic() - connected_at > self.max_reconnect_delay:
+                    delay = self.reconnect_delay
+                self.reconnects += 1
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=delay * (1 + random.random() * 0.2))
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+            # Let queued events finish before returning
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    def stop(self):
+        if self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def stats(self):
+        """
+        Get connection state, queue depth and per-channel metrics.
+
+        Returns:
+            Dictionary of feed and channel statistics
+        """
+        return {
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'paused': self._room is not None and not self._room.is_set(),
+            'pauses': self.pauses,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'channels': {channel: stats.stats() for channel, stats in self._channel_stats.items()},
+        }
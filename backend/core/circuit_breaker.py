@@ -0,0 +1,249 @@
+"""
+Circuit breakers and per-operation backend selection for the Supabase clients.
+
+``SupabaseClient`` can reach Supabase through the Python SDK or through direct
+REST calls. ``BackendSelector`` keeps one circuit breaker per operation and
+backend, so a backend that keeps failing for an operation is skipped instead
+of costing a failed attempt on every call, and is probed again later.
+"""
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CircuitOpenError(Exception):
+    """Raised when every backend for an operation has an open circuit."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls are allowed; ``failure_threshold`` consecutive failures open it.
+    Open: calls are refused until ``reset_timeout`` seconds have passed.
+    Half-open: one probe call is allowed; success closes the circuit, failure
+    re-opens it for another ``reset_timeout``.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT):
+        """
+        Initialize a closed breaker.
+
+        Args:
+            name: Name used in logs and metrics
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self):
+        """
+        Check whether a call may go through, claiming the probe slot when half-open.
+
+        Returns:
+            True if the call should be attempted
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit {self.name} closed")
+            self._state = self.CLOSED
+            self._probing = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(error) if error is not None else None
+            state = self._current_state()
+            if state == self.HALF_OPEN or (
+                state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self.opened += 1
+                logger.warning(
+                    f"Circuit {self.name} opened after {self.consecutive_failures} "
+                    f"consecutive failures: {self.last_error}"
+                )
+
+    def reset(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._probing = False
+            self.consecutive_failures = 0
+
+    def stats(self):
+        """
+        Get the breaker state and counters.
+
+        Returns:
+            Dictionary of state and counters
+        """
+        with self._lock:
+            state = self._current_state()
+            retry_in = 0.0
+            if state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                'state': state,
+                'consecutive_failures': self.consecutive_failures,
+                'successes': self.successes,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'opened': self.opened,
+                'retry_in_seconds': retry_in,
+                'last_error': self.last_error,
+            }
+
+
+class BackendSelector:
+    """
+    Runs an operation on the first healthy backend, in priority order.
+
+    Each (operation, backend) pair has its own breaker, so the SDK being
+    broken for admin calls doesn't stop it from serving table reads.
+    """
+
+    def __init__(self, backends, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, is_failure=None):
+        """
+        Initialize the selector.
+
+        Args:
+            backends: Backend names in priority order, e.g. ``['sdk', 'direct']``
+            failure_threshold: Consecutive failures that open a breaker
+            reset_timeout: Seconds a breaker stays open before probing
+            is_failure: Optional callable ``(backend, exc)`` returning False for
+                errors that don't indicate an unhealthy backend (e.g. HTTP 404)
+        """
+        self.backends = list(backends)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, operation, backend):
+        """Get (creating on first use) the breaker for an operation and backend."""
+        key = (operation, backend)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(
+                        f"{operation}/{backend}",
+                        failure_threshold=self.failure_threshold,
+                        reset_timeout=self.reset_timeout,
+                    )
+        return breaker
+
+    def call(self, operation, implementations):
+        """
+        Run an operation on the first backend whose breaker allows it.
+
+        A failing backend falls through to the next one. An error that
+        ``is_failure`` says is not a backend failure is raised straight away.
+
+        Args:
+            operation: Operation name, e.g. ``'get_user'``
+            implementations: Dictionary mapping backend names to zero-argument callables
+
+        Returns:
+            The result of the first successful backend
+
+        Raises:
+            CircuitOpenError: When every backend's breaker is open
+            Exception: The last backend's error when all attempted backends fail
+        """
+        last_error = None
+        for backend in self.backends:
+            fn = implementations.get(backend)
+            if fn is None:
+                continue
+            breaker = self.breaker(operation, backend)
+            if not breaker.allow():
+                continue
+            try:
+                result = fn()
+            except Exception as e:
+                if self.is_failure is not None and not self.is_failure(backend, e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure(e)
+                logger.debug(f"{operation} failed on {backend}: {e}")
+                last_error = e
+                continue
+            breaker.record_success()
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise CircuitOpenError(f"All backends for {operation} are unavailable")
+
+    def stats(self):
+        """
+        Get breaker state for every operation and backend used so far.
+
+        Returns:
+            Dictionary mapping operation names to ``{backend: breaker stats}``
+        """
+        with self._lock:
+            breakers = list(self._breakers.items())
+        stats = {}
+        for (operation, backend), breaker in breakers:
+            stats.setdefault(operation, {})[backend] = breaker.stats()
+        return stats
+
+    def reset(self):
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
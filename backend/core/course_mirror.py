@@ -0,0 +1,373 @@
+"""
+Incremental mirror of the Supabase ``courses`` table into ``core.models.Course``.
+
+Each run reads the rows changed since the stored ``(updated_at, id)``
+watermark, in keyset order, and upserts them locally one page at a time;
+the watermark is saved in the same transaction as the page, so an
+interrupted run resumes where it stopped. ``is_active`` is mirrored to
+``is_published``, so deactivated courses stop being served.
+
+A row can commit after rows with a later ``updated_at`` were already
+mirrored, so each run starts ``SUPABASE_COURSE_MIRROR_OVERLAP`` seconds
+before the watermark. Re-read rows whose ``updated_at`` is unchanged are
+skipped.
+
+The mirror reads with the service key, since RLS hides inactive courses
+from the anon key; without ``SUPABASE_SERVICE_KEY`` a run fails rather
+than unpublishing or deleting courses it can't see.
+
+A watermark can't see deletions, so every ``SUPABASE_COURSE_MIRROR_FULL_SYNC_INTERVAL``
+seconds a full run also scans the upstream IDs. Mirrored courses that are gone
+upstream are deleted, or unpublished if they have enrollments (deleting them
+would cascade to the enrollments).
+
+``SupabaseCourseListView`` serves from the mirror while the last successful run
+is at most ``SUPABASE_COURSE_MIRROR_MAX_STALENESS`` seconds old.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from core.direct_supabase import Q
+from core.models import Course, SyncState
+
+logger = logging.getLogger(__name__)
+
+MIRROR_NAME = 'supabase_courses'
+
+DEFAULT_PAGE_SIZE = 500
+# Seconds between full runs that also detect deletions
+DEFAULT_FULL_SYNC_INTERVAL = 3600
+# Seconds before the watermark each run re-reads, for late-committing rows
+DEFAULT_OVERLAP = 60
+# Oldest mirror the course list is served from, in seconds (0 always reads Supabase)
+DEFAULT_MAX_STALENESS = 300
+
+MIRRORED_FIELDS = [
+    'title', 'description', 'price', 'image_url', 'is_published',
+    'supabase_created_at', 'supabase_updated_at',
+]
+
+# Upstream column names accepted in ``order`` and the local fields they sort on
+ORDER_FIELDS = {
+    'id': 'supabase_id',
+    'title': 'title',
+    'price': 'price',
+    'created_at': 'supabase_created_at',
+    'updated_at': 'supabase_updated_at',
+}
+
+# IDs per query when removing courses that are gone upstream
+DELETE_BATCH_SIZE = 500
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def course_fields(row):
+    """
+    Map a Supabase ``courses`` row to ``Course`` field values.
+
+    Args:
+        row: The row dictionary
+
+    Returns:
+        Dictionary of the mirrored field values
+    """
+    return {
+        'title': (row.get('title') or '')[:255],
+        'description': row.get('description') or '',
+        'price': Decimal(str(row.get('price') or 0)),
+        'image_url': row.get('image_url') or None,
+        # is_active defaults to true upstream
+        'is_published': row.get('is_active') is not False,
+        'supabase_created_at': _parse_timestamp(row.get('created_at')),
+        'supabase_updated_at': _parse_timestamp(row.get('updated_at')),
+    }
+
+
+def course_row(course):
+    """
+    Render a mirrored course in the shape of a Supabase ``courses`` row.
+
+    Args:
+        course: A mirrored Course
+
+    Returns:
+        The row dictionary
+    """
+    return {
+        'id': course.supabase_id,
+        'title': course.title,
+        'description': course.description,
+        'image_url': course.image_url,
+        'price': float(course.price),
+        'is_active': course.is_published,
+        'created_at': course.supabase_created_at.isoformat() if course.supabase_created_at else None,
+        'updated_at': course.supabase_updated_at.isoformat() if course.supabase_updated_at else None,
+    }
+
+
+def order_by_from_param(order):
+    """
+    Translate a PostgREST ``order`` parameter into ``order_by`` arguments.
+
+    Args:
+        order: e.g. ``created_at.desc`` or ``price.asc,title``
+
+    Returns:
+        List of order_by arguments, or None if a column isn't mirrored
+    """
+    order_by = []
+    for term in [t for t in (order or '').split(',') if t]:
+        column, *modifiers = term.split('.')
+        field = ORDER_FIELDS.get(column)
+        if field is None:
+            return None
+        order_by.append(f"-{field}" if 'desc' in modifiers else field)
+    # Ties break on the upstream ID, like the keyset order
+    if 'supabase_id' not in [f.lstrip('-') for f in order_by]:
+        order_by.append('supabase_id')
+    return order_by
+
+
+def mirror_age(name=MIRROR_NAME):
+    """
+    Get the time since the last successful mirror run.
+
+    Returns:
+        A timedelta, or None if the mirror has never completed a run
+    """
+    state = SyncState.objects.filter(name=name).only('last_synced_at').first()
+    if state is None or state.last_synced_at is None:
+        return None
+    return timezone.now() - state.last_synced_at
+
+
+def mirrored_courses(limit, order='created_at.desc', max_staleness=None):
+    """
+    Read active courses from the local mirror if it is fresh enough.
+
+    Args:
+        limit: Maximum number of courses
+        order: PostgREST ``order`` parameter
+        max_staleness: Oldest acceptable mirror in seconds (default SUPABASE_COURSE_MIRROR_MAX_STALENESS)
+
+    Returns:
+        List of course rows, or None when the caller should read Supabase instead
+    """
+    if max_staleness is None:
+        max_staleness = getattr(settings, 'SUPABASE_COURSE_MIRROR_MAX_STALENESS', DEFAULT_MAX_STALENESS)
+    if not max_staleness:
+        return None
+
+    order_by = order_by_from_param(order)
+    if order_by is None:
+        return None
+
+    age = mirror_age()
+    if age is None or age.total_seconds() > max_staleness:
+        return None
+
+    courses = (Course.objects
+               .filter(supabase_id__isnull=False, is_published=True)
+               .order_by(*order_by)[:limit])
+    return [course_row(course) for course in courses]
+
+
+class CourseMirror:
+    """
+    Mirrors Supabase ``courses`` rows into the local Course table.
+    """
+
+    def __init__(self, client=None, page_size=None, full_sync_interval=None, overlap=None, table='courses',
+                 name=MIRROR_NAME):
+        """
+        Initialize the mirror.
+
+        Args:
+            client: DirectSupabaseClient to read from (defaults to the shared instance)
+            page_size: Rows per keyset page (default SUPABASE_COURSE_MIRROR_PAGE_SIZE)
+            full_sync_interval: Seconds between runs that detect deletions
+                (default SUPABASE_COURSE_MIRROR_FULL_SYNC_INTERVAL)
+            overlap: Seconds before the watermark each run re-reads
+                (default SUPABASE_COURSE_MIRROR_OVERLAP)
+            table: The Supabase table to mirror
+            name: Name of the SyncState row holding the watermark
+        """
+        if client is None:
+            from core.direct_supabase import supabase as client
+        self.client = client
+        self.page_size = page_size or getattr(settings, 'SUPABASE_COURSE_MIRROR_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+        if full_sync_interval is None:
+            full_sync_interval = getattr(
+                settings, 'SUPABASE_COURSE_MIRROR_FULL_SYNC_INTERVAL', DEFAULT_FULL_SYNC_INTERVAL
+            )
+        self.full_sync_interval = full_sync_interval
+        if overlap is None:
+            overlap = getattr(settings, 'SUPABASE_COURSE_MIRROR_OVERLAP', DEFAULT_OVERLAP)
+        self.overlap = timedelta(seconds=overlap)
+        self.table = table
+        self.name = name
+
+    def state(self):
+        state, _ = SyncState.objects.get_or_create(name=self.name)
+        return state
+
+    def _changed_page(self, since, after):
+        # The service key is needed to see inactive courses through RLS
+        query = (self.client.query(self.table)
+                 .with_service_key()
+                 .order('updated_at')
+                 .order('id')
+                 .limit(self.page_size))
+        if after is not None:
+            updated_at, course_id = after
+            query.or_(
+                Q.gt('updated_at', updated_at),
+                Q.and_(Q.eq('updated_at', updated_at), Q.gt('id', course_id)),
+            )
+        elif since is not None:
+            query.gte('updated_at', since.isoformat())
+        else:
+            query.not_('updated_at', 'is', None)
+        return query.execute().data or []
+
+    def _apply(self, rows, now):
+        existing = {
+            course.supabase_id: course
+            for course in Course.objects.filter(supabase_id__in=[row['id'] for row in rows])
+        }
+        created = []
+        updated = []
+        for row in rows:
+            fields = course_fields(row)
+            course = existing.get(row['id'])
+            if course is not None and course.supabase_updated_at == fields['supabase_updated_at']:
+                # Already mirrored; re-read from the overlap window
+                continue
+            if course is None:
+                # bulk_create skips Course.save(), so the slug is set here
+                slug = f"{slugify(fields['title'])[:200] or 'course'}-{row['id']}"
+                created.append(Course(supabase_id=row['id'], slug=slug, synced_at=now, **fields))
+            else:
+                for name, value in fields.items():
+                    setattr(course, name, value)
+                course.synced_at = now
+                updated.append(course)
+
+        Course.objects.bulk_create(created)
+        Course.objects.bulk_update(updated, MIRRORED_FIELDS + ['synced_at'])
+        return len(created), len(updated)
+
+    def _upstream_ids(self):
+        ids = set()
+        after = None
+        while True:
+            query = (self.client.query(self.table)
+                     .select('id')
+                     .with_service_key()
+                     .order('id')
+                     .limit(self.page_size))
+            if after is not None:
+                query.gt('id', after)
+            rows = query.execute().data or []
+            ids.update(row['id'] for row in rows)
+            if len(rows) < self.page_size:
+                return ids
+            after = rows[-1]['id']
+
+    def _remove_missing(self, upstream_ids, now):
+        local_ids = set(Course.objects.filter(supabase_id__isnull=False).values_list('supabase_id', flat=True))
+        missing = sorted(local_ids - upstream_ids)
+        if missing and not upstream_ids:
+            # An empty upstream is far more likely a key or RLS problem than a wiped catalog
+            logger.warning(f"Supabase returned no {self.table}; not removing {len(missing)} mirrored courses")
+            return 0, 0
+
+        deleted = 0
+        unpublished = 0
+        for start in range(0, len(missing), DELETE_BATCH_SIZE):
+            batch = missing[start:start + DELETE_BATCH_SIZE]
+            with transaction.atomic():
+                enrolled = set(
+                    Course.objects.filter(supabase_id__in=batch, enrollments__isnull=False)
+                    .values_list('supabase_id', flat=True)
+                )
+                unpublished += Course.objects.filter(supabase_id__in=enrolled).update(
+                    is_published=False, synced_at=now
+                )
+                deleted += Course.objects.filter(
+                    supabase_id__in=[course_id for course_id in batch if course_id not in enrolled]
+                ).delete()[1].get(Course._meta.label, 0)
+        return deleted, unpublished
+
+    def sync(self, full=None):
+        """
+        Apply upstream changes since the last run.
+
+        Args:
+            full: Also remove courses deleted upstream; by default only when
+                the last full run is older than ``full_sync_interval``
+
+        Returns:
+            Dictionary of counts: created, updated, deleted, unpublished, pages, full
+        """
+        started = timezone.now()
+        state = self.state()
+        if full is None:
+            full = (state.last_full_sync_at is None
+                    or started - state.last_full_sync_at >= timedelta(seconds=self.full_sync_interval))
+
+        result = {'created': 0, 'updated': 0, 'deleted': 0, 'unpublished': 0, 'pages': 0, 'full': full}
+        watermark = _parse_timestamp(state.watermark)
+        since = watermark - self.overlap if watermark is not None else None
+        after = None
+        try:
+            while True:
+                rows = self._changed_page(since, after)
+                if rows:
+                    last = rows[-1]
+                    after = (last['updated_at'], last['id'])
+                    with transaction.atomic():
+                        created, updated = self._apply(rows, started)
+                        # Advance the watermark together with the page it covers,
+                        # but not back into the overlap window
+                        last_key = (_parse_timestamp(last['updated_at']), last['id'])
+                        if watermark is None or last_key > (watermark, int(state.watermark_key or 0)):
+                            state.watermark = last['updated_at']
+                            state.watermark_key = str(last['id'])
+                            state.save(update_fields=['watermark', 'watermark_key'])
+                            watermark = last_key[0]
+                    result['created'] += created
+                    result['updated'] += updated
+                    result['pages'] += 1
+                if len(rows) < self.page_size:
+                    break
+
+            if full:
+                result['deleted'], result['unpublished'] = self._remove_missing(self._upstream_ids(), started)
+                state.last_full_sync_at = started
+        except Exception as e:
+            state.last_error = str(e)
+            state.save(update_fields=['last_error'])
+            raise
+
+        # Staleness is measured from when the upstream reads began
+        state.last_synced_at = started
+        state.last_error = ''
+        state.save(update_fields=['last_synced_at', 'last_full_sync_at', 'last_error'])
+
+        logger.info(f"Course mirror sync: {result}")
+        return result
@@ -4,12 +4,451 @@ Bypasses the Supabase Python SDK to communicate directly with the Supabase REST
 """
 import os
 import json
+import logging
 import requests
 from dotenv import load_dotenv
 
+from core.http_pool import get_http_client
+from core.supabase_cache import get_select_cache, select_cache_key
+from core.singleflight import SingleFlight
+from core.supabase_bulk import bulk_send, upsert_request
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+def select_params(columns="*", filters=None, limit=None, order=None):
+    """
+    Build PostgREST query parameters for a select.
+    
+    Args:
+        columns: Columns to select (default "*")
+        filters: Dictionary of column/value pairs to filter by
+        limit: Maximum number of records to return
+        order: Order by clause
+        
+    Returns:
+        Dictionary of query parameters
+    """
+    params = {}
+    
+    # Add filters
+    if filters:
+        for column, value in filters.items():
+            params[column] = f"eq.{value}"
+    
+    # Add pagination
+    if limit:
+        params["limit"] = limit
+    
+    # Add ordering
+    if order:
+        params["order"] = order
+    
+    # Add column selection
+    if columns and columns != "*":
+        params["select"] = columns
+    
+    return params
+
+
+def keyset_params(columns="*", filters=None, page_size=1000, key="id", after=None):
+    """
+    Build PostgREST query parameters for one keyset page.
+    
+    Args:
+        columns: Columns to select (default "*"); the key column is added if missing
+        filters: Dictionary of column/value pairs to filter by
+        page_size: Maximum number of records in the page
+        key: Unique, sortable column to page by
+        after: Key value of the last record of the previous page
+        
+    Returns:
+        Dictionary of query parameters
+    """
+    if filters and key in filters:
+        raise ValueError(f"Cannot filter on the keyset column '{key}'")
+    
+    if columns and columns != "*" and key not in [c.strip() for c in columns.split(",")]:
+        columns = f"{columns},{key}"
+    
+    params = select_params(columns, filters, page_size, f"{key}.asc")
+    if after is not None:
+        params[key] = f"gt.{after}"
+    return params
+
+
+FILTER_OPERATORS = ("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "in", "is")
+COUNT_METHODS = ("exact", "planned", "estimated")
+
+# Characters with a meaning inside PostgREST lists and logic trees
+_RESERVED_CHARS = set(',.:()" \\')
+
+
+def format_value(value):
+    """Render a Python value as a PostgREST filter value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def quote_value(value):
+    """Render a value for use inside an ``in`` list or an ``or``/``and`` group."""
+    text = format_value(value)
+    if any(char in _RESERVED_CHARS for char in text):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+def format_filter(operator, value, nested=False):
+    """
+    Render ``<operator>.<value>`` for a filter.
+    
+    Args:
+        operator: One of FILTER_OPERATORS
+        value: The value; a sequence for ``in``, None/True/False for ``is``
+        nested: Quote the value for use inside an ``or``/``and`` group
+        
+    Returns:
+        The filter expression
+    """
+    if operator not in FILTER_OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+    if operator == "in":
+        return f"in.({','.join(quote_value(item) for item in value)})"
+    if operator == "is":
+        if value not in (None, True, False):
+            raise ValueError("The 'is' operator only accepts None, True or False")
+        return f"is.{format_value(value)}"
+    return f"{operator}.{quote_value(value) if nested else format_value(value)}"
+
+
+class Condition:
+    """
+    One filter or a logic group, for use in ``Query.or_`` and ``Query.and_``.
+    
+    Build them with the ``Q`` helpers, e.g.
+    ``Q.or_(Q.eq("level", "beginner"), Q.and_(Q.gte("price", 10), Q.lt("price", 50)))``.
+    """
+    
+    def __init__(self, text, group=False):
+        self.text = text
+        self.group = group
+    
+    def negate(self):
+        # Groups are negated as not.and(...), single filters as col.not.op.value
+        if self.group:
+            return Condition(f"not.{self.text}", group=True)
+        column, _, expression = self.text.partition(".")
+        return Condition(f"{column}.not.{expression}")
+    
+    def __str__(self):
+        return self.text
+    
+    def __repr__(self):
+        return f"Condition({self.text!r})"
+
+
+class Q:
+    """Builders for conditions used inside ``or``/``and`` groups."""
+    
+    @staticmethod
+    def filter(column, operator, value):
+        return Condition(f"{column}.{format_filter(operator, value, nested=True)}")
+    
+    @staticmethod
+    def eq(column, value):
+        return Q.filter(column, "eq", value)
+    
+    @staticmethod
+    def neq(column, value):
+        return Q.filter(column, "neq", value)
+    
+    @staticmethod
+    def gt(column, value):
+        return Q.filter(column, "gt", value)
+    
+    @staticmethod
+    def gte(column, value):
+        return Q.filter(column, "gte", value)
+    
+    @staticmethod
+    def lt(column, value):
+        return Q.filter(column, "lt", value)
+    
+    @staticmethod
+    def lte(column, value):
+        return Q.filter(column, "lte", value)
+    
+    @staticmethod
+    def like(column, pattern):
+        return Q.filter(column, "like", pattern)
+    
+    @staticmethod
+    def ilike(column, pattern):
+        return Q.filter(column, "ilike", pattern)
+    
+    @staticmethod
+    def in_(column, values):
+        return Q.filter(column, "in", values)
+    
+    @staticmethod
+    def is_(column, value):
+        return Q.filter(column, "is", value)
+    
+    @staticmethod
+    def not_(condition):
+        return condition.negate()
+    
+    @staticmethod
+    def or_(*conditions):
+        return Condition(f"or({','.join(str(c) for c in conditions)})", group=True)
+    
+    @staticmethod
+    def and_(*conditions):
+        return Condition(f"and({','.join(str(c) for c in conditions)})", group=True)
+
+
+class QueryResult:
+    """
+    Rows returned by a query, with the total count when one was requested.
+    
+    Attributes:
+        data: List of records (empty for count-only requests)
+        count: Total matching rows from ``Content-Range``, or None
+        content_range: The raw ``Content-Range`` header
+    """
+    
+    def __init__(self, data, count=None, content_range=None):
+        self.data = data
+        self.count = count
+        self.content_range = content_range
+    
+    @classmethod
+    def from_response(cls, response):
+        """Build a result from a ``requests`` or ``httpx`` response."""
+        content_range = response.headers.get("Content-Range")
+        count = None
+        if content_range and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            if total != "*":
+                count = int(total)
+        data = response.json() if response.content else []
+        return cls(data, count, content_range)
+
+
+class Query:
+    """
+    Chainable PostgREST query with filtering, projection and counting done in Postgres.
+    
+    Example::
+    
+        result = (supabase.query("courses")
+                  .select("id,name,instructor:profiles(full_name)")
+                  .eq("is_active", True)
+                  .in_("level", ["beginner", "intermediate"])
+                  .or_(Q.ilike("name", "*django*"), Q.lt("price", 20))
+                  .order("created_at", desc=True)
+                  .range(0, 19)
+                  .count("exact")
+                  .execute())
+        result.data, result.count
+    
+    Runs on the client that created it: ``execute()`` and ``count_only()`` are
+    coroutines when the query comes from ``AsyncDirectSupabaseClient``.
+    Queries bypass the select cache.
+    """
+    
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self._columns = "*"
+        self._embeds = []
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+        self._range = None
+        self._count = None
+        self.service_role = False
+    
+    # Projection
+    def select(self, columns="*"):
+        """Set the columns to return; may include embedded resources like ``profiles(name)``."""
+        self._columns = columns
+        return self
+    
+    def embed(self, resource, columns="*", alias=None, inner=False):
+        """
+        Embed a related table through its foreign key.
+        
+        Args:
+            resource: The related table (optionally with a ``!fk_hint``)
+            columns: Columns of the related table, which may embed further
+            alias: Name of the embedded field in the result
+            inner: Only return rows that have a matching related row
+        """
+        embed = f"{resource}!inner" if inner else resource
+        if alias:
+            embed = f"{alias}:{embed}"
+        self._embeds.append(f"{embed}({columns})")
+        return self
+    
+    # Filters
+    def filter(self, column, operator, value):
+        """Add a ``column=<operator>.<value>`` filter."""
+        self._filters.append((column, format_filter(operator, value)))
+        return self
+    
+    def not_(self, column, operator, value):
+        """Add a negated filter, ``column=not.<operator>.<value>``."""
+        self._filters.append((column, f"not.{format_filter(operator, value)}"))
+        return self
+    
+    def eq(self, column, value):
+        return self.filter(column, "eq", value)
+    
+    def neq(self, column, value):
+        return self.filter(column, "neq", value)
+    
+    def gt(self, column, value):
+        return self.filter(column, "gt", value)
+    
+    def gte(self, column, value):
+        return self.filter(column, "gte", value)
+    
+    def lt(self, column, value):
+        return self.filter(column, "lt", value)
+    
+    def lte(self, column, value):
+        return self.filter(column, "lte", value)
+    
+    def like(self, column, pattern):
+        return self.filter(column, "like", pattern)
+    
+    def ilike(self, column, pattern):
+        return self.filter(column, "ilike", pattern)
+    
+    def in_(self, column, values):
+        return self.filter(column, "in", list(values))
+    
+    def is_(self, column, value):
+        return self.filter(column, "is", value)
+    
+    def or_(self, *conditions):
+        """Match rows satisfying any of the conditions (built with ``Q``)."""
+        self._filters.append(("or", f"({','.join(str(c) for c in conditions)})"))
+        return self
+    
+    def and_(self, *conditions):
+        """Match rows satisfying all of the conditions (built with ``Q``)."""
+        self._filters.append(("and", f"({','.join(str(c) for c in conditions)})"))
+        return self
+    
+    # Ordering and paging
+    def order(self, column, desc=False, nulls=None):
+        """
+        Add a sort key.
+        
+        Args:
+            column: Column to sort by
+            desc: Sort descending
+            nulls: "first" or "last" to place nulls explicitly
+        """
+        term = f"{column}.{'desc' if desc else 'asc'}"
+        if nulls:
+            term = f"{term}.nulls{nulls}"
+        self._order.append(term)
+        return self
+    
+    def limit(self, limit):
+        self._limit = limit
+        return self
+    
+    def offset(self, offset):
+        self._offset = offset
+        return self
+    
+    def range(self, start, end):
+        """Request rows ``start`` to ``end`` inclusive with a ``Range`` header."""
+        self._range = (start, end)
+        return self
+    
+    def count(self, method="exact"):
+        """
+        Also return the total number of matching rows.
+        
+        Args:
+            method: "exact" (COUNT(*)), "planned" (planner estimate) or
+                "estimated" (exact up to the server's max-rows, planned beyond)
+        """
+        if method not in COUNT_METHODS:
+            raise ValueError(f"count must be one of {COUNT_METHODS}")
+        self._count = method
+        return self
+    
+    def with_service_key(self):
+        """
+        Run the query with the service role key, so row level security doesn't hide rows.
+        
+        Running it raises ValueError when SUPABASE_SERVICE_KEY isn't set.
+        """
+        self.service_role = True
+        return self
+    
+    def build(self):
+        """
+        Render the query.
+        
+        Returns:
+            Tuple of (list of query parameter pairs, headers)
+        """
+        params = []
+        columns = ",".join([self._columns] + self._embeds) if self._embeds else self._columns
+        if columns and columns != "*":
+            params.append(("select", columns))
+        params.extend(self._filters)
+        if self._order:
+            params.append(("order", ",".join(self._order)))
+        if self._limit is not None:
+            params.append(("limit", self._limit))
+        if self._offset is not None:
+            params.append(("offset", self._offset))
+        
+        headers = {}
+        if self._range:
+            headers["Range-Unit"] = "items"
+            headers["Range"] = f"{self._range[0]}-{self._range[1]}"
+        if self._count:
+            headers["Prefer"] = f"count={self._count}"
+        return params, headers
+    
+    def execute(self):
+        """
+        Run the query.
+        
+        Returns:
+            QueryResult with the rows and, if requested, the total count
+        """
+        return self.client._run_query(self)
+    
+    def count_only(self, method=None):
+        """
+        Count matching rows with a HEAD request; no rows are transferred.
+        
+        Args:
+            method: "exact", "planned" or "estimated" (default: the query's, else "exact")
+            
+        Returns:
+            QueryResult with an empty ``data`` and the ``count``
+        """
+        self.count(method or self._count or "exact")
+        return self.client._run_query(self, head=True)
+
+
 class DirectSupabaseClient:
     """
     A client for interacting with Supabase directly through REST API calls.
@@ -24,20 +463,26 @@ class DirectSupabaseClient:
         
         if not self.supabase_url or not self.anon_key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set in environment variables")
+        
+        # Read-through cache for select results, invalidated by writes
+        self.select_cache = get_select_cache(self.supabase_url)
+        # Concurrent identical selects share one upstream request
+        self.select_flights = SingleFlight()
     
-    def _api_request(self, endpoint, method="GET", data=None, params=None, use_service_key=False):
+    def _request(self, endpoint, method="GET", data=None, params=None, use_service_key=False, headers=None):
         """
-        Make a REST API request to Supabase.
+        Send a REST API request to Supabase and return the raw response.
         
         Args:
             endpoint: The API endpoint to call, without the base URL
-            method: HTTP method (GET, POST, PUT, PATCH, DELETE)
+            method: HTTP method (GET, HEAD, POST, PUT, PATCH, DELETE)
             data: Request body data for POST/PUT/PATCH requests
-            params: URL query parameters
+            params: URL query parameters, as a dictionary or a list of pairs
             use_service_key: Whether to use the service role key instead of anon key
+            headers: Extra headers, overriding the defaults (e.g. ``Prefer``)
             
         Returns:
-            The JSON response from the API
+            The ``requests.Response``
         """
         # Determine the correct base URL depending on the endpoint type
         if endpoint.startswith("auth/"):
@@ -54,74 +499,171 @@ class DirectSupabaseClient:
             "apikey": api_key,
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
-            "Prefer": "return=representation"
+            "Prefer": "return=representation",
+            **(headers or {})
         }
         
-        # Make the request
+        # Make the request over the shared keep-alive connection pool
+        http = get_http_client()
         try:
             if method == "GET":
-                response = requests.get(url, headers=headers, params=params)
+                response = http.get(url, headers=headers, params=params)
+            elif method == "HEAD":
+                response = http.request("HEAD", url, headers=headers, params=params)
             elif method == "POST":
-                response = requests.post(url, headers=headers, json=data, params=params)
+                response = http.post(url, headers=headers, json=data, params=params)
             elif method == "PUT":
-                response = requests.put(url, headers=headers, json=data, params=params)
+                response = http.put(url, headers=headers, json=data, params=params)
             elif method == "PATCH":
-                response = requests.patch(url, headers=headers, json=data, params=params)
+                response = http.patch(url, headers=headers, json=data, params=params)
             elif method == "DELETE":
-                response = requests.delete(url, headers=headers, params=params)
+                response = http.delete(url, headers=headers, params=params)
             else:
                 raise ValueError(f"Unsupported method: {method}")
             
             # Check for errors
             response.raise_for_status()
-            
-            # Return JSON response
-            if response.content:
-                return response.json()
-            return None
+            return response
             
         except requests.RequestException as e:
-            print(f"API request error: {str(e)}")
-            if hasattr(e, 'response') and e.response:
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response text: {e.response.text}")
+            # Timing, status and error class are recorded by the HTTP pool
+            logger.error(f"API request error: {str(e)}")
+            if hasattr(e, 'response') and e.response is not None:
+                logger.error(f"Response status: {e.response.status_code}")
+                logger.error(f"Response text: {e.response.text}")
             raise
     
+    def _api_request(self, endpoint, method="GET", data=None, params=None, use_service_key=False, headers=None):
+        """
+        Make a REST API request to Supabase.
+        
+        Args:
+            endpoint: The API endpoint to call, without the base URL
+            method: HTTP method (GET, POST, PUT, PATCH, DELETE)
+            data: Request body data for POST/PUT/PATCH requests
+            params: URL query parameters
+            use_service_key: Whether to use the service role key instead of anon key
+            headers: Extra headers, overriding the defaults (e.g. ``Prefer``)
+            
+        Returns:
+            The JSON response from the API
+        """
+        response = self._request(endpoint, method, data, params, use_service_key, headers)
+        
+        # Return JSON response
+        if response.content:
+            return response.json()
+        return None
+    
+    # Query builder
+    def query(self, table):
+        """
+        Start a query with server-side filters, embedding, ranges and counts.
+        
+        Args:
+            table: The table name
+            
+        Returns:
+            A Query; call ``execute()`` or ``count_only()`` to run it
+        """
+        return Query(self, table)
+    
+    def _run_query(self, query, head=False):
+        if query.service_role and not self.service_key:
+            # Falling back to the anon key would let RLS silently drop rows
+            raise ValueError(f"SUPABASE_SERVICE_KEY must be set to query {query.table} with the service key")
+        params, headers = query.build()
+        response = self._request(query.table, method="HEAD" if head else "GET", params=params,
+                                 use_service_key=query.service_role, headers=headers)
+        return QueryResult.from_response(response)
+    
     # Table operations
-    def select(self, table, columns="*", filters=None, limit=None, order=None):
+    def select(self, table, columns="*", filters=None, limit=None, order=None, fresh=False):
         """
         Select data from a table.
         
+        Results are served from the select cache for tables with a cache TTL,
+        and concurrent identical selects share a single upstream request.
+        
         Args:
             table: The table name
             columns: Columns to select (default "*")
             filters: Dictionary of column/value pairs to filter by
             limit: Maximum number of records to return
             order: Order by clause
+            fresh: Skip the cache and in-flight requests and read from Supabase
+                (the result is still cached)
             
         Returns:
             List of records
         """
-        params = {}
+        key = select_cache_key(table, columns, filters, limit, order)
+        if fresh:
+            self.select_cache.record_bypass()
+        else:
+            cached = self.select_cache.get(key)
+            if cached is not None:
+                return cached
         
-        # Add filters
-        if filters:
-            for column, value in filters.items():
-                params[column] = f"eq.{value}"
+        generation = self.select_cache.generation(table)
+        params = select_params(columns, filters, limit, order)
         
-        # Add pagination
-        if limit:
-            params["limit"] = limit
+        def load():
+            result = self._api_request(table, params=params)
+            self.select_cache.set(key, result, generation)
+            return result
         
-        # Add ordering
-        if order:
-            params["order"] = order
+        if fresh:
+            return load()
+        # A write bumps the generation, so later callers don't join a flight that started before it
+        return self.select_flights.do((key, generation), load)
+    
+    def iter_pages(self, table, columns="*", filters=None, page_size=1000, key="id", start_after=None):
+        """
+        Walk a table in pages ordered by a unique key, using keyset pagination.
         
-        # Add column selection
-        if columns and columns != "*":
-            params["select"] = columns
+        Each page asks for ``key > last key seen`` instead of an offset, so
+        every page costs the same however deep into the table it is. Pages
+        bypass the select cache.
         
-        return self._api_request(table, params=params)
+        Args:
+            table: The table name
+            columns: Columns to select (default "*"); the key column is always included
+            filters: Dictionary of column/value pairs to filter by
+            page_size: Records per request
+            key: Unique, sortable column to page by
+            start_after: Resume after this key value
+            
+        Yields:
+            Lists of records
+        """
+        after = start_after
+        while True:
+            params = keyset_params(columns, filters, page_size, key, after)
+            page = self._api_request(table, params=params) or []
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1][key]
+    
+    def iter_rows(self, table, columns="*", filters=None, page_size=1000, key="id", start_after=None):
+        """
+        Stream every matching record of a table in constant memory.
+        
+        Args:
+            table: The table name
+            columns: Columns to select (default "*"); the key column is always included
+            filters: Dictionary of column/value pairs to filter by
+            page_size: Records per request
+            key: Unique, sortable column to page by
+            start_after: Resume after this key value
+            
+        Yields:
+            Records, in key order
+        """
+        for page in self.iter_pages(table, columns, filters, page_size, key, start_after):
+            yield from page
     
     def insert(self, table, data):
         """
@@ -134,7 +676,36 @@ class DirectSupabaseClient:
         Returns:
             Inserted record(s)
         """
-        return self._api_request(table, method="POST", data=data)
+        try:
+            return self._api_request(table, method="POST", data=data)
+        finally:
+            self.select_cache.invalidate(table)
+    
+    def bulk_upsert(self, table, rows, chunk_size=None, on_conflict=None, returning="minimal",
+                    ignore_duplicates=False, max_concurrency=None):
+        """
+        Insert or update many rows in chunked, concurrent requests.
+        
+        Args:
+            table: The table name
+            rows: Any iterable of records; it is consumed lazily
+            chunk_size: Records per request (default SUPABASE_BULK_CHUNK_SIZE)
+            on_conflict: Comma-separated unique columns to upsert on (default: primary key)
+            returning: "minimal" (no response body) or "representation" (collect the rows)
+            ignore_duplicates: Skip conflicting records instead of merging them
+            max_concurrency: Requests in flight at once (default SUPABASE_BULK_CONCURRENCY)
+            
+        Returns:
+            Dictionary with row and chunk counts, per-chunk errors and elapsed time
+        """
+        def send(chunk):
+            params, headers = upsert_request(chunk, on_conflict, returning, ignore_duplicates)
+            return self._api_request(table, method="POST", data=chunk, params=params, headers=headers)
+        
+        try:
+            return bulk_send(send, rows, chunk_size, max_concurrency, returning)
+        finally:
+            self.select_cache.invalidate(table)
     
     def update(self, table, data, column, value):
         """
@@ -150,7 +721,10 @@ class DirectSupabaseClient:
             Updated record(s)
         """
         params = {column: f"eq.{value}"}
-        return self._api_request(table, method="PATCH", data=data, params=params)
+        try:
+            return self._api_request(table, method="PATCH", data=data, params=params)
+        finally:
+            self.select_cache.invalidate(table)
     
     def delete(self, table, column, value):
         """
@@ -165,7 +739,25 @@ class DirectSupabaseClient:
             Deleted record(s)
         """
         params = {column: f"eq.{value}"}
-        return self._api_request(table, method="DELETE", params=params)
+        try:
+            return self._api_request(table, method="DELETE", params=params)
+        finally:
+            self.select_cache.invalidate(table)
+    
+    def rpc(self, function, params=None, use_service_key=False):
+        """
+        Call a Postgres function exposed under ``/rest/v1/rpc``.
+        
+        Args:
+            function: The function name
+            params: Named arguments, as a dictionary
+            use_service_key: Whether to use the service role key instead of anon key
+            
+        Returns:
+            The function's result
+        """
+        return self._api_request(f"rpc/{function}", method="POST", data=params or {},
+                                 use_service_key=use_service_key)
     
     # Auth operations
     def sign_up(self, email, password, metadata=None):
@@ -219,7 +811,7 @@ class DirectSupabaseClient:
             "Authorization": f"Bearer {jwt}"
         }
         url = f"{self.supabase_url}/auth/v1/user"
-        response = requests.get(url, headers=headers)
+        response = get_http_client().get(url, headers=headers)
         response.raise_for_status()
         return response.json()
 
@@ -0,0 +1,232 @@
+"""
+Shared, keep-alive HTTP connection pool for the Supabase clients.
+
+Every Supabase REST and auth call goes through one ``requests.Session`` per
+process, so TCP+TLS connections are reused instead of being opened per call.
+Calls get connect/read timeouts and bounded, jittered retries for idempotent
+verbs, and the pool keeps latency and connection-reuse counters. Every call
+is also recorded per table and verb by ``core.supabase_metrics``.
+"""
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from dotenv import load_dotenv
+
+from core.supabase_metrics import record_response
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 20
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.2
+DEFAULT_BACKOFF_JITTER = 0.2
+
+# Verbs that are safe to resend; PostgREST PUT is an idempotent upsert
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def _setting(name, default, cast=str):
+    """
+    Read a setting from Django settings when configured, else from the environment.
+
+    The Supabase clients are also used from standalone scripts that never
+    configure Django, so both sources are supported.
+    """
+    if settings.configured and hasattr(settings, name):
+        return getattr(settings, name)
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+
+class PooledHTTPClient:
+    """
+    Thread-safe wrapper around a pooled ``requests.Session``.
+
+    The underlying urllib3 pools are thread-safe; the session is only used for
+    its adapters and never for cookies, so one instance is shared by all threads.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 backoff_jitter=DEFAULT_BACKOFF_JITTER):
+        """
+        Initialize the pool.
+
+        Args:
+            pool_connections: Number of per-host pools to keep
+            pool_maxsize: Maximum kept-alive connections per host
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for response data
+            retries: Maximum retries for idempotent verbs and connection errors
+            backoff_factor: Exponential backoff base in seconds
+            backoff_jitter: Maximum random seconds added to each backoff
+        """
+        self.timeout = (connect_timeout, read_timeout)
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            allowed_methods=IDEMPOTENT_METHODS,
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=backoff_factor,
+            backoff_jitter=backoff_jitter,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request through the pool.
+
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            **kwargs: Passed to ``requests.Session.request``; ``timeout``
+                defaults to the pool's (connect, read) timeouts
+
+        Returns:
+            The ``requests.Response``
+
+        Raises:
+            requests.RequestException: On connection errors, timeouts and exhausted retries
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        failed = False
+        error = None
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            return response
+        except requests.RequestException as e:
+            failed = True
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            retried = 0
+            request_bytes = 0
+            if response is not None:
+                if getattr(response.raw, 'retries', None) is not None:
+                    retried = len(response.raw.retries.history)
+                request_bytes = len(response.request.body or b'')
+            record_response('rest', method, url, response, elapsed, retried, error, request_bytes)
+            with self._lock:
+                self.calls += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+                self.retries += retried
+                if failed or (response is not None and response.status_code >= 500):
+                    self.errors += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def connection_stats(self):
+        """
+        Count connections opened and requests sent across the per-host pools.
+
+        Returns:
+            Tuple of (connections opened, requests sent)
+        """
+        pools = self.adapter.poolmanager.pools
+        opened = 0
+        sent = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return opened, sent
+
+    def stats(self):
+        """
+        Get latency and connection-reuse counters.
+
+        Returns:
+            Dictionary of counters
+        """
+        opened, sent = self.connection_stats()
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'retries': self.retries,
+                'avg_ms': (self.total_seconds / self.calls * 1000) if self.calls else 0.0,
+                'max_ms': self.max_seconds * 1000,
+                'connections_opened': opened,
+                'connections_reused': max(0, sent - opened),
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Get the process-wide pooled HTTP client, configured from settings.
+
+    Returns:
+        The shared PooledHTTPClient
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PooledHTTPClient(
+                    pool_connections=_setting('SUPABASE_HTTP_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS, int),
+                    pool_maxsize=_setting('SUPABASE_HTTP_POOL_MAXSIZE', DEFAULT_POOL_MAXSIZE, int),
+                    connect_timeout=_setting('SUPABASE_HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT, float),
+                    read_timeout=_setting('SUPABASE_HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT, float),
+                    retries=_setting('SUPABASE_HTTP_RETRIES', DEFAULT_RETRIES, int),
+                    backoff_factor=_setting('SUPABASE_HTTP_BACKOFF_FACTOR', DEFAULT_BACKOFF_FACTOR, float),
+                    backoff_jitter=_setting('SUPABASE_HTTP_BACKOFF_JITTER', DEFAULT_BACKOFF_JITTER, float),
+                )
+    return _client
@@ -0,0 +1,385 @@
+"""
+Process-wide JWKS key store for Supabase JWT verification.
+
+Parsed public keys are held by ``kid`` and refreshed in the background
+(stale-while-revalidate), so authenticated requests no longer pay for a
+network round trip to ``/auth/v1/jwks``.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+import weakref
+import httpx
+import requests
+import jwt
+from django.conf import settings
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a fetched key set is considered fresh
+DEFAULT_JWKS_TTL = 300
+# Minimum seconds between on-demand refetches triggered by an unknown kid
+DEFAULT_JWKS_MIN_REFRESH_INTERVAL = 30
+# Timeout for the JWKS HTTP request
+DEFAULT_JWKS_TIMEOUT = 5
+
+
+def parse_jwk(jwk):
+    """
+    Convert a single JWK into a public key object usable by ``jwt.decode``.
+
+    Args:
+        jwk: The JWK as a dictionary
+
+    Returns:
+        The public key, or None if the key type is not supported
+    """
+    kty = jwk.get('kty')
+    if kty == 'RSA':
+        return jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(jwk))
+    if kty == 'EC':
+        return jwt.algorithms.ECAlgorithm.from_jwk(json.dumps(jwk))
+    return None
+
+
+class JWKSKeyStore:
+    """
+    Thread-safe cache of public keys fetched from a JWKS endpoint.
+
+    Keys are served from memory. Once the key set is older than ``ttl`` the
+    stale keys keep being served while a single background thread refreshes
+    them. An unknown ``kid`` triggers a synchronous refetch, but no more often
+    than once every ``min_refresh_interval`` seconds. The same floor applies to
+    the first fetch: while it keeps failing, lookups raise without a request.
+    """
+
+    def __init__(self, jwks_url, ttl=DEFAULT_JWKS_TTL,
+                 min_refresh_interval=DEFAULT_JWKS_MIN_REFRESH_INTERVAL,
+                 timeout=DEFAULT_JWKS_TIMEOUT):
+        """
+        Initialize the key store.
+
+        Args:
+            jwks_url: URL of the JWKS document
+            ttl: Seconds before the key set is refreshed in the background
+            min_refresh_interval: Floor between on-demand refetches for unknown kids
+            timeout: Timeout for the JWKS HTTP request in seconds
+        """
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # asyncio locks are bound to one event loop, so each loop gets its own
+        self._async_refresh_locks = weakref.WeakKeyDictionary()
+        self._background_refresh = None
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+
+    def _fetch(self, only_if=None):
+        """
+        Fetch the JWKS document and replace the cached keys.
+
+        Args:
+            only_if: Optional callable re-checked once the refresh lock is held,
+                so concurrent callers waiting on the same refresh don't repeat it
+
+        Raises:
+            requests.RequestException: If the JWKS endpoint cannot be reached
+        """
+        with self._refresh_lock:
+            if only_if is not None and not only_if():
+                return
+
+            self._last_attempt_at = time.monotonic()
+            try:
+                response = requests.get(self.jwks_url, timeout=self.timeout)
+                response.raise_for_status()
+                jwks = response.json()
+            except (requests.RequestException, ValueError):
+                self._count_error()
+                raise
+
+            self._store(jwks)
+
+    async def _afetch(self, only_if=None):
+        """
+        Fetch the JWKS document without blocking the event loop.
+
+        Args:
+            only_if: Optional callable re-checked once the refresh lock is held
+
+        Raises:
+            httpx.HTTPError: If the JWKS endpoint cannot be reached
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            refresh_lock = self._async_refresh_locks.get(loop)
+            if refresh_lock is None:
+                refresh_lock = self._async_refresh_locks[loop] = asyncio.Lock()
+
+        async with refresh_lock:
+            if only_if is not None and not only_if():
+                return
+
+            self._last_attempt_at = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=self.timeout) as client:
+                    response = await client.get(self.jwks_url)
+                response.raise_for_status()
+                jwks = response.json()
+            except (httpx.HTTPError, ValueError):
+                self._count_error()
+                raise
+
+            self._store(jwks)
+
+    def _count_error(self):
+        with self._lock:
+            self.refresh_errors += 1
+
+    def _count_lookup(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _can_fetch_cold(self):
+        """Return True if the key set was never fetched and a first fetch may run now."""
+        return self._fetched_at is None and self._can_refetch()
+
+    def _unavailable_message(self):
+        return (f"JWKS endpoint {self.jwks_url} unavailable; "
+                f"retrying at most every {self.min_refresh_interval}s")
+
+    def _store(self, jwks):
+        """Parse a JWKS document and replace the cached keys."""
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            kid = jwk.get('kid')
+            if not kid:
+                continue
+            try:
+                public_key = parse_jwk(jwk)
+            except (ValueError, TypeError, jwt.InvalidKeyError) as e:
+                logger.warning(f"Skipping unparseable JWK {kid}: {str(e)}")
+                continue
+            if public_key is not None:
+                keys[kid] = public_key
+
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self.refreshes += 1
+
+    def _refresh_in_background(self):
+        """
+        Refresh the key set on a daemon thread unless one is already running.
+
+        Attempts are at least ``min_refresh_interval`` apart, so stale keys
+        don't start a new fetch on every request while the endpoint is down.
+        """
+        with self._lock:
+            if self._background_refresh is not None and self._background_refresh.is_alive():
+                return
+            if not self._can_refetch():
+                return
+            self.background_refreshes += 1
+            thread = threading.Thread(target=self._background_worker, name='jwks-refresh', daemon=True)
+            self._background_refresh = thread
+        thread.start()
+
+    def _background_worker(self):
+        try:
+            self._fetch()
+        except Exception as e:
+            # Keep serving the stale keys; a request after the refetch floor tries again
+            logger.warning(f"Background JWKS refresh failed: {str(e)}")
+
+    def _can_refetch(self):
+        """Return True if the on-demand refetch floor has elapsed."""
+        if self._last_attempt_at is None:
+            return True
+        return time.monotonic() - self._last_attempt_at >= self.min_refresh_interval
+
+    def get_key(self, kid):
+        """
+        Get the public key for a key ID.
+
+        Args:
+            kid: The ``kid`` from the JWT header
+
+        Returns:
+            The public key, or None if no key with that ID is known
+
+        Raises:
+            requests.RequestException: If the key set has never been fetched
+                and the JWKS endpoint cannot be reached, or a first fetch failed
+                less than ``min_refresh_interval`` seconds ago
+        """
+        if self._fetched_at is None:
+            # A failed first fetch also sets the refetch floor, so a JWKS outage
+            # doesn't send every request to the endpoint while nothing is cached
+            if self._can_fetch_cold():
+                self._fetch(only_if=self._can_fetch_cold)
+            if self._fetched_at is None:
+                raise requests.ConnectionError(self._unavailable_message())
+
+        public_key = self._keys.get(kid)
+
+        if public_key is not None:
+            self._count_lookup(hit=True)
+            if time.monotonic() - self._fetched_at >= self.ttl:
+                self._refresh_in_background()
+            return public_key
+
+        self._count_lookup(hit=False)
+
+        # Unknown kid: the signing key may have been rotated, refetch now
+        if self._can_refetch():
+            self._fetch(only_if=lambda: kid not in self._keys and self._can_refetch())
+            return self._keys.get(kid)
+
+        return None
+
+    async def aget_key(self, kid):
+        """
+        Async variant of ``get_key`` for use from async views.
+
+        Cached keys are returned without awaiting anything; cold and
+        unknown-kid fetches go through a non-blocking HTTP client.
+
+        Args:
+            kid: The ``kid`` from the JWT header
+
+        Returns:
+            The public key, or None if no key with that ID is known
+
+        Raises:
+            httpx.HTTPError: If the key set has never been fetched
+                and the JWKS endpoint cannot be reached, or a first fetch failed
+                less than ``min_refresh_interval`` seconds ago
+        """
+        if self._fetched_at is None:
+            if self._can_fetch_cold():
+                await self._afetch(only_if=self._can_fetch_cold)
+            if self._fetched_at is None:
+                raise httpx.ConnectError(self._unavailable_message())
+
+        public_key = self._keys.get(kid)
+
+        if public_key is not None:
+            self._count_lookup(hit=True)
+            if time.monotonic() - self._fetched_at >= self.ttl:
+                self._refresh_in_background()
+            return public_key
+
+        self._count_lookup(hit=False)
+
+        if self._can_refetch():
+            await self._afetch(only_if=lambda: kid not in self._keys and self._can_refetch())
+            return self._keys.get(kid)
+
+        return None
+
+    def can_resolve(self, kid):
+        """
+        Return True if ``get_key`` could possibly find the key ID.
+
+        False means the kid is unknown and the refetch floor has not elapsed,
+        so looking it up would neither hit the cache nor reach the network.
+        """
+        if self._fetched_at is None or kid in self._keys:
+            return True
+        return self._can_refetch()
+
+    def has_key(self, kid):
+        """Return True if the key ID is currently cached, without fetching."""
+        return kid in self._keys
+
+    def clear(self):
+        """Drop all cached keys so the next lookup fetches them again."""
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._last_attempt_at = None
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary of hit/miss/refresh counters and cache state
+        """
+        age = None
+        if self._fetched_at is not None:
+            age = time.monotonic() - self._fetched_at
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'background_refreshes': self.background_refreshes,
+            'refresh_errors': self.refresh_errors,
+            'keys': len(self._keys),
+            'age_seconds': age,
+        }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_jwks_url():
+    """Get the JWKS URL from settings, falling back to the Supabase URL."""
+    jwks_url = getattr(settings, 'SUPABASE_JWKS_URL', None)
+    if jwks_url:
+        return jwks_url
+    supabase_url = getattr(settings, 'SUPABASE_URL', None) or os.getenv("SUPABASE_URL")
+    return f"{supabase_url}/auth/v1/jwks"
+
+
+def get_jwks_store(jwks_url=None):
+    """
+    Get the shared key store for a JWKS URL, creating it on first use.
+
+    Args:
+        jwks_url: URL of the JWKS document (defaults to the configured Supabase JWKS URL)
+
+    Returns:
+        The process-wide JWKSKeyStore for that URL
+    """
+    jwks_url = jwks_url or get_jwks_url()
+    store = _stores.get(jwks_url)
+    if store is not None:
+        return store
+
+    with _stores_lock:
+        store = _stores.get(jwks_url)
+        if store is None:
+            store = JWKSKeyStore(
+                jwks_url,
+                ttl=getattr(settings, 'SUPABASE_JWKS_TTL', DEFAULT_JWKS_TTL),
+                min_refresh_interval=getattr(
+                    settings, 'SUPABASE_JWKS_MIN_REFRESH_INTERVAL', DEFAULT_JWKS_MIN_REFRESH_INTERVAL
+                ),
+                timeout=getattr(settings, 'SUPABASE_JWKS_TIMEOUT', DEFAULT_JWKS_TIMEOUT),
+            )
+            _stores[jwks_url] = store
+    return store
@@ -0,0 +1,86 @@
+"""
+Management command to benchmark the authentication hot paths.
+"""
+import os
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.auth_benchmark import AuthBenchmark, compare_to_baseline, DEFAULT_TOLERANCE
+
+class Command(BaseCommand):
+    help = 'Measure p50/p95/p99 latency and requests/s of every authentication path, cold and warm'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Measured requests per path and mode (default: 200)'
+        )
+        parser.add_argument(
+            '--paths',
+            nargs='+',
+            choices=AuthBenchmark.PATHS,
+            help='Only run these authentication paths'
+        )
+        parser.add_argument(
+            '--baseline',
+            default='auth_benchmark_baseline.json',
+            help='Baseline file to compare against'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Write this run as the new baseline'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=DEFAULT_TOLERANCE,
+            help=f'Allowed relative p95 slowdown before failing (default: {DEFAULT_TOLERANCE})'
+        )
+
+    def handle(self, *args, **options):
+        benchmark = AuthBenchmark(iterations=options['iterations'], paths=options['paths'])
+        results = benchmark.run()
+
+        self.stdout.write(f"{'path':<26}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>12}")
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<26}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+                f"{stats['p99_ms']:>10.3f}{stats['rps']:>12.0f}"
+            )
+        for note in benchmark.notes:
+            self.stdout.write(self.style.WARNING(f"No cold/warm split for {note}"))
+
+        baseline_path = options['baseline']
+
+        if options['save_baseline']:
+            with open(baseline_path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {baseline_path}'))
+            return
+
+        if not os.path.exists(baseline_path):
+            self.stdout.write(self.style.WARNING(
+                f'No baseline at {baseline_path}; run with --save-baseline to create one'
+            ))
+            return
+
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"Not in the baseline, so not compared: {', '.join(missing)}"
+            ))
+
+        regressions = compare_to_baseline(results, baseline, tolerance=options['tolerance'])
+        if regressions:
+            for name, previous, current in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: p95 {current:.3f} ms vs baseline {previous:.3f} ms'
+                ))
+            raise CommandError(f'{len(regressions)} authentication path(s) regressed')
+
+        self.stdout.write(self.style.SUCCESS('No authentication regressions against baseline'))
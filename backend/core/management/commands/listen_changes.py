@@ -0,0 +1,91 @@
+"""
+Management command to run the Postgres LISTEN/NOTIFY change feed.
+"""
+import signal
+import asyncio
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.change_feed import ChangeFeed, handlers_from_settings
+
+class Command(BaseCommand):
+    help = 'Listen for Postgres notifications and dispatch them to the configured change feed handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channels',
+            nargs='+',
+            help='Channels to LISTEN on (default: SUPABASE_CHANGE_FEED_CHANNELS)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Concurrent dispatchers; 1 keeps events in order (default: SUPABASE_CHANGE_FEED_WORKERS)'
+        )
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            help='Queued events at which reading pauses (default: SUPABASE_CHANGE_FEED_QUEUE_SIZE)'
+        )
+        parser.add_argument(
+            '--since-minutes',
+            type=float,
+            help='Replay rows created in the last N minutes before listening'
+        )
+        parser.add_argument(
+            '--stats-interval',
+            type=float,
+            default=60,
+            help='Seconds between metrics reports (default: 60, 0 disables)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since_minutes']:
+            since = timezone.now() - timedelta(minutes=options['since_minutes'])
+
+        feed = ChangeFeed(
+            channels=options['channels'],
+            queue_size=options['queue_size'],
+            workers=options['workers'],
+            since=since,
+        )
+        for channel, handlers in handlers_from_settings().items():
+            for handler in handlers:
+                feed.subscribe(channel, handler)
+
+        asyncio.run(self._run(feed, options['stats_interval']))
+
+    async def _run(self, feed, stats_interval):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, feed.stop)
+
+        self.stdout.write(self.style.SUCCESS(f"Listening on {', '.join(feed.channels)}"))
+        reporter = asyncio.ensure_future(self._report(feed, stats_interval)) if stats_interval else None
+        try:
+            await feed.run()
+        finally:
+            if reporter is not None:
+                reporter.cancel()
+            self._write_stats(feed)
+
+    async def _report(self, feed, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self._write_stats(feed)
+
+    def _write_stats(self, feed):
+        stats = feed.stats()
+        self.stdout.write(
+            f"connected={stats['connected']} reconnects={stats['reconnects']} "
+            f"queue={stats['queue_depth']} pauses={stats['pauses']}"
+        )
+        for channel, channel_stats in stats['channels'].items():
+            lag = channel_stats['lag_p95_ms']
+            self.stdout.write(
+                f"  {channel}: received={channel_stats['received']} "
+                f"dispatched={channel_stats['dispatched']} replayed={channel_stats['replayed']} "
+                f"duplicates={channel_stats['duplicates']} errors={channel_stats['handler_errors']} "
+                f"lag_p95={'-' if lag is None else f'{lag:.0f}ms'}"
+            )
@@ -0,0 +1,69 @@
+"""
+Management command to pre-provision Django users from Supabase Auth.
+"""
+from django.core.management.base import BaseCommand
+from accounts.provisioning import SupabaseUserProvisioner, DEFAULT_PAGE_SIZE, DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Bulk-create Django users and profiles for all Supabase Auth users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=DEFAULT_PAGE_SIZE,
+            help=f'Users fetched from Supabase per page (default: {DEFAULT_PAGE_SIZE})'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Rows per bulk insert (default: {DEFAULT_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='provision_supabase_users.checkpoint.json',
+            help='Checkpoint file used to resume an interrupted run'
+        )
+        parser.add_argument(
+            '--start-page',
+            type=int,
+            help='Start from this page instead of the checkpoint'
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            help='Stop after this many pages'
+        )
+        parser.add_argument(
+            '--no-resume',
+            action='store_true',
+            help='Ignore the checkpoint and start from the first page'
+        )
+
+    def handle(self, *args, **options):
+        provisioner = SupabaseUserProvisioner(
+            page_size=options['page_size'],
+            chunk_size=options['chunk_size'],
+            checkpoint_path=options['checkpoint'],
+        )
+
+        def report(stats):
+            self.stdout.write(
+                f"Page {stats['last_page']}: {stats['scanned']} scanned, "
+                f"{stats['created_users']} users / {stats['created_profiles']} profiles created "
+                f"({stats['users_per_second']:.0f} users/s)"
+            )
+
+        stats = provisioner.run(
+            start_page=options['start_page'],
+            max_pages=options['max_pages'],
+            resume=not options['no_resume'],
+            progress=report,
+        )
+
+        elapsed = stats['elapsed_seconds']
+        self.stdout.write(self.style.SUCCESS(
+            f"Provisioning finished: {stats['pages']} pages in {elapsed:.1f}s, "
+            f"{stats['created_users']} users and {stats['created_profiles']} profiles created in total"
+        ))
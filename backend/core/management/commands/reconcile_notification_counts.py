@@ -0,0 +1,44 @@
+"""
+Management command to repair drifted unread notification counters in Supabase.
+"""
+import time
+from django.core.management.base import BaseCommand
+from core.notification_counts import reconcile_unread_counts
+
+class Command(BaseCommand):
+    help = 'Recount unread notifications for users whose Supabase counter has drifted, once or in a loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Users repaired per call (default: SUPABASE_UNREAD_RECONCILE_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep reconciling every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=3600,
+            help='Seconds between runs with --loop (default: 3600)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                result = reconcile_unread_counts(batch_size=options['batch_size'])
+                self.stdout.write(self.style.SUCCESS(
+                    f"Reconciled unread counters: {result['repaired']} repaired "
+                    f"of {result['checked']} drifted in {result['batches']} calls"
+                ))
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                self.stdout.write(self.style.ERROR(f'Reconciliation failed: {e}'))
+
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
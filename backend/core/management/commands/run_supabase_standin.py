@@ -0,0 +1,121 @@
+"""
+Management command to run the local Supabase stand-in server.
+"""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.supabase_standin import SupabaseStandIn, SupabaseStandInServer
+
+class Command(BaseCommand):
+    help = 'Serve a local PostgREST/GoTrue stand-in backed by SQLite, with optional latency and error injection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='Interface to listen on (default: 127.0.0.1)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=54321,
+            help='Port to listen on (default: 54321)'
+        )
+        parser.add_argument(
+            '--database',
+            default='supabase_standin.sqlite3',
+            help='SQLite file holding tables, users and the signing key (":memory:" to keep nothing)'
+        )
+        parser.add_argument(
+            '--seed-data',
+            help='JSON file mapping table names to lists of rows to load before serving'
+        )
+        parser.add_argument(
+            '--required',
+            nargs='+',
+            default=[],
+            metavar='TABLE.COLUMN',
+            help='Columns that reject nulls on write, like NOT NULL'
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0,
+            help='Fixed latency added to every request'
+        )
+        parser.add_argument(
+            '--jitter-ms',
+            type=float,
+            default=0,
+            help='Up to this much extra latency per request, drawn uniformly'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help='Fraction of requests answered with --error-status (0-1)'
+        )
+        parser.add_argument(
+            '--error-status',
+            type=int,
+            default=503,
+            help='HTTP status of injected errors (default: 503)'
+        )
+        parser.add_argument(
+            '--fault-paths',
+            nargs='+',
+            default=[],
+            help='Only inject errors on these path prefixes, e.g. rest/v1/courses auth/v1/token'
+        )
+        parser.add_argument(
+            '--random-seed',
+            type=int,
+            help='Seed for latency jitter and error injection, for reproducible runs'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError('--error-rate must be between 0 and 1')
+
+        standin = SupabaseStandIn(
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            fault_paths=options['fault_paths'],
+            seed=options['random_seed'],
+            database=options['database'],
+        )
+
+        for required in options['required']:
+            table, _, column = required.partition('.')
+            if not column:
+                raise CommandError(f'--required expects TABLE.COLUMN, got {required}')
+            standin.require(table, column)
+
+        if options['seed_data']:
+            with open(options['seed_data']) as f:
+                seed_data = json.load(f)
+            for table, rows in seed_data.items():
+                standin.seed(table, rows)
+                self.stdout.write(f'Seeded {len(rows)} rows into {table}')
+
+        server = SupabaseStandInServer(standin, host=options['host'], port=options['port'])
+
+        self.stdout.write(self.style.SUCCESS(f'Supabase stand-in listening on {server.url}'))
+        self.stdout.write('Point the project at it with:')
+        self.stdout.write(f'  SUPABASE_URL={server.url}')
+        self.stdout.write('  SUPABASE_KEY=<any value>  SUPABASE_SERVICE_KEY=<any value>')
+        self.stdout.write('  SUPABASE_JWT_VERIFICATION_MODE=jwks')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            stats = standin.stats()
+            standin.close()
+            self.stdout.write(
+                f"Served {stats['requests']} requests ({stats['injected_errors']} injected errors, "
+                f"peak concurrency {stats['max_in_flight']})"
+            )
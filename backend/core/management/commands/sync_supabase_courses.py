@@ -0,0 +1,58 @@
+"""
+Management command to mirror the Supabase course catalog into the local Course table.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.course_mirror import CourseMirror
+
+class Command(BaseCommand):
+    help = 'Incrementally mirror Supabase courses into core.models.Course, once or in a loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Also remove courses deleted upstream, regardless of the full sync interval'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            help='Rows fetched from Supabase per page (default: SUPABASE_COURSE_MIRROR_PAGE_SIZE)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep syncing every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between runs with --loop (default: 60)'
+        )
+
+    def handle(self, *args, **options):
+        mirror = CourseMirror(page_size=options['page_size'])
+        full = True if options['full'] else None
+
+        while True:
+            try:
+                result = mirror.sync(full=full)
+                self.stdout.write(self.style.SUCCESS(
+                    f"{'Full' if result['full'] else 'Incremental'} sync: "
+                    f"{result['created']} created, {result['updated']} updated, "
+                    f"{result['deleted']} deleted, {result['unpublished']} unpublished "
+                    f"in {result['pages']} pages"
+                ))
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                # Keep looping; the next run resumes from the stored watermark
+                self.stdout.write(self.style.ERROR(f'Sync failed: {e}'))
+
+            if not options['loop']:
+                return
+            full = None
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -56,4 +56,13 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('Check your Supabase credentials in .env file'))
             sys.exit(1)
         
+        # Report SDK/REST circuit breaker state for operations used in this process
+        for operation, backends in client.health().items():
+            for backend, stats in backends.items():
+                style = self.style.SUCCESS if stats['state'] == 'closed' else self.style.WARNING
+                self.stdout.write(style(
+                    f"{operation} via {backend}: {stats['state']} "
+                    f"({stats['successes']} ok, {stats['failures']} failed, {stats['rejected']} skipped)"
+                ))
+        
         self.stdout.write(self.style.SUCCESS('Supabase connection verification completed!')) 
\ No newline at end of file
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.20 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='supabase_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='supabase_created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='supabase_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('watermark', models.CharField(blank=True, max_length=64)),
+                ('watermark_key', models.CharField(blank=True, max_length=64)),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_full_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 4.2.20 on 2026-10-18 13:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_slugs(apps, schema_editor):
+    """Give existing courses unique slugs before the column becomes unique."""
+    from django.utils.text import slugify
+    Course = apps.get_model('core', 'Course')
+    for course in Course.objects.filter(slug__isnull=True):
+        course.slug = f"{slugify(course.title)[:200] or 'course'}-{course.pk}"
+        course.save(update_fields=['slug'])
+
+
+def copy_enrollments(apps, schema_editor):
+    """Carry rows of the old Enrollment table over to CourseEnrollment."""
+    Enrollment = apps.get_model('core', 'Enrollment')
+    CourseEnrollment = apps.get_model('core', 'CourseEnrollment')
+    seen = set()
+    for enrollment in Enrollment.objects.order_by('enrollment_date'):
+        # CourseEnrollment allows one row per user and course
+        if (enrollment.user_id, enrollment.course_id) in seen:
+            continue
+        seen.add((enrollment.user_id, enrollment.course_id))
+        completed = enrollment.status == 'completed'
+        created = CourseEnrollment.objects.create(
+            user_id=enrollment.user_id,
+            course_id=enrollment.course_id,
+            completed=completed,
+        )
+        # enrolled_at is auto_now_add, so the original date is set afterwards
+        CourseEnrollment.objects.filter(pk=created.pk).update(
+            enrolled_at=enrollment.enrollment_date,
+            completed_at=enrollment.enrollment_date if completed else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_course_mirror'),
+        # api.CourseEnrollment gives up the User.enrollments accessor first
+        ('api', '0002_enrollment_related_name'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='course',
+            old_name='name',
+            new_name='title',
+        ),
+        migrations.RemoveField(
+            model_name='course',
+            name='image',
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='image_url',
+            field=models.URLField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='slug',
+            field=models.SlugField(max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='course',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, unique=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='is_published',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='category',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='level',
+            field=models.CharField(choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'), ('advanced', 'Advanced')], default='beginner', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='duration_hours',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterModelOptions(
+            name='course',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.CreateModel(
+            name='CourseEnrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrolled_at', models.DateTimeField(auto_now_add=True)),
+                ('completed', models.BooleanField(default=False)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('payment_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('refunded', 'Refunded')], default='pending', max_length=50)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='core.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-enrolled_at'],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseModule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='modules', to='core.course')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Lesson',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('content', models.TextField()),
+                ('video_url', models.URLField(blank=True, max_length=255, null=True)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('duration_minutes', models.PositiveIntegerField(default=0)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='core.coursemodule')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.RunPython(copy_enrollments, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='Enrollment',
+        ),
+    ]
@@ -21,7 +21,7 @@ class Course(models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
-    price = models.DecimalField(max_digits=6, decimal_places=2)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
     image_url = models.URLField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -36,6 +36,12 @@ class Course(models.Model):
     ], default='beginner')
     duration_hours = models.PositiveIntegerField(default=0)
     
+    # Set on courses mirrored from the Supabase ``courses`` table
+    supabase_id = models.BigIntegerField(unique=True, null=True, blank=True)
+    supabase_created_at = models.DateTimeField(null=True, blank=True)
+    supabase_updated_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(null=True, blank=True)
+    
     def save(self, *args, **kwargs):
         # Auto-generate slug if not provided
         if not self.slug:
@@ -49,6 +55,21 @@ class Course(models.Model):
         ordering = ['-created_at']
 
 
+class SyncState(models.Model):
+    """Progress of an incremental sync from Supabase, e.g. the course catalog mirror."""
+    
+    name = models.CharField(max_length=100, unique=True)
+    # updated_at and id of the last row applied, as returned by Supabase
+    watermark = models.CharField(max_length=64, blank=True)
+    watermark_key = models.CharField(max_length=64, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return f"{self.name} (synced {self.last_synced_at})"
+
+
 class CourseEnrollment(models.Model):
     """Model representing a user's enrollment in a course."""
     
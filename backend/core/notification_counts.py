@@ -0,0 +1,76 @@
+"""
+Unread notification counts, read from the counters Supabase keeps per user.
+
+``public.notification_unread_counts`` is maintained by statement triggers on
+``notifications`` (see ``20261019000000_notification_unread_counts.sql``), so
+the badge count is a primary-key read rather than a ``count(*)`` over the
+user's notifications. ``reconcile_unread_counts`` repairs any drift by
+recounting the users whose counter disagrees with their notifications.
+"""
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'notification_unread_counts'
+RECONCILE_FUNCTION = 'reconcile_notification_unread_counts'
+
+DEFAULT_RECONCILE_BATCH_SIZE = 1000
+
+
+def unread_count(user_id, client=None):
+    """
+    Get a user's unread notification count.
+
+    Args:
+        user_id: The Supabase user ID
+        client: DirectSupabaseClient to read from (defaults to the shared instance)
+
+    Returns:
+        The number of unread notifications
+    """
+    if client is None:
+        from core.direct_supabase import supabase as client
+    # The request carries no user JWT upstream, so RLS needs the service key
+    rows = (client.query(TABLE)
+            .select('unread')
+            .with_service_key()
+            .eq('user_id', user_id)
+            .limit(1)
+            .execute()).data
+    # Users without a counter have never had an unread notification
+    return rows[0]['unread'] if rows else 0
+
+
+def reconcile_unread_counts(client=None, batch_size=None):
+    """
+    Recount every user whose unread counter has drifted.
+
+    Each call to the reconciliation function repairs at most ``batch_size``
+    users in its own transaction, so the counter locks it takes are short-lived.
+
+    Args:
+        client: DirectSupabaseClient to call (defaults to the shared instance)
+        batch_size: Users per call (default SUPABASE_UNREAD_RECONCILE_BATCH_SIZE)
+
+    Returns:
+        Dictionary of counts: checked, repaired, batches
+    """
+    if client is None:
+        from core.direct_supabase import supabase as client
+    batch_size = batch_size or getattr(settings, 'SUPABASE_UNREAD_RECONCILE_BATCH_SIZE',
+                                       DEFAULT_RECONCILE_BATCH_SIZE)
+
+    result = {'checked': 0, 'repaired': 0, 'batches': 0}
+    while True:
+        batch = client.rpc(RECONCILE_FUNCTION, {'max_users': batch_size}, use_service_key=True)
+        result['checked'] += batch['checked']
+        result['repaired'] += batch['repaired']
+        result['batches'] += 1
+        if batch['checked'] < batch_size:
+            break
+
+    if result['repaired']:
+        # Drift means a write path bypassed the triggers, worth looking into
+        logger.warning(f"Repaired {result['repaired']} drifted unread notification counters")
+    return result
@@ -0,0 +1,332 @@
+"""
+In-process fan-out of new notifications to Server-Sent Events streams.
+
+Each ASGI worker runs one ``NotificationHub`` on its event loop. The hub
+embeds a ``ChangeFeed`` on the ``new_notification`` channel; for every event
+whose user has an open stream it loads the notification row once and offers
+it to each of that user's subscriptions. Idle streams cost a small bounded
+queue each; one hub-wide ticker sends the keep-alive comments instead of a
+timer per connection.
+
+Stream event IDs are ``<created_at>/<id>`` cursors. A client reconnecting with
+``Last-Event-ID`` gets the notifications created after its cursor first, then
+the live ones. A subscriber too slow to keep up with its queue is
+disconnected, and resumes through the same replay.
+
+Django 4.2 doesn't tell a streaming response that its client went away, so
+every stream ends at a hard deadline (``SUPABASE_SSE_MAX_DURATION`` or the
+token's expiry) whether or not anything is being delivered.
+"""
+import json
+import time
+import asyncio
+import logging
+import weakref
+from datetime import timezone
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from core.change_feed import ChangeFeed, connection_params, handlers_from_settings
+from core.direct_supabase import Q
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'new_notification'
+TABLE = 'notifications'
+
+# Undelivered notifications per stream before it is disconnected
+DEFAULT_QUEUE_SIZE = 100
+# Seconds between keep-alive comments
+DEFAULT_HEARTBEAT = 15
+# Notifications per replay query for a Last-Event-ID
+DEFAULT_REPLAY_LIMIT = 500
+# Longest a stream stays open; clients reconnect with Last-Event-ID
+DEFAULT_MAX_DURATION = 3600
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+HEARTBEAT = object()
+
+
+def format_cursor(notification):
+    return f"{notification['created_at']}/{notification['id']}"
+
+
+def parse_cursor(value):
+    """
+    Parse a ``<created_at>/<id>`` event ID.
+
+    Returns:
+        Tuple of (created_at string, id), or None if the value isn't a cursor
+    """
+    if not value or '/' not in value:
+        return None
+    created_at, _, notification_id = value.rpartition('/')
+    if parse_datetime(created_at) is None or not notification_id:
+        return None
+    return created_at, notification_id
+
+
+def _cursor_key(created_at, notification_id):
+    parsed = parse_datetime(created_at)
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, str(notification_id)
+
+
+def format_event(notification):
+    """Render a notification as an SSE message."""
+    return (
+        f"id: {format_cursor(notification)}\n"
+        f"event: notification\n"
+        f"data: {json.dumps(notification, default=str)}\n\n"
+    )
+
+
+class Subscription:
+    """One open stream's queue of pending notifications."""
+
+    __slots__ = ('user_id', 'queue', 'overflowed')
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if item is not HEARTBEAT:
+                self.overflowed = True
+
+
+class NotificationHub:
+    """
+    Per-event-loop registry of notification streams, fed by the change feed.
+    """
+
+    def __init__(self, client=None, queue_size=None, heartbeat=None, replay_limit=None,
+                 max_duration=None, feed=None):
+        """
+        Initialize the hub.
+
+        Args:
+            client: AsyncDirectSupabaseClient for loading notifications (default: the loop's)
+            queue_size: Pending notifications per stream (default SUPABASE_SSE_QUEUE_SIZE)
+            heartbeat: Seconds between keep-alives (default SUPABASE_SSE_HEARTBEAT)
+            replay_limit: Notifications per replay query on resume (default SUPABASE_SSE_REPLAY_LIMIT)
+            max_duration: Longest stream in seconds (default SUPABASE_SSE_MAX_DURATION)
+            feed: ChangeFeed to subscribe to; one is started on first use unless
+                SUPABASE_SSE_CHANGE_FEED is off or no PostgreSQL connection is configured
+        """
+        self._client = client
+        self.queue_size = queue_size or getattr(settings, 'SUPABASE_SSE_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+        self.heartbeat = heartbeat or getattr(settings, 'SUPABASE_SSE_HEARTBEAT', DEFAULT_HEARTBEAT)
+        self.replay_limit = replay_limit or getattr(settings, 'SUPABASE_SSE_REPLAY_LIMIT', DEFAULT_REPLAY_LIMIT)
+        self.max_duration = max_duration or getattr(settings, 'SUPABASE_SSE_MAX_DURATION', DEFAULT_MAX_DURATION)
+        self.feed = feed
+        self._subscribers = {}
+        self._ticker = None
+        self._feed_task = None
+        self._started = False
+
+        self.delivered = 0
+        self.replayed = 0
+        self.overflows = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from core.async_supabase import get_async_supabase
+            self._client = get_async_supabase()
+        return self._client
+
+    # Lifecycle
+    def _start(self):
+        if self._started:
+            return
+        self._started = True
+        self._ticker = asyncio.ensure_future(self._tick())
+
+        if self.feed is None and getattr(settings, 'SUPABASE_SSE_CHANGE_FEED', True):
+            try:
+                connection_params()
+            except ValueError as e:
+                logger.warning(f"Notification streams get no live events: {e}")
+            else:
+                self.feed = ChangeFeed(channels=[CHANNEL])
+                for channel, handlers in handlers_from_settings().items():
+                    for handler in handlers:
+                        self.feed.subscribe(channel, handler)
+                self._feed_task = asyncio.ensure_future(self.feed.run())
+        if self.feed is not None:
+            self.feed.subscribe(CHANNEL, self.publish)
+
+    async def _tick(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            for subscriptions in list(self._subscribers.values()):
+                for subscription in list(subscriptions):
+                    subscription.offer(HEARTBEAT)
+
+    def close(self):
+        if self.feed is not None:
+            self.feed.unsubscribe(CHANNEL, self.publish)
+            self.feed.stop()
+        if self._ticker is not None:
+            self._ticker.cancel()
+
+    # Subscriptions
+    def subscribe(self, user_id):
+        self._start()
+        subscription = Subscription(str(user_id), self.queue_size)
+        self._subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def deliver(self, user_id, notification):
+        """Offer a notification to every open stream of a user."""
+        for subscription in list(self._subscribers.get(str(user_id), ())):
+            subscription.offer(notification)
+            self.delivered += 1
+
+    async def publish(self, event):
+        """Change feed handler: load a new notification and deliver it to its user's streams."""
+        user_id = event.payload.get('user_id')
+        notification_id = event.payload.get('id')
+        # Users without an open stream cost nothing
+        if not notification_id or str(user_id) not in self._subscribers:
+            return
+        rows = (await (self.client.query(TABLE)
+                       .with_service_key()
+                       .eq('id', notification_id)
+                       .limit(1)
+                       .execute())).data
+        if rows:
+            self.deliver(user_id, rows[0])
+
+    async def replay(self, user_id, cursor):
+        """
+        Load a user's notifications created after a cursor, oldest first.
+
+        Args:
+            user_id: The Supabase user ID
+            cursor: Tuple of (created_at, id) from ``parse_cursor``
+
+        Returns:
+            List of notification rows, at most ``replay_limit``
+        """
+        created_at, notification_id = cursor
+        result = await (self.client.query(TABLE)
+                        .with_service_key()
+                        .eq('user_id', user_id)
+                        # Bounds the index range scan; the or alone would be a filter
+                        .gte('created_at', created_at)
+                        .or_(Q.gt('created_at', created_at),
+                             Q.and_(Q.eq('created_at', created_at), Q.gt('id', notification_id)))
+                        .order('created_at')
+                        .order('id')
+                        .limit(self.replay_limit)
+                        .execute())
+        return result.data or []
+
+    async def stream(self, user_id, last_event_id=None, expires_at=None):
+        """
+        Yield SSE messages for a user until the stream should be closed.
+
+        Args:
+            user_id: The Supabase user ID
+            last_event_id: The client's ``Last-Event-ID``, to resume after
+            expires_at: Unix time the stream must end by (e.g. the token's ``exp``)
+
+        Yields:
+            SSE message strings
+        """
+        deadline = time.time() + self.max_duration
+        if expires_at:
+            deadline = min(deadline, expires_at)
+
+        # Subscribe before replaying, so nothing created in between is missed
+        subscription = self.subscribe(user_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+
+            position = None
+            cursor = parse_cursor(last_event_id)
+            if cursor is not None:
+                position = _cursor_key(*cursor)
+                # Page through the whole backlog before switching to live events,
+                # which are skipped up to the last replayed position
+                while True:
+                    if time.time() >= deadline:
+                        return
+                    notifications = await self.replay(subscription.user_id, cursor)
+                    for notification in notifications:
+                        self.replayed += 1
+                        position = _cursor_key(notification['created_at'], notification['id'])
+                        yield format_event(notification)
+                    if len(notifications) < self.replay_limit:
+                        break
+                    cursor = (notifications[-1]['created_at'], str(notifications[-1]['id']))
+
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    # Fell behind; the client resumes from the last event it got
+                    self.overflows += 1
+                    return
+
+                # Bounded by the deadline, so a stream whose client has gone
+                # is dropped on time even if no heartbeat or event arrives
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return
+                if item is HEARTBEAT:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                key = _cursor_key(item['created_at'], item['id'])
+                # Skip live notifications the replay already sent
+                if position is not None and key <= position:
+                    continue
+                position = key
+                yield format_event(item)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            'connections': sum(len(subscriptions) for subscriptions in self._subscribers.values()),
+            'users': len(self._subscribers),
+            'delivered': self.delivered,
+            'replayed': self.replayed,
+            'overflows': self.overflows,
+            'feed': self.feed.stats() if self.feed is not None else None,
+        }
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_notification_hub():
+    """
+    Get the notification hub for the running event loop, creating it on first use.
+
+    Returns:
+        The loop's NotificationHub
+    """
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = NotificationHub()
+    return hub
@@ -0,0 +1,83 @@
+"""
+Keyset-paginated reads of a user's notification inbox, newest first.
+
+Pages are ordered by ``(created_at, id)`` descending and continue from a
+``<created_at>/<id>`` cursor, the same format as the notification stream's
+event IDs. Each page is a range scan of
+``notifications_user_read_created_at_idx`` (read/unread filters) or
+``notifications_user_created_at_idx`` (no filter), however deep it is; see
+``supabase/benchmarks/notification_inbox_explain.sql``.
+"""
+from core.direct_supabase import Q
+from core.notification_hub import format_cursor, parse_cursor
+
+TABLE = 'notifications'
+
+# Inbox filters and the value of ``read`` they select
+STATUSES = {
+    'all': None,
+    'unread': False,
+    'read': True,
+}
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def inbox_page(user_id, status='all', notification_type=None, limit=DEFAULT_PAGE_SIZE, cursor=None,
+               client=None):
+    """
+    Fetch one page of a user's notifications, newest first.
+
+    Args:
+        user_id: The Supabase user ID
+        status: 'all', 'unread' or 'read'
+        notification_type: Only notifications of this type, e.g. 'course'
+        limit: Notifications per page, at most MAX_PAGE_SIZE
+        cursor: The previous page's ``next_cursor``, or None for the first page
+        client: DirectSupabaseClient to read from (defaults to the shared instance)
+
+    Returns:
+        Dictionary with the page's ``results`` and the ``next_cursor``, which
+        is None on the last page
+
+    Raises:
+        ValueError: If the status or the cursor is invalid
+    """
+    if status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    after = None
+    if cursor:
+        after = parse_cursor(cursor)
+        if after is None:
+            raise ValueError('cursor must be a <created_at>/<id> value from a previous page')
+    if client is None:
+        from core.direct_supabase import supabase as client
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # The request carries no user JWT upstream, so RLS needs the service key;
+    # the user_id filter scopes the page instead
+    query = (client.query(TABLE)
+             .with_service_key()
+             .eq('user_id', user_id))
+    if STATUSES[status] is not None:
+        query.eq('read', STATUSES[status])
+    if notification_type:
+        query.eq('type', notification_type)
+    if after is not None:
+        created_at, notification_id = after
+        # The lte bound is implied by the or, but unlike the or it can start
+        # the index range scan at the cursor instead of the newest row
+        query.lte('created_at', created_at).or_(
+            Q.lt('created_at', created_at),
+            Q.and_(Q.eq('created_at', created_at), Q.lt('id', notification_id)),
+        )
+    # One extra row tells whether there is a next page
+    rows = (query
+            .order('created_at', desc=True)
+            .order('id', desc=True)
+            .limit(limit + 1)
+            .execute()).data or []
+
+    next_cursor = format_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {'results': rows[:limit], 'next_cursor': next_cursor}
@@ -0,0 +1,150 @@
+"""
+Request coalescing ("single-flight") for duplicate concurrent calls.
+
+While a call for a key is in flight, other callers asking for the same key
+wait for it and share its result instead of issuing their own. An exception
+raised by the call is raised in every waiter.
+"""
+import copy
+import asyncio
+import threading
+
+
+class _Call:
+    """One in-flight call and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _AsyncCall:
+    """One in-flight coroutine call."""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Thread-based single-flight group.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.flights = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """
+        Run ``fn`` once for concurrent callers with the same key.
+
+        Args:
+            key: Hashable key identifying duplicate calls
+            fn: Callable with no arguments performing the call
+
+        Returns:
+            The result of ``fn``; callers that joined get a copy
+
+        Raises:
+            Exception: Whatever ``fn`` raised, in the caller that ran it and every waiter
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.flights += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Each caller gets its own copy to mutate
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+
+        return copy.deepcopy(call.result) if shared else call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'flights': self.flights,
+                'shared': self.shared,
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio single-flight group.
+
+    The call runs in its own task, so a caller being cancelled doesn't cancel
+    the call for the others waiting on it. Must only be used from one event loop.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+        self.flights = 0
+        self.shared = 0
+
+    def _finished(self, key, flight, task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark the exception retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, fn):
+        """
+        Await ``fn()`` once for concurrent callers with the same key.
+
+        Args:
+            key: Hashable key identifying duplicate calls
+            fn: Callable with no arguments returning an awaitable
+
+        Returns:
+            The result of ``fn()``; callers that joined get a copy
+
+        Raises:
+            Exception: Whatever ``fn()`` raised, in every caller
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _AsyncCall(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda task: self._finished(key, flight, task))
+            self.flights += 1
+        else:
+            flight.waiters += 1
+            self.shared += 1
+
+        result = await asyncio.shield(flight.task)
+        # Callers sharing a result each get their own copy to mutate
+        return copy.deepcopy(result) if flight.waiters else result
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'flights': self.flights,
+            'shared': self.shared,
+        }
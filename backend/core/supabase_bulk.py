@@ -0,0 +1,264 @@
+"""
+Chunked, concurrent bulk inserts and upserts for Supabase tables.
+
+Rows are streamed from any iterable into fixed-size chunks of rows with the
+same keys, each chunk is sent as one PostgREST POST, and up to ``max_concurrency`` chunks are in
+flight at once. Only a bounded number of rows is held in memory, so
+arbitrarily large generators can be synced. Failed chunks are reported in
+the result, with the positions of their rows in the input, instead of
+aborting the rest of the run.
+"""
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from core.http_pool import _setting
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_CONCURRENCY = 4
+# Rows waiting for a chunk across all key sets, in chunks
+DEFAULT_BUFFERED_CHUNKS = 4
+
+RETURNING_OPTIONS = ('minimal', 'representation')
+
+
+def default_chunk_size():
+    return _setting('SUPABASE_BULK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE, int)
+
+
+def default_max_concurrency():
+    return _setting('SUPABASE_BULK_CONCURRENCY', DEFAULT_MAX_CONCURRENCY, int)
+
+
+def iter_indexed_chunks(rows, chunk_size, max_buffered=None):
+    """
+    Split an iterable of rows into chunks of at most ``chunk_size`` rows
+    that all have the same keys, with each row's position in ``rows``.
+
+    PostgREST needs every object in a bulk body to have the same keys, and
+    padding partial rows with column defaults would overwrite existing
+    values on upsert. Rows are buffered per key set instead. Once
+    ``max_buffered`` rows are waiting across all key sets, the largest
+    buffer is sent early, so input with many row shapes stays in bounded
+    memory.
+
+    Rows with one key set keep their order, but rows with different key
+    sets can be sent in a different order than they were given. Chunks are
+    also sent concurrently, so rows are never applied in input order across
+    chunks; don't rely on the order of two rows for the same record.
+
+    Args:
+        rows: Any iterable of row dictionaries
+        chunk_size: Maximum rows per chunk
+        max_buffered: Maximum rows buffered across all key sets
+            (default ``DEFAULT_BUFFERED_CHUNKS`` chunks)
+
+    Yields:
+        Tuples of (row positions, rows)
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    max_buffered = max(max_buffered or chunk_size * DEFAULT_BUFFERED_CHUNKS, 1)
+    buffers = {}
+    buffered = 0
+    for position, row in enumerate(rows):
+        keys = frozenset(row)
+        indexes, buffer = buffers.setdefault(keys, ([], []))
+        indexes.append(position)
+        buffer.append(row)
+        buffered += 1
+        if len(buffer) >= chunk_size:
+            del buffers[keys]
+            buffered -= len(buffer)
+            yield indexes, buffer
+        elif buffered >= max_buffered:
+            keys = max(buffers, key=lambda keys: len(buffers[keys][1]))
+            indexes, buffer = buffers.pop(keys)
+            buffered -= len(buffer)
+            yield indexes, buffer
+    for indexes, buffer in buffers.values():
+        yield indexes, buffer
+
+
+def iter_chunks(rows, chunk_size, max_buffered=None):
+    """
+    Split an iterable of rows into lists of at most ``chunk_size`` rows
+    that all have the same keys (see ``iter_indexed_chunks``).
+
+    Args:
+        rows: Any iterable of row dictionaries
+        chunk_size: Maximum rows per chunk
+        max_buffered: Maximum rows buffered across all key sets
+
+    Yields:
+        Lists of rows
+    """
+    for indexes, chunk in iter_indexed_chunks(rows, chunk_size, max_buffered):
+        yield chunk
+
+
+def upsert_request(chunk, on_conflict=None, returning="minimal", ignore_duplicates=False, upsert=True):
+    """
+    Build the query parameters and headers for one bulk insert/upsert POST.
+
+    Args:
+        chunk: The rows in the chunk, all with the same keys (see ``iter_chunks``)
+        on_conflict: Comma-separated unique columns to upsert on (default: primary key)
+        returning: "minimal" (no body) or "representation" (return the rows)
+        ignore_duplicates: Skip conflicting rows instead of merging them
+        upsert: False for a plain insert
+
+    Returns:
+        Tuple of (params, headers)
+    """
+    if returning not in RETURNING_OPTIONS:
+        raise ValueError(f"returning must be one of {RETURNING_OPTIONS}")
+
+    prefer = [f"return={returning}"]
+    if upsert:
+        prefer.append("resolution=ignore-duplicates" if ignore_duplicates else "resolution=merge-duplicates")
+
+    params = {}
+    if upsert and on_conflict:
+        params["on_conflict"] = on_conflict
+
+    return params, {"Prefer": ",".join(prefer)}
+
+
+def _chunk_error(index, row_indexes, chunk, exc):
+    response = getattr(exc, "response", None)
+    return {
+        "chunk": index,
+        # Positions of the chunk's rows in the input
+        "row_indexes": row_indexes,
+        "rows": len(chunk),
+        "status": getattr(response, "status_code", None),
+        "error": (response.text if response is not None and response.text else str(exc)),
+    }
+
+
+class _BulkResult:
+    """Aggregates per-chunk outcomes into the result dictionary."""
+
+    def __init__(self, returning):
+        self.returning = returning
+        self.started = time.monotonic()
+        self.result = {
+            "rows": 0,
+            "upserted": 0,
+            "failed": 0,
+            "chunks": 0,
+            "failed_chunks": 0,
+            "errors": [],
+        }
+        if returning == "representation":
+            self.result["returned"] = []
+
+    def submitted(self, chunk):
+        self.result["rows"] += len(chunk)
+        self.result["chunks"] += 1
+
+    def succeeded(self, chunk, response):
+        self.result["upserted"] += len(chunk)
+        if self.returning == "representation" and response:
+            self.result["returned"].extend(response)
+
+    def failed(self, index, row_indexes, chunk, exc):
+        self.result["failed"] += len(chunk)
+        self.result["failed_chunks"] += 1
+        self.result["errors"].append(_chunk_error(index, row_indexes, chunk, exc))
+
+    def finish(self):
+        self.result["errors"].sort(key=lambda error: error["chunk"])
+        self.result["elapsed_seconds"] = time.monotonic() - self.started
+        return self.result
+
+
+def bulk_send(send_chunk, rows, chunk_size=None, max_concurrency=None, returning="minimal"):
+    """
+    Send rows in chunks from a thread pool.
+
+    Args:
+        send_chunk: Callable taking a list of rows and sending it; exceptions mark the chunk failed
+        rows: Any iterable of row dictionaries
+        chunk_size: Maximum rows per request
+        max_concurrency: Maximum chunks in flight
+        returning: "minimal" or "representation" (collect returned rows)
+
+    Returns:
+        Dictionary with row and chunk counts, per-chunk errors and elapsed time
+    """
+    chunk_size = chunk_size or default_chunk_size()
+    max_concurrency = max_concurrency or default_max_concurrency()
+    outcome = _BulkResult(returning)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                index, row_indexes, chunk = pending.pop(future)
+                try:
+                    outcome.succeeded(chunk, future.result())
+                except Exception as e:
+                    outcome.failed(index, row_indexes, chunk, e)
+
+        for index, (row_indexes, chunk) in enumerate(iter_indexed_chunks(rows, chunk_size)):
+            # Only read ahead as many chunks as can be in flight
+            if len(pending) >= max_concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            outcome.submitted(chunk)
+            pending[executor.submit(send_chunk, chunk)] = (index, row_indexes, chunk)
+
+        if pending:
+            done, _ = wait(pending)
+            collect(done)
+
+    return outcome.finish()
+
+
+async def abulk_send(send_chunk, rows, chunk_size=None, max_concurrency=None, returning="minimal"):
+    """
+    Async variant of ``bulk_send``; ``send_chunk`` returns an awaitable.
+
+    Args:
+        send_chunk: Callable taking a list of rows and returning an awaitable
+        rows: Any iterable of row dictionaries
+        chunk_size: Maximum rows per request
+        max_concurrency: Maximum chunks in flight
+        returning: "minimal" or "representation" (collect returned rows)
+
+    Returns:
+        Dictionary with row and chunk counts, per-chunk errors and elapsed time
+    """
+    chunk_size = chunk_size or default_chunk_size()
+    max_concurrency = max_concurrency or default_max_concurrency()
+    outcome = _BulkResult(returning)
+
+    pending = {}
+
+    def collect(done):
+        for task in done:
+            index, row_indexes, chunk = pending.pop(task)
+            try:
+                outcome.succeeded(chunk, task.result())
+            except Exception as e:
+                outcome.failed(index, row_indexes, chunk, e)
+
+    try:
+        for index, (row_indexes, chunk) in enumerate(iter_indexed_chunks(rows, chunk_size)):
+            if len(pending) >= max_concurrency:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            outcome.submitted(chunk)
+            pending[asyncio.ensure_future(send_chunk(chunk))] = (index, row_indexes, chunk)
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            collect(done)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return outcome.finish()
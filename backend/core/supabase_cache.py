@@ -0,0 +1,230 @@
+"""
+Read-through TTL cache for Supabase ``select`` results.
+
+Results are keyed by table, columns, filters, order and limit and kept for a
+per-table TTL. Writes made through a Supabase client invalidate every cached
+result for the written table. One cache is shared per Supabase project by the
+sync and async clients, so a write through either invalidates reads from both.
+"""
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+from core.http_pool import _setting
+
+# Seconds a select result stays cached for tables without their own TTL (0 disables)
+DEFAULT_SELECT_CACHE_TTL = 0
+# Per-table TTLs, as "table=seconds,table=seconds"
+DEFAULT_SELECT_CACHE_TABLE_TTLS = 'courses=60'
+DEFAULT_SELECT_CACHE_SIZE = 1024
+
+
+def parse_table_ttls(value):
+    """
+    Parse per-table TTLs.
+
+    Args:
+        value: A dictionary, or a string like ``"courses=60,profiles=5"``
+
+    Returns:
+        Dictionary mapping table names to TTL seconds
+    """
+    if isinstance(value, dict):
+        return value
+    ttls = {}
+    for item in (value or '').split(','):
+        table, _, seconds = item.strip().partition('=')
+        if table and seconds:
+            ttls[table.strip()] = float(seconds)
+    return ttls
+
+
+def select_cache_key(table, columns="*", filters=None, limit=None, order=None):
+    """Build the cache key for a select; filter order does not matter."""
+    filter_items = tuple(sorted((str(k), str(v)) for k, v in (filters or {}).items()))
+    return (table, columns or "*", filter_items, order, limit)
+
+
+class SelectCache:
+    """
+    Bounded LRU cache of select results with per-table TTLs.
+
+    Each table has a generation counter that is bumped on invalidation. A
+    read records the generation before it goes upstream and its result is
+    only stored if no write happened meanwhile, so a slow read can't
+    re-populate the cache with rows older than a completed write.
+    """
+
+    def __init__(self, default_ttl=DEFAULT_SELECT_CACHE_TTL, table_ttls=None,
+                 max_size=DEFAULT_SELECT_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            default_ttl: TTL in seconds for tables without their own (0 disables)
+            table_ttls: Dictionary mapping table names to TTL seconds
+            max_size: Maximum number of entries before the least recently used is evicted
+        """
+        self.default_ttl = default_ttl
+        self.table_ttls = dict(table_ttls or {})
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._table_stats = {}
+
+    def ttl_for(self, table):
+        """Return the TTL for a table, 0 if its results are not cached."""
+        return self.table_ttls.get(table, self.default_ttl)
+
+    def generation(self, table):
+        """Return the table's invalidation generation."""
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def _count(self, table, outcome):
+        counts = self._table_stats.setdefault(table, {'hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+    def get(self, key):
+        """
+        Get a cached result.
+
+        Args:
+            key: Key from ``select_cache_key``
+
+        Returns:
+            A copy of the cached result, or None on a miss
+        """
+        table = key[0]
+        if not self.ttl_for(table):
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                self._count(table, 'misses')
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._count(table, 'hits')
+            result = entry[0]
+
+        # Callers may mutate what they get back
+        return copy.deepcopy(result)
+
+    def set(self, key, result, generation=None):
+        """
+        Cache a result for the table's TTL.
+
+        Args:
+            key: Key from ``select_cache_key``
+            result: The select result
+            generation: Table generation read before the upstream request;
+                the result is dropped if the table was invalidated since
+        """
+        table = key[0]
+        ttl = self.ttl_for(table)
+        if not ttl:
+            return
+
+        result = copy.deepcopy(result)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(table, 0):
+                return
+            self._entries[key] = (result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def invalidate(self, table):
+        """
+        Drop every cached result for a table.
+
+        Args:
+            table: The table name
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key in self._entries if key[0] == table]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._generations:
+                self._generations[table] += 1
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary of counters, the overall hit ratio and per-table hit ratios
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            tables = {}
+            for table, counts in self._table_stats.items():
+                table_lookups = counts['hits'] + counts['misses']
+                tables[table] = dict(
+                    counts,
+                    hit_ratio=counts['hits'] / table_lookups if table_lookups else 0.0,
+                )
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'tables': tables,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_select_cache(supabase_url):
+    """
+    Get the process-wide select cache for a Supabase project, configured from settings.
+
+    Args:
+        supabase_url: The project URL the cached results come from
+
+    Returns:
+        The shared SelectCache
+    """
+    cache = _caches.get(supabase_url)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(supabase_url)
+            if cache is None:
+                cache = _caches[supabase_url] = SelectCache(
+                    default_ttl=_setting('SUPABASE_SELECT_CACHE_TTL', DEFAULT_SELECT_CACHE_TTL, float),
+                    table_ttls=parse_table_ttls(
+                        _setting('SUPABASE_SELECT_CACHE_TABLE_TTLS', DEFAULT_SELECT_CACHE_TABLE_TTLS)
+                    ),
+                    max_size=_setting('SUPABASE_SELECT_CACHE_SIZE', DEFAULT_SELECT_CACHE_SIZE, int),
+                )
+    return cache
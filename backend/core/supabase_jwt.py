@@ -0,0 +1,710 @@
+"""
+Supabase JWT verification shared by the DRF authentication classes and the
+Django authentication backend, with an async variant for async views.
+
+Tokens are verified either against the Supabase JWKS endpoint or, in local
+mode, fully in-process against a configured HS256 secret or PEM/JWK public
+key. Verified claims are cached by token digest until the token expires, so a
+token that is presented repeatedly only pays for signature verification once.
+Malformed, expired and forged tokens are rejected by a cheap structural
+pre-check or a short-lived negative cache before any network or RSA work.
+"""
+import json
+import time
+import base64
+import asyncio
+import binascii
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import jwt
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from cryptography.hazmat.primitives.asymmetric.ec import EllipticCurvePublicKey
+from django.conf import settings
+
+from core.jwks import get_jwks_store, parse_jwk
+
+# Maximum number of verified tokens kept in memory
+DEFAULT_TOKEN_CACHE_SIZE = 10000
+# Worker threads for offloaded signature checks in the async path
+DEFAULT_VERIFY_THREADS = 4
+# Seconds a token that failed verification is rejected without re-checking
+DEFAULT_NEGATIVE_CACHE_TTL = 30
+# Maximum number of rejected token digests kept in memory
+DEFAULT_NEGATIVE_CACHE_SIZE = 10000
+
+SUPABASE_JWT_AUDIENCE = 'authenticated'
+
+# Verification modes for SUPABASE_JWT_VERIFICATION_MODE
+VERIFICATION_MODE_JWKS = 'jwks'
+VERIFICATION_MODE_LOCAL = 'local'
+
+# Algorithms accepted for keys published through JWKS
+JWKS_ALGORITHMS = ['RS256', 'ES256']
+
+# Prefix marking token cache entries verified with locally configured keys
+LOCAL_KID_PREFIX = 'local:'
+
+
+class UnknownSigningKeyError(jwt.InvalidTokenError):
+    """Raised when no public key matches the ``kid`` in the token header."""
+    pass
+
+
+def token_digest(token):
+    """Return the SHA-256 hex digest used to key a token in memory."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified JWT claims keyed by token digest.
+
+    Each entry remembers the ``kid`` it was verified with and expires at the
+    token's ``exp`` claim. An entry whose signing key is no longer published
+    by the JWKS key store is dropped, so rotated-out keys stop authenticating
+    even for tokens verified before the rotation.
+    """
+
+    def __init__(self, max_size=DEFAULT_TOKEN_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries before the least recently used is evicted
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, digest, key_is_valid=None):
+        """
+        Get the cached claims for a token digest.
+
+        Args:
+            digest: The token digest
+            key_is_valid: Optional callable taking the ``kid`` and returning
+                False if the signing key has been rotated out
+
+        Returns:
+            The cached claims, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            payload, kid, expires_at = entry
+            if expires_at <= time.time() or (key_is_valid is not None and not key_is_valid(kid)):
+                del self._entries[digest]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return payload
+
+    def set(self, digest, payload, kid):
+        """
+        Cache verified claims until the token's ``exp`` claim.
+
+        Args:
+            digest: The token digest
+            payload: The verified claims
+            kid: The key ID the token was verified with
+        """
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[digest] = (payload, kid, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary of hit/miss/eviction counters and the current size
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+        }
+
+
+class NegativeTokenCache:
+    """
+    Bounded LRU of token digests that recently failed verification.
+
+    A forged or expired token replayed in a burst is rejected from memory with
+    the same error it first failed with, instead of repeating the JWKS lookup
+    and signature check.
+    """
+
+    def __init__(self, ttl=DEFAULT_NEGATIVE_CACHE_TTL, max_size=DEFAULT_NEGATIVE_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds a rejection is remembered
+            max_size: Maximum number of entries before the least recently used is evicted
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """
+        Get the remembered rejection for a token digest.
+
+        Returns:
+            An ``(exception class, message)`` tuple, or None
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+
+            error_class, message, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[digest]
+                return None
+
+            self._entries.move_to_end(digest)
+            return error_class, message
+
+    def set(self, digest, exc):
+        """Remember that a token digest failed verification with ``exc``."""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[digest] = (type(exc), str(exc), time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RejectionCounters:
+    """Thread-safe counters of rejected tokens by reason."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def increment(self, reason):
+        with self._lock:
+            self._counts[reason] = self._counts.get(reason, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def stats(self):
+        """Return a copy of the counts keyed by rejection reason."""
+        with self._lock:
+            return dict(self._counts)
+
+
+rejections = RejectionCounters()
+
+
+class LocalKeySet:
+    """
+    Signing material configured in settings for offline verification.
+
+    Holds an optional HS256 shared secret and any number of public keys
+    loaded from PEM, a single JWK or a JWKS document. A PEM key has no
+    ``kid`` of its own unless one is configured, in which case it verifies
+    every asymmetric token regardless of the ``kid`` in its header.
+    """
+
+    def __init__(self, secret=None, public_key=None, key_id=None):
+        """
+        Initialize the key set.
+
+        Args:
+            secret: HS256 shared secret (the Supabase project's JWT secret)
+            public_key: PEM-encoded public key, JWK or JWKS document as a string
+            key_id: Optional ``kid`` to assign to a PEM-encoded public key
+        """
+        self.secret = secret or None
+        # kid -> (public key, algorithm); a PEM key without kid is stored under None
+        self.public_keys = {}
+
+        if public_key:
+            self._load_public_key(public_key.strip(), key_id or None)
+
+    def _load_public_key(self, material, key_id):
+        """Parse PEM, JWK or JWKS material into ``public_keys``."""
+        if material.startswith('-----BEGIN'):
+            key = load_pem_public_key(material.encode('utf-8'))
+            self.public_keys[key_id] = (key, self._algorithm_for(key))
+            return
+
+        document = json.loads(material)
+        jwks = document.get('keys', [document])
+        for jwk in jwks:
+            key = parse_jwk(jwk)
+            if key is None:
+                raise ValueError(f"Unsupported key type: {jwk.get('kty')}")
+            self.public_keys[jwk.get('kid')] = (key, self._algorithm_for(key))
+
+    @staticmethod
+    def _algorithm_for(key):
+        if isinstance(key, RSAPublicKey):
+            return 'RS256'
+        if isinstance(key, EllipticCurvePublicKey):
+            return 'ES256'
+        raise ValueError(f"Unsupported public key type: {type(key).__name__}")
+
+    def resolve(self, header):
+        """
+        Find the local key for a token header.
+
+        Args:
+            header: The unverified JWT header
+
+        Returns:
+            A ``(key, algorithms, cache_kid)`` tuple, or None if no local key applies
+        """
+        alg = header.get('alg')
+        kid = header.get('kid')
+
+        if alg == 'HS256':
+            if self.secret:
+                return self.secret, ['HS256'], f"{LOCAL_KID_PREFIX}hs256"
+            return None
+
+        entry = self.public_keys.get(kid)
+        if entry is None and None in self.public_keys:
+            entry = self.public_keys[None]
+        if entry is None and kid is None and len(self.public_keys) == 1:
+            entry = next(iter(self.public_keys.values()))
+
+        if entry is None or entry[1] != alg:
+            return None
+
+        key, algorithm = entry
+        return key, [algorithm], f"{LOCAL_KID_PREFIX}{kid}"
+
+
+_local_keys = None
+_local_keys_config = None
+_local_keys_lock = threading.Lock()
+
+
+def get_local_key_set():
+    """
+    Get the locally configured key set, rebuilding it if settings changed.
+
+    Returns:
+        The LocalKeySet built from SUPABASE_JWT_SECRET, SUPABASE_JWT_PUBLIC_KEY
+        and SUPABASE_JWT_KEY_ID
+    """
+    global _local_keys, _local_keys_config
+
+    config = (
+        getattr(settings, 'SUPABASE_JWT_SECRET', None),
+        getattr(settings, 'SUPABASE_JWT_PUBLIC_KEY', None),
+        getattr(settings, 'SUPABASE_JWT_KEY_ID', None),
+    )
+    if _local_keys is None or _local_keys_config != config:
+        with _local_keys_lock:
+            if _local_keys is None or _local_keys_config != config:
+                _local_keys = LocalKeySet(secret=config[0], public_key=config[1], key_id=config[2])
+                _local_keys_config = config
+    return _local_keys
+
+
+def _resolve_local_key(header):
+    """
+    Pick a locally configured key when local verification mode is enabled.
+
+    Args:
+        header: The unverified JWT header
+
+    Returns:
+        A ``(key, algorithms, cache_kid)`` tuple, or None if the JWKS key store
+        should be consulted instead
+
+    Raises:
+        UnknownSigningKeyError: If no local key matches and JWKS fallback is disabled
+    """
+    mode = getattr(settings, 'SUPABASE_JWT_VERIFICATION_MODE', VERIFICATION_MODE_JWKS)
+    if mode != VERIFICATION_MODE_LOCAL:
+        return None
+
+    resolved = get_local_key_set().resolve(header)
+    if resolved is not None:
+        return resolved
+    if not getattr(settings, 'SUPABASE_JWT_JWKS_FALLBACK', False):
+        raise UnknownSigningKeyError('No matching key found')
+    return None
+
+
+def _resolve_signing_key(header):
+    """
+    Pick the key to verify a token with, according to the verification mode.
+
+    Args:
+        header: The unverified JWT header
+
+    Returns:
+        A ``(key, algorithms, cache_kid)`` tuple
+
+    Raises:
+        UnknownSigningKeyError: If no configured or published key matches
+    """
+    resolved = _resolve_local_key(header)
+    if resolved is not None:
+        return resolved
+
+    # Look up the public key in the shared JWKS key store
+    kid = header.get('kid')
+    public_key = get_jwks_store().get_key(kid)
+
+    if public_key is None:
+        raise UnknownSigningKeyError('No matching key found')
+
+    return public_key, JWKS_ALGORITHMS, kid
+
+
+async def _aresolve_signing_key(header):
+    """Async variant of ``_resolve_signing_key`` that never blocks on JWKS fetches."""
+    resolved = _resolve_local_key(header)
+    if resolved is not None:
+        return resolved
+
+    kid = header.get('kid')
+    public_key = await get_jwks_store().aget_key(kid)
+
+    if public_key is None:
+        raise UnknownSigningKeyError('No matching key found')
+
+    return public_key, JWKS_ALGORITHMS, kid
+
+
+def _decode(token, key, algorithms):
+    """Verify the signature and standard claims of a Supabase JWT."""
+    return jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=SUPABASE_JWT_AUDIENCE,
+        options={'verify_exp': True}
+    )
+
+
+def _signing_key_is_valid(kid):
+    """Return False if a cached token's signing key has been rotated out."""
+    if kid is not None and kid.startswith(LOCAL_KID_PREFIX):
+        mode = getattr(settings, 'SUPABASE_JWT_VERIFICATION_MODE', VERIFICATION_MODE_JWKS)
+        return mode == VERIFICATION_MODE_LOCAL
+    return get_jwks_store().has_key(kid)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Get the process-wide verified-token cache.
+
+    Returns:
+        The shared VerifiedTokenCache, or None if disabled with SUPABASE_JWT_CACHE_ENABLED
+    """
+    global _token_cache
+
+    if not getattr(settings, 'SUPABASE_JWT_CACHE_ENABLED', True):
+        return None
+
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = VerifiedTokenCache(
+                    max_size=getattr(settings, 'SUPABASE_JWT_CACHE_SIZE', DEFAULT_TOKEN_CACHE_SIZE)
+                )
+    return _token_cache
+
+
+_negative_cache = None
+_negative_cache_lock = threading.Lock()
+
+
+def get_negative_cache():
+    """
+    Get the process-wide cache of rejected token digests.
+
+    Returns:
+        The shared NegativeTokenCache, or None if SUPABASE_JWT_NEGATIVE_CACHE_TTL is 0
+    """
+    global _negative_cache
+
+    ttl = getattr(settings, 'SUPABASE_JWT_NEGATIVE_CACHE_TTL', DEFAULT_NEGATIVE_CACHE_TTL)
+    if ttl <= 0:
+        return None
+
+    if _negative_cache is None:
+        with _negative_cache_lock:
+            if _negative_cache is None:
+                _negative_cache = NegativeTokenCache(
+                    ttl=ttl,
+                    max_size=getattr(settings, 'SUPABASE_JWT_NEGATIVE_CACHE_SIZE', DEFAULT_NEGATIVE_CACHE_SIZE),
+                )
+    return _negative_cache
+
+
+def _b64_json(segment):
+    """Decode a base64url JWT segment into a JSON object."""
+    padded = segment + '=' * (-len(segment) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def _reject(reason, error):
+    """Count a rejection and return the error to raise."""
+    rejections.increment(reason)
+    return error
+
+
+def _rejection_reason(exc):
+    """Map a verification error to its rejection reason."""
+    if isinstance(exc, UnknownSigningKeyError):
+        return 'unknown_kid'
+    if isinstance(exc, jwt.ExpiredSignatureError):
+        return 'expired'
+    if isinstance(exc, jwt.InvalidSignatureError):
+        return 'bad_signature'
+    if isinstance(exc, jwt.DecodeError):
+        return 'malformed'
+    return 'invalid_claims'
+
+
+def _allowed_algorithms():
+    """Algorithms a token may declare given the verification mode."""
+    mode = getattr(settings, 'SUPABASE_JWT_VERIFICATION_MODE', VERIFICATION_MODE_JWKS)
+    if mode == VERIFICATION_MODE_LOCAL:
+        algorithms = {'HS256', 'RS256', 'ES256'}
+        if not getattr(settings, 'SUPABASE_JWT_JWKS_FALLBACK', False):
+            if not get_local_key_set().secret:
+                algorithms.discard('HS256')
+        return algorithms
+    return set(JWKS_ALGORITHMS)
+
+
+def precheck_token(token):
+    """
+    Reject obviously bad tokens before any network or signature work.
+
+    Checks the segment count, that the header parses and declares an accepted
+    algorithm, that the payload's ``exp`` is not already in the past, and (in
+    JWKS mode) that the ``kid`` is known or can still be fetched.
+
+    Args:
+        token: The encoded JWT
+
+    Returns:
+        The parsed, still unverified, header
+
+    Raises:
+        jwt.InvalidTokenError: With the same error types full verification would raise
+    """
+    segments = token.split('.')
+    if len(segments) != 3:
+        raise _reject('malformed', jwt.DecodeError('Not enough segments'))
+
+    try:
+        header = _b64_json(segments[0])
+    except (ValueError, binascii.Error, UnicodeError):
+        raise _reject('bad_header', jwt.DecodeError('Invalid header'))
+    if not isinstance(header, dict):
+        raise _reject('bad_header', jwt.DecodeError('Invalid header'))
+
+    if header.get('alg') not in _allowed_algorithms():
+        raise _reject('unsupported_alg', jwt.InvalidAlgorithmError('The specified alg value is not allowed'))
+
+    try:
+        claims = _b64_json(segments[1])
+    except (ValueError, binascii.Error, UnicodeError):
+        raise _reject('malformed', jwt.DecodeError('Invalid payload'))
+
+    exp = claims.get('exp') if isinstance(claims, dict) else None
+    if isinstance(exp, (int, float)) and exp <= time.time():
+        raise _reject('expired', jwt.ExpiredSignatureError('Signature has expired'))
+
+    mode = getattr(settings, 'SUPABASE_JWT_VERIFICATION_MODE', VERIFICATION_MODE_JWKS)
+    if mode == VERIFICATION_MODE_JWKS and not get_jwks_store().can_resolve(header.get('kid')):
+        raise _reject('unknown_kid', UnknownSigningKeyError('No matching key found'))
+
+    return header
+
+
+def _guard(token, digest):
+    """
+    Run the negative cache and structural pre-check for an uncached token.
+
+    Returns:
+        The parsed, still unverified, header
+    """
+    negative_cache = get_negative_cache()
+
+    if negative_cache is not None:
+        rejected = negative_cache.get(digest)
+        if rejected is not None:
+            error_class, message = rejected
+            raise _reject('negative_cache', error_class(message))
+
+    try:
+        return precheck_token(token)
+    except UnknownSigningKeyError:
+        raise
+    except jwt.InvalidTokenError as e:
+        if negative_cache is not None:
+            negative_cache.set(digest, e)
+        raise
+
+
+def _record_failure(digest, exc):
+    """Count a failed verification and remember it unless the key may still appear."""
+    rejections.increment(_rejection_reason(exc))
+    negative_cache = get_negative_cache()
+    if negative_cache is not None and not isinstance(exc, UnknownSigningKeyError):
+        negative_cache.set(digest, exc)
+
+
+def verify_supabase_token(token):
+    """
+    Verify a Supabase JWT and return its claims.
+
+    Args:
+        token: The encoded JWT
+
+    Returns:
+        The verified payload
+
+    Raises:
+        UnknownSigningKeyError: If no public key matches the token's ``kid``
+        jwt.InvalidTokenError: If the token is malformed, expired or forged
+        requests.RequestException: If the JWKS endpoint cannot be reached
+            (never raised in local mode without JWKS fallback)
+    """
+    cache = get_token_cache()
+    digest = token_digest(token)
+
+    if cache is not None:
+        payload = cache.get(digest, key_is_valid=_signing_key_is_valid)
+        if payload is not None:
+            return dict(payload)
+
+    # Reject known-bad and structurally invalid tokens before any key lookup
+    header = _guard(token, digest)
+
+    try:
+        # Pick the verification key, then verify and decode the token
+        key, algorithms, cache_kid = _resolve_signing_key(header)
+        payload = _decode(token, key, algorithms)
+    except jwt.InvalidTokenError as e:
+        _record_failure(digest, e)
+        raise
+
+    if cache is not None:
+        cache.set(digest, payload, cache_kid)
+
+    return dict(payload)
+
+
+_verify_executor = None
+_verify_executor_lock = threading.Lock()
+
+
+def _get_verify_executor():
+    """Get the thread pool used to offload signature checks from the event loop."""
+    global _verify_executor
+
+    if _verify_executor is None:
+        with _verify_executor_lock:
+            if _verify_executor is None:
+                _verify_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'SUPABASE_JWT_VERIFY_THREADS', DEFAULT_VERIFY_THREADS),
+                    thread_name_prefix='jwt-verify',
+                )
+    return _verify_executor
+
+
+async def averify_supabase_token(token):
+    """
+    Async variant of ``verify_supabase_token`` for async views.
+
+    JWKS fetches use a non-blocking HTTP client. With SUPABASE_JWT_VERIFY_IN_THREAD
+    enabled, signature verification runs on a small dedicated thread pool so a
+    burst of cold tokens does not stall the event loop.
+
+    Args:
+        token: The encoded JWT
+
+    Returns:
+        The verified payload, identical to ``verify_supabase_token``
+
+    Raises:
+        UnknownSigningKeyError: If no public key matches the token's ``kid``
+        jwt.InvalidTokenError: If the token is malformed, expired or forged
+        httpx.HTTPError: If the JWKS endpoint cannot be reached
+    """
+    cache = get_token_cache()
+    digest = token_digest(token)
+
+    if cache is not None:
+        payload = cache.get(digest, key_is_valid=_signing_key_is_valid)
+        if payload is not None:
+            return dict(payload)
+
+    header = _guard(token, digest)
+
+    try:
+        key, algorithms, cache_kid = await _aresolve_signing_key(header)
+
+        if getattr(settings, 'SUPABASE_JWT_VERIFY_IN_THREAD', False):
+            loop = asyncio.get_running_loop()
+            payload = await loop.run_in_executor(
+                _get_verify_executor(), _decode, token, key, algorithms
+            )
+        else:
+            payload = _decode(token, key, algorithms)
+    except jwt.InvalidTokenError as e:
+        _record_failure(digest, e)
+        raise
+
+    if cache is not None:
+        cache.set(digest, payload, cache_kid)
+
+    return dict(payload)
@@ -0,0 +1,363 @@
+"""
+Latency and error instrumentation for Supabase calls.
+
+Every REST/auth request made by the Supabase clients is recorded with its
+target (PostgREST table or auth endpoint), verb, status, latency, payload
+sizes, retries and error class. Records go to pluggable sinks:
+
+- ``logging``: one structured DEBUG log line per call
+- ``ring``: the last N calls in memory, with per-target summaries
+- ``prometheus``: counters and latency histograms in Prometheus text format
+
+Calls slower than ``SUPABASE_SLOW_CALL_MS`` are also logged as warnings.
+"""
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f"{__name__}.slow")
+
+DEFAULT_SINKS = 'ring,prometheus'
+DEFAULT_RING_SIZE = 1000
+# Calls at least this slow are logged as warnings (0 disables)
+DEFAULT_SLOW_CALL_MS = 1000
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def target_from_url(url):
+    """
+    Name the Supabase resource a URL addresses.
+
+    Args:
+        url: Absolute request URL
+
+    Returns:
+        The table name for ``/rest/v1/<table>``, ``rpc/<function>`` for
+        ``/rest/v1/rpc/<function>``, ``auth/<endpoint>`` for
+        ``/auth/v1/<endpoint>``, else the path
+    """
+    path = urlsplit(url).path
+    if '/rest/v1/' in path:
+        parts = path.split('/rest/v1/', 1)[1].split('/')
+        if parts[0] == 'rpc' and len(parts) > 1:
+            return '/'.join(parts[:2])
+        return parts[0] or 'rest'
+    if '/auth/v1/' in path:
+        endpoint = path.split('/auth/v1/', 1)[1]
+        # Drop IDs from paths like admin/users/<id>
+        parts = [part for part in endpoint.split('/') if part]
+        if len(parts) > 2 and parts[0] == 'admin':
+            parts = parts[:2]
+        return 'auth/' + '/'.join(parts)
+    return path
+
+
+class CallRecord:
+    """One recorded Supabase call."""
+
+    __slots__ = ('client', 'target', 'verb', 'status', 'duration', 'request_bytes',
+                 'response_bytes', 'retries', 'error', 'timestamp')
+
+    def __init__(self, client, target, verb, status, duration, request_bytes=0,
+                 response_bytes=0, retries=0, error=None):
+        self.client = client
+        self.target = target
+        self.verb = verb
+        self.status = status
+        self.duration = duration
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.retries = retries
+        self.error = error
+        self.timestamp = time.time()
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class LoggingSink:
+    """Logs every call as a structured DEBUG record."""
+
+    def __init__(self, level=logging.DEBUG):
+        self.level = level
+
+    def emit(self, record):
+        logger.log(
+            self.level,
+            f"supabase {record.client} {record.verb} {record.target} -> {record.status} "
+            f"in {record.duration * 1000:.1f}ms",
+            extra={'supabase_call': record.as_dict()},
+        )
+
+
+class RingBufferSink:
+    """Keeps the most recent calls in memory."""
+
+    def __init__(self, size=DEFAULT_RING_SIZE):
+        self._records = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        """Return the buffered calls, oldest first."""
+        with self._lock:
+            return list(self._records)
+
+    def summary(self):
+        """
+        Summarize the buffered calls per target and verb.
+
+        Returns:
+            Dictionary keyed by ``"<verb> <target>"`` with call and error
+            counts and p50/p95/max latency in milliseconds
+        """
+        groups = {}
+        for record in self.records():
+            groups.setdefault(f"{record.verb} {record.target}", []).append(record)
+
+        summary = {}
+        for key, records in groups.items():
+            durations = sorted(r.duration for r in records)
+            summary[key] = {
+                'calls': len(records),
+                'errors': sum(1 for r in records if r.error),
+                'p50_ms': durations[int(0.50 * (len(durations) - 1))] * 1000,
+                'p95_ms': durations[int(0.95 * (len(durations) - 1))] * 1000,
+                'max_ms': durations[-1] * 1000,
+            }
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+class PrometheusSink:
+    """Aggregates calls into counters and latency histograms for Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._request_bytes = {}
+        self._response_bytes = {}
+        self._retries = {}
+        self._errors = {}
+
+    def emit(self, record):
+        status = record.status if record.status is not None else 'none'
+        key = (record.client, record.target, record.verb, str(status))
+        short_key = (record.client, record.target, record.verb)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if record.duration <= bound:
+                    histogram[0][index] += 1
+            histogram[1] += 1
+            histogram[2] += record.duration
+
+            self._request_bytes[short_key] = self._request_bytes.get(short_key, 0) + record.request_bytes
+            self._response_bytes[short_key] = self._response_bytes.get(short_key, 0) + record.response_bytes
+            self._retries[short_key] = self._retries.get(short_key, 0) + record.retries
+            if record.error:
+                error_key = short_key + (record.error,)
+                self._errors[error_key] = self._errors.get(error_key, 0) + 1
+
+    def render(self):
+        """
+        Render the aggregates in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text
+        """
+        lines = []
+        with self._lock:
+            lines.append('# HELP supabase_request_duration_seconds Supabase call latency.')
+            lines.append('# TYPE supabase_request_duration_seconds histogram')
+            for (client, target, verb, status), (counts, count, total) in sorted(self._histograms.items()):
+                labels = dict(client=client, target=target, verb=verb, status=status)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(
+                        f'supabase_request_duration_seconds_bucket{{{_labels(**labels, le=bound)}}} {bucket_count}'
+                    )
+                lines.append(f'supabase_request_duration_seconds_bucket{{{_labels(**labels, le="+Inf")}}} {count}')
+                lines.append(f'supabase_request_duration_seconds_sum{{{_labels(**labels)}}} {total}')
+                lines.append(f'supabase_request_duration_seconds_count{{{_labels(**labels)}}} {count}')
+
+            counters = [
+                ('supabase_request_bytes_total', 'Bytes sent in Supabase request bodies.', self._request_bytes),
+                ('supabase_response_bytes_total', 'Bytes received in Supabase response bodies.', self._response_bytes),
+                ('supabase_retries_total', 'Supabase call retries.', self._retries),
+            ]
+            for name, help_text, values in counters:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for (client, target, verb), value in sorted(values.items()):
+                    lines.append(f'{name}{{{_labels(client=client, target=target, verb=verb)}}} {value}')
+
+            lines.append('# HELP supabase_errors_total Failed Supabase calls by error class.')
+            lines.append('# TYPE supabase_errors_total counter')
+            for (client, target, verb, error), value in sorted(self._errors.items()):
+                lines.append(f'supabase_errors_total{{{_labels(client=client, target=target, verb=verb, error=error)}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+SINK_ALIASES = {
+    'logging': LoggingSink,
+    'ring': RingBufferSink,
+    'prometheus': PrometheusSink,
+}
+
+
+class CallRecorder:
+    """
+    Dispatches call records to the configured sinks and logs slow calls.
+    """
+
+    def __init__(self, sinks=None, slow_call_ms=DEFAULT_SLOW_CALL_MS):
+        """
+        Initialize the recorder.
+
+        Args:
+            sinks: Sink instances; each needs an ``emit(record)`` method
+            slow_call_ms: Latency at which a call is logged as slow (0 disables)
+        """
+        self.sinks = list(sinks or [])
+        self.slow_call_ms = slow_call_ms
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def sink(self, sink_class):
+        """Return the first sink of a class, or None."""
+        return next((sink for sink in self.sinks if isinstance(sink, sink_class)), None)
+
+    def record(self, client, target, verb, status, duration, request_bytes=0,
+               response_bytes=0, retries=0, error=None):
+        """
+        Record one call.
+
+        Args:
+            client: Which client made the call ("rest", "async", "sdk")
+            target: Table or auth endpoint, see ``target_from_url``
+            verb: HTTP method or SDK operation
+            status: HTTP status, or None if no response was received
+            duration: Seconds the call took
+            request_bytes: Request body size
+            response_bytes: Response body size
+            retries: Retries made before the final response
+            error: Error class name when the call failed
+        """
+        record = CallRecord(client, target, verb, status, duration, request_bytes,
+                            response_bytes, retries, error)
+        for sink in self.sinks:
+            try:
+                sink.emit(record)
+            except Exception:
+                # Instrumentation must never break a Supabase call
+                logger.exception(f"Supabase metrics sink {sink!r} failed")
+
+        if self.slow_call_ms and duration * 1000 >= self.slow_call_ms:
+            slow_logger.warning(
+                f"Slow Supabase call: {client} {verb} {target} -> {status} "
+                f"took {duration * 1000:.0f}ms (retries={retries}, error={error})"
+            )
+        return record
+
+    @contextmanager
+    def timed(self, client, target, verb):
+        """Record the duration and error class of the enclosed block."""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(client, target, verb, None, time.perf_counter() - started, error=error)
+
+
+def build_sink(name):
+    """Create a sink from an alias ("ring", "prometheus", "logging") or a dotted class path."""
+    from core.http_pool import _setting
+
+    name = name.strip()
+    if name == 'ring':
+        return RingBufferSink(_setting('SUPABASE_METRICS_RING_SIZE', DEFAULT_RING_SIZE, int))
+    sink_class = SINK_ALIASES.get(name) or import_string(name)
+    return sink_class()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    """
+    Get the process-wide call recorder, configured from settings.
+
+    Returns:
+        The shared CallRecorder
+    """
+    global _recorder
+
+    # Imported here: the HTTP pool itself records through this module
+    from core.http_pool import _setting
+
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                sinks = _setting('SUPABASE_METRICS_SINKS', DEFAULT_SINKS)
+                if isinstance(sinks, str):
+                    sinks = [name for name in sinks.split(',') if name.strip()]
+                _recorder = CallRecorder(
+                    sinks=[build_sink(name) if isinstance(name, str) else name for name in sinks],
+                    slow_call_ms=_setting('SUPABASE_SLOW_CALL_MS', DEFAULT_SLOW_CALL_MS, float),
+                )
+    return _recorder
+
+
+def record_response(client, method, url, response=None, duration=0.0, retries=0, error=None,
+                    request_bytes=0):
+    """
+    Record a finished HTTP call from a ``requests`` or ``httpx`` response.
+
+    Args:
+        client: Which client made the call
+        method: HTTP method
+        url: Request URL
+        response: The response, if one was received
+        duration: Seconds the call took
+        retries: Retries made before the final response
+        error: Exception raised by the call, if any
+        request_bytes: Request body size
+    """
+    status = response.status_code if response is not None else None
+    error_class = type(error).__name__ if error is not None else None
+    if error_class is None and status is not None and status >= 400:
+        error_class = f"HTTP{status}"
+    response_bytes = len(response.content) if response is not None and method != 'HEAD' else 0
+    get_recorder().record(
+        client, target_from_url(url), method, status, duration,
+        request_bytes=request_bytes, response_bytes=response_bytes,
+        retries=retries, error=error_class,
+    )
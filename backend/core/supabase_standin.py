@@ -0,0 +1,879 @@
+"""
+PostgREST/GoTrue stand-in for exercising the Supabase clients offline.
+
+Implements the subset of the Supabase REST and auth APIs that the clients in
+``core`` use: table select/insert/upsert/update/delete with PostgREST filters
+and ``or``/``and`` groups, ``order``, ``limit``, ``offset``, ``Range`` and
+``Prefer: count`` headers and convention-based resource embedding, plus
+sign-up, password sign-in, user lookup, the admin user endpoints and a JWKS
+document. Access tokens are RS256 JWTs that ``core.supabase_jwt`` verifies
+against the stand-in's ``/auth/v1/jwks``.
+
+Tables and users live in memory and can be persisted to SQLite, so a seeded
+data set survives restarts. Latency, jitter and error rates can be injected
+to measure client-side caching, pooling and circuit breakers reproducibly.
+
+The stand-in is exposed as an httpx transport, so a client can be pointed at
+it without opening a socket::
+
+    standin = SupabaseStandIn()
+    standin.seed('courses', [{'id': 1, 'name': 'Intro'}])
+    client = AsyncDirectSupabaseClient('http://standin.local', 'anon-key',
+                                       transport=standin.transport())
+
+or served over HTTP for anything else (``manage.py run_supabase_standin``)::
+
+    server = SupabaseStandInServer(SupabaseStandIn(database='standin.sqlite3'))
+    server.start()  # server.url is the SUPABASE_URL to use
+"""
+import json
+import time
+import fnmatch
+import random
+import sqlite3
+import uuid
+import asyncio
+import secrets
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import httpx
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+FILTER_OPERATORS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'like', 'ilike', 'in', 'is')
+# Query parameters that are not column filters
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+
+STANDIN_KID = 'standin-key'
+ACCESS_TOKEN_LIFETIME = 3600
+
+
+class StandInError(Exception):
+    """An error response returned by the stand-in."""
+
+    def __init__(self, status, body):
+        super().__init__(body.get('message') or body.get('msg'))
+        self.status = status
+        self.body = body
+
+
+class TokenMinter:
+    """Mints Supabase-shaped RS256 access tokens with a local key."""
+
+    def __init__(self, kid=STANDIN_KID, private_key=None):
+        """
+        Initialize the minter.
+
+        Args:
+            kid: Key ID put in token headers and the JWK
+            private_key: RSA private key; a throwaway one is generated if omitted
+        """
+        self.kid = kid
+        self.private_key = private_key or rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.public_key = self.private_key.public_key()
+        self.public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self.public_key))
+        self.public_jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+
+    def private_pem(self):
+        return self.private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode('ascii')
+
+    @classmethod
+    def from_pem(cls, pem, kid=STANDIN_KID):
+        return cls(kid, serialization.load_pem_private_key(pem.encode('ascii'), password=None))
+
+    def mint(self, user_id, email, lifetime=ACCESS_TOKEN_LIFETIME, **claims):
+        """Return a signed token for a Supabase user ID."""
+        now = int(time.time())
+        payload = {
+            'sub': user_id,
+            'email': email,
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'iat': now,
+            'exp': now + lifetime,
+            **claims,
+        }
+        return jwt.encode(payload, self.private_key, algorithm='RS256', headers={'kid': self.kid})
+
+    def decode(self, token):
+        """Verify a token minted by this key and return its claims."""
+        return jwt.decode(token, self.public_key, algorithms=['RS256'], audience='authenticated')
+
+
+def _coerce(raw, sample):
+    """Convert a filter value from the query string to the type of a row value."""
+    if raw == 'null':
+        return None
+    if isinstance(sample, bool):
+        return raw.lower() == 'true'
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return raw
+    if isinstance(sample, float):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+
+def _like(value, pattern, case_insensitive=False):
+    # PostgREST accepts * as well as % as the wildcard
+    pattern = pattern.replace('%', '*')
+    value = '' if value is None else str(value)
+    if case_insensitive:
+        return fnmatch.fnmatchcase(value.lower(), pattern.lower())
+    return fnmatch.fnmatchcase(value, pattern)
+
+
+def _split_list(raw):
+    """Split a PostgREST ``(a,b,"c,d")`` list."""
+    raw = raw.strip()
+    if raw.startswith('(') and raw.endswith(')'):
+        raw = raw[1:-1]
+    items = []
+    current = ''
+    quoted = False
+    for char in raw:
+        if char == '"':
+            quoted = not quoted
+        elif char == ',' and not quoted:
+            items.append(current)
+            current = ''
+        else:
+            current += char
+    if current or items:
+        items.append(current)
+    return items
+
+
+def _split_top(raw):
+    """Split on commas outside parentheses and quotes, keeping the quotes."""
+    items = []
+    current = ''
+    depth = 0
+    quoted = False
+    escaped = False
+    for char in raw:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            items.append(current)
+            current = ''
+            continue
+        current += char
+    if current:
+        items.append(current)
+    return items
+
+
+def _unquote(raw):
+    if len(raw) >= 2 and raw.startswith('"') and raw.endswith('"'):
+        return raw[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return raw
+
+
+def match_group(row, operator, inner):
+    """
+    Check a row against an ``or``/``and`` logic tree such as ``(a.eq.1,and(b.gt.2,c.is.null))``.
+
+    Args:
+        row: The row dictionary
+        operator: "or" or "and"
+        inner: The parenthesised condition list
+
+    Returns:
+        True when the row matches
+    """
+    if inner.startswith('(') and inner.endswith(')'):
+        inner = inner[1:-1]
+    results = []
+    for item in _split_top(inner):
+        negate = item.startswith('not.') and item[len('not.'):].startswith(('and(', 'or('))
+        if negate:
+            item = item[len('not.'):]
+        if item.startswith(('and(', 'or(')):
+            group, _, rest = item.partition('(')
+            result = match_group(row, group, f"({rest}")
+            results.append(not result if negate else result)
+        else:
+            column, _, expression = item.partition('.')
+            results.append(match_filter(row, column, expression))
+    return any(results) if operator == 'or' else all(results)
+
+
+def match_filter(row, column, expression):
+    """
+    Check a row against one PostgREST filter expression.
+
+    Args:
+        row: The row dictionary
+        column: The filtered column
+        expression: The filter, e.g. ``eq.5``, ``in.(1,2)`` or ``not.is.null``
+
+    Returns:
+        True when the row matches
+    """
+    negate = False
+    if expression.startswith('not.'):
+        negate = True
+        expression = expression[len('not.'):]
+
+    operator, _, raw = expression.partition('.')
+    if operator != 'in':
+        raw = _unquote(raw)
+    if operator not in FILTER_OPERATORS:
+        raise StandInError(400, {'code': 'PGRST100', 'message': f'unknown operator "{operator}"'})
+
+    value = row.get(column)
+    if operator == 'is':
+        expected = {'null': None, 'true': True, 'false': False}.get(raw.lower(), raw)
+        result = value is expected
+    elif operator == 'in':
+        result = value in [_coerce(item, value) for item in _split_list(raw)]
+    elif operator in ('like', 'ilike'):
+        result = _like(value, raw, case_insensitive=operator == 'ilike')
+    else:
+        other = _coerce(raw, value)
+        if operator == 'eq':
+            result = value == other
+        elif operator == 'neq':
+            result = value != other
+        elif value is None or other is None:
+            result = False
+        else:
+            try:
+                result = {
+                    'gt': value > other,
+                    'gte': value >= other,
+                    'lt': value < other,
+                    'lte': value <= other,
+                }[operator]
+            except TypeError:
+                result = str(value) > str(other) if operator in ('gt', 'gte') else str(value) < str(other)
+    return not result if negate else result
+
+
+def _sort_key(value):
+    # None sorts last ascending, like PostgreSQL's default NULLS LAST
+    return (value is None, value if value is not None else 0)
+
+
+def apply_order(rows, order):
+    """Sort rows by a PostgREST ``order`` parameter such as ``created_at.desc,id``."""
+    for term in reversed([t for t in order.split(',') if t]):
+        parts = term.split('.')
+        column = parts[0]
+        descending = 'desc' in parts[1:]
+        rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=descending)
+    return rows
+
+
+def project(row, select, embed=None):
+    """
+    Apply a PostgREST ``select`` column list to a row.
+
+    Args:
+        row: The row dictionary
+        select: The column list, e.g. ``id,title:name,course:courses(name)``
+        embed: Optional callable ``(row, resource, columns)`` resolving embedded resources
+
+    Returns:
+        The projected row
+    """
+    if not select or select.strip() == '*':
+        return dict(row)
+    projected = {}
+    for column in _split_top(select):
+        column = column.strip()
+        if not column:
+            continue
+        if '(' in column:
+            if embed is not None:
+                head, _, columns = column.partition('(')
+                alias, _, resource = head.partition(':')
+                if not resource:
+                    alias, resource = head, head
+                resource = resource.split('!')[0]
+                projected[alias.split('!')[0]] = embed(row, resource, columns[:-1])
+            continue
+        if column == '*':
+            projected.update(row)
+            continue
+        # Drop casts (col::text) and use aliases (alias:col)
+        column = column.split('::')[0]
+        alias, _, source = column.partition(':')
+        if not source:
+            alias, source = column, column
+        projected[alias] = row.get(source)
+    return projected
+
+
+class SupabaseStandIn:
+    """
+    Thread-safe Supabase REST and auth API.
+
+    Tables are created on first write or seed. Rows without an ``id`` get an
+    auto-incrementing one. With a ``database`` path every row, user and the
+    token signing key are written through to SQLite and loaded again on the
+    next start. Counters record every request, injected errors and the peak
+    number of requests handled at the same time.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 fault_paths=None, seed=None, database=None):
+        """
+        Initialize the stand-in.
+
+        Args:
+            latency: Seconds each request takes, to make concurrency observable
+            jitter: Up to this many extra seconds, drawn uniformly per request
+            error_rate: Fraction of requests answered with ``error_status`` instead
+            error_status: HTTP status of injected errors
+            fault_paths: Path prefixes (e.g. ``['rest/v1/courses']``) that injected
+                errors are limited to; all paths when omitted
+            seed: Random seed, so latency and error sequences are reproducible
+            database: SQLite file to persist tables and users in; memory only if omitted
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fault_paths = tuple(path.strip('/') for path in fault_paths or ())
+        self._random = random.Random(seed)
+        self.tables = {}
+        self.users = {}
+        self._users_by_id = {}
+        self._next_ids = {}
+        self._required = {}
+        self._minter = None
+        self._lock = threading.RLock()
+
+        self.database = database
+        self._db = None
+        if database:
+            self._open_database(database)
+
+        self.requests = 0
+        self.injected_errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    # Persistence
+    def _open_database(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS standin_rows (
+                tbl TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (tbl, id)
+            );
+            CREATE TABLE IF NOT EXISTS standin_users (email TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS standin_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+        # rowid order is insertion order, which unordered selects return
+        for table, data in self._db.execute('SELECT tbl, data FROM standin_rows ORDER BY rowid'):
+            self._insert_row(table, json.loads(data))
+        for (data,) in self._db.execute('SELECT data FROM standin_users ORDER BY rowid'):
+            user = json.loads(data)
+            self.users[user['email']] = user
+            self._users_by_id[user['id']] = user
+
+    def _persist_rows(self, table, rows):
+        if self._db is None or not rows:
+            return
+        self._db.executemany(
+            'INSERT INTO standin_rows (tbl, id, data) VALUES (?, ?, ?) '
+            'ON CONFLICT (tbl, id) DO UPDATE SET data = excluded.data',
+            [(table, json.dumps(row['id']), json.dumps(row, default=str)) for row in rows],
+        )
+        self._db.commit()
+
+    def _forget_rows(self, table, rows):
+        if self._db is None or not rows:
+            return
+        self._db.executemany(
+            'DELETE FROM standin_rows WHERE tbl = ? AND id = ?',
+            [(table, json.dumps(row['id'])) for row in rows],
+        )
+        self._db.commit()
+
+    def _persist_user(self, user):
+        if self._db is None:
+            return
+        self._db.execute(
+            'INSERT INTO standin_users (email, data) VALUES (?, ?) '
+            'ON CONFLICT (email) DO UPDATE SET data = excluded.data',
+            (user['email'], json.dumps(user)),
+        )
+        self._db.commit()
+
+    @property
+    def minter(self):
+        """The token signing key, generated on first use and persisted with the database."""
+        with self._lock:
+            if self._minter is None:
+                row = None
+                if self._db is not None:
+                    row = self._db.execute(
+                        "SELECT value FROM standin_meta WHERE key = 'signing_key'"
+                    ).fetchone()
+                if row is not None:
+                    self._minter = TokenMinter.from_pem(row[0])
+                else:
+                    self._minter = TokenMinter()
+                    if self._db is not None:
+                        self._db.execute(
+                            "INSERT INTO standin_meta (key, value) VALUES ('signing_key', ?)",
+                            (self._minter.private_pem(),),
+                        )
+                        self._db.commit()
+            return self._minter
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Data helpers
+    def seed(self, table, rows):
+        """
+        Add rows to a table.
+
+        Args:
+            table: The table name
+            rows: Row dictionaries
+        """
+        with self._lock:
+            self._persist_rows(table, [self._insert_row(table, dict(row)) for row in rows])
+
+    def require(self, table, *columns):
+        """Reject writes to a table that leave any of the columns null, like NOT NULL."""
+        self._required.setdefault(table, set()).update(columns)
+
+    def _check_required(self, table, row):
+        for column in self._required.get(table, ()):
+            if row.get(column) is None:
+                raise StandInError(400, {
+                    'code': '23502',
+                    'message': f'null value in column "{column}" of relation "{table}" violates not-null constraint',
+                })
+
+    def rows(self, table):
+        """Return a copy of a table's rows."""
+        with self._lock:
+            return [dict(row) for row in self.tables.get(table, [])]
+
+    def _insert_row(self, table, row):
+        rows = self.tables.setdefault(table, [])
+        if row.get('id') is None:
+            row['id'] = self._next_ids.get(table, 1)
+        if isinstance(row['id'], int):
+            self._next_ids[table] = max(self._next_ids.get(table, 1), row['id'] + 1)
+        rows.append(row)
+        return row
+
+    @staticmethod
+    def _filters(query):
+        return [(column, value) for column, value in query if column not in RESERVED_PARAMS]
+
+    def _matching(self, table, query):
+        filters = self._filters(query)
+        return [
+            row for row in self.tables.get(table, [])
+            if all(
+                match_group(row, column, expression) if column in ('or', 'and')
+                else match_filter(row, column, expression)
+                for column, expression in filters
+            )
+        ]
+
+    @staticmethod
+    def _singular(table):
+        return table[:-1] if table.endswith('s') else table
+
+    def _embedder(self, table):
+        """
+        Resolve embedded resources by naming convention.
+
+        A row with a ``<resource singular>_id`` column embeds the one related
+        row; otherwise rows of the resource whose ``<table singular>_id``
+        points at this row are embedded as a list.
+        """
+        def embed(row, resource, columns):
+            related = self.tables.get(resource, [])
+            nested = self._embedder(resource)
+            foreign_key = f"{self._singular(resource)}_id"
+            if foreign_key in row:
+                match = next((r for r in related if r.get('id') == row[foreign_key]), None)
+                return project(match, columns, nested) if match is not None else None
+            back_reference = f"{self._singular(table)}_id"
+            return [project(r, columns, nested) for r in related if r.get(back_reference) == row.get('id')]
+        return embed
+
+    # REST
+    def _rest(self, method, table, query, headers, body):
+        params = dict(query)
+        prefer = headers.get('prefer', '')
+        minimal = 'return=minimal' in prefer
+
+        with self._lock:
+            if method in ('GET', 'HEAD'):
+                rows = apply_order(self._matching(table, query), params.get('order', ''))
+                total = len(rows)
+                start = int(params.get('offset', 0))
+                end = start + int(params['limit']) - 1 if 'limit' in params else total - 1
+                if headers.get('range'):
+                    range_start, _, range_end = headers['range'].partition('-')
+                    start += int(range_start)
+                    if range_end:
+                        end = min(end, start - int(range_start) + int(range_end))
+                rows = rows[start:end + 1]
+
+                # Content-Range carries the total only when a count was requested
+                counted = 'count=' in prefer
+                shown = f"{start}-{start + len(rows) - 1}" if rows else '*'
+                response_headers = {'Content-Range': f"{shown}/{total if counted else '*'}"}
+                status = 206 if headers.get('range') and counted and len(rows) < total else 200
+                embed = self._embedder(table)
+                return status, [project(row, params.get('select'), embed) for row in rows], response_headers
+
+            if method == 'POST':
+                payload = body if isinstance(body, list) else [body]
+                if 'columns' in params:
+                    columns = params['columns'].split(',')
+                    payload = [{column: row[column] for column in columns if column in row} for row in payload]
+                for row in payload:
+                    self._check_required(table, row)
+
+                if 'resolution=' not in prefer:
+                    created = [self._insert_row(table, dict(row)) for row in payload]
+                    self._persist_rows(table, created)
+                    return 201, None if minimal else [dict(row) for row in created]
+
+                # Upsert on the on_conflict columns (the primary key by default)
+                conflict_columns = params.get('on_conflict', 'id').split(',')
+                merge = 'resolution=merge-duplicates' in prefer
+                index = {
+                    tuple(current.get(column) for column in conflict_columns): current
+                    for current in self.tables.get(table, [])
+                }
+                written = []
+                for row in payload:
+                    existing = None
+                    if all(row.get(column) is not None for column in conflict_columns):
+                        existing = index.get(tuple(row[column] for column in conflict_columns))
+                    if existing is None:
+                        inserted = self._insert_row(table, dict(row))
+                        index[tuple(inserted.get(column) for column in conflict_columns)] = inserted
+                        written.append(dict(inserted))
+                    elif merge:
+                        existing.update(row)
+                        written.append(dict(existing))
+                self._persist_rows(table, written)
+                return 201, None if minimal else written
+
+            if method == 'PATCH':
+                if not self._filters(query):
+                    raise StandInError(400, {'code': '21000', 'message': 'UPDATE requires a WHERE clause'})
+                updated = []
+                for row in self._matching(table, query):
+                    row.update(body or {})
+                    updated.append(dict(row))
+                self._persist_rows(table, updated)
+                return (204, None) if minimal else (200, updated)
+
+            if method == 'DELETE':
+                if not self._filters(query):
+                    raise StandInError(400, {'code': '21000', 'message': 'DELETE requires a WHERE clause'})
+                doomed = self._matching(table, query)
+                doomed_ids = {id(row) for row in doomed}
+                self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in doomed_ids]
+                self._forget_rows(table, doomed)
+                return (204, None) if minimal else (200, [dict(row) for row in doomed])
+
+        raise StandInError(405, {'code': 'PGRST105', 'message': f'Unsupported method {method}'})
+
+    # Auth
+    def _issue_session(self, user):
+        return {
+            'access_token': self.minter.mint(user['id'], user['email']),
+            'token_type': 'bearer',
+            'expires_in': ACCESS_TOKEN_LIFETIME,
+            'refresh_token': secrets.token_hex(16),
+            'user': self._public_user(user),
+        }
+
+    @staticmethod
+    def _public_user(user):
+        return {key: value for key, value in user.items() if key != 'password'}
+
+    def _create_user(self, email, password, metadata=None, confirmed=True):
+        if not email or not password:
+            raise StandInError(400, {'error': 'validation_failed', 'msg': 'Email and password are required'})
+        if email in self.users:
+            raise StandInError(422, {'error': 'user_already_exists', 'msg': 'User already registered'})
+        now = datetime.now(timezone.utc).isoformat()
+        user = {
+            'id': str(uuid.uuid4()),
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'email': email,
+            'password': password,
+            'email_confirmed_at': now if confirmed else None,
+            'user_metadata': metadata or {},
+            'created_at': now,
+        }
+        self.users[email] = user
+        self._users_by_id[user['id']] = user
+        self._persist_user(user)
+        return user
+
+    def _auth(self, method, path, query, headers, body):
+        params = dict(query)
+        body = body or {}
+
+        if method == 'GET' and path == 'jwks':
+            return 200, {'keys': [self.minter.public_jwk]}
+
+        with self._lock:
+            if method == 'POST' and path == 'signup':
+                user = self._create_user(body.get('email'), body.get('password'), body.get('data'))
+                return 200, self._issue_session(user)
+
+            if method == 'POST' and path == 'token' and params.get('grant_type') == 'password':
+                user = self.users.get(body.get('email'))
+                if user is None or user['password'] != body.get('password'):
+                    raise StandInError(400, {'error': 'invalid_grant', 'msg': 'Invalid login credentials'})
+                return 200, self._issue_session(user)
+
+            if method == 'GET' and path == 'user':
+                token = headers.get('authorization', '').split(' ', 1)[-1]
+                try:
+                    user = self._users_by_id.get(self.minter.decode(token)['sub'])
+                except jwt.InvalidTokenError:
+                    user = None
+                if user is None:
+                    raise StandInError(401, {'error': 'bad_jwt', 'msg': 'invalid JWT'})
+                return 200, self._public_user(user)
+
+            # Admin API (the service key is not checked)
+            if path == 'admin/users' and method == 'GET':
+                page = int(params.get('page', 1))
+                per_page = int(params.get('per_page', 50))
+                # GoTrue lists the newest users first
+                newest_first = sorted(reversed(list(self.users.values())),
+                                      key=lambda user: user['created_at'], reverse=True)
+                users = newest_first[(page - 1) * per_page:page * per_page]
+                return 200, {'users': [self._public_user(user) for user in users], 'aud': 'authenticated'}
+
+            if path == 'admin/users' and method == 'POST':
+                user = self._create_user(
+                    body.get('email'), body.get('password'), body.get('user_metadata'),
+                    confirmed=bool(body.get('email_confirm')),
+                )
+                return 200, self._public_user(user)
+
+            if path.startswith('admin/users/') and method == 'GET':
+                user = self._users_by_id.get(path[len('admin/users/'):])
+                if user is None:
+                    raise StandInError(404, {'error': 'user_not_found', 'msg': 'User not found'})
+                return 200, self._public_user(user)
+
+        raise StandInError(404, {'error': 'not_found', 'msg': f'Unknown auth endpoint {path}'})
+
+    def handle(self, method, url, headers=None, body=None):
+        """
+        Handle one API request.
+
+        Args:
+            method: HTTP method
+            url: Request URL; only the path and query string are used
+            headers: Request headers (case-insensitive names)
+            body: Parsed JSON request body
+
+        Returns:
+            Tuple of (status code, JSON-serializable body or None, response headers)
+        """
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        path = parts.path.strip('/')
+
+        try:
+            if path.startswith('rest/v1/'):
+                result = self._rest(method, path[len('rest/v1/'):], query, headers, body)
+            elif path.startswith('auth/v1/'):
+                result = self._auth(method, path[len('auth/v1/'):], query, headers, body)
+            else:
+                raise StandInError(404, {'message': f'Unknown path /{path}'})
+        except StandInError as e:
+            return e.status, e.body, {}
+        return result if len(result) == 3 else (*result, {})
+
+    def _begin(self, path):
+        """Count a request and pick its injected delay and error."""
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+            error = None
+            if self.error_rate and (not self.fault_paths or path.startswith(self.fault_paths)):
+                if self._random.random() < self.error_rate:
+                    self.injected_errors += 1
+                    error = (self.error_status, {'code': 'STANDIN', 'message': 'Injected failure'}, {})
+        return delay, error
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def respond(self, method, url, headers=None, body=None):
+        """
+        Handle one request with the configured latency and error injection.
+
+        Returns:
+            Tuple of (status code, JSON-serializable body or None, response headers)
+        """
+        delay, error = self._begin(urlsplit(url).path.strip('/'))
+        try:
+            if delay:
+                time.sleep(delay)
+            return error or self.handle(method, url, headers, body)
+        finally:
+            self._end()
+
+    async def arespond(self, method, url, headers=None, body=None):
+        """Async variant of ``respond`` that sleeps without blocking the event loop."""
+        delay, error = self._begin(urlsplit(url).path.strip('/'))
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            return error or self.handle(method, url, headers, body)
+        finally:
+            self._end()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'injected_errors': self.injected_errors,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'tables': {table: len(rows) for table, rows in self.tables.items()},
+                'users': len(self.users),
+            }
+
+    def transport(self):
+        """Return an httpx transport (sync and async) backed by this stand-in."""
+        return StandInTransport(self)
+
+
+def _httpx_response(request, result):
+    status, payload, headers = result
+    if payload is None or request.method == 'HEAD':
+        return httpx.Response(status, headers=headers, request=request)
+    return httpx.Response(status, headers=headers, json=payload, request=request)
+
+
+class StandInTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport routing requests to a SupabaseStandIn without a network."""
+
+    def __init__(self, standin):
+        self.standin = standin
+
+    def handle_request(self, request):
+        body = json.loads(request.read() or b'null')
+        result = self.standin.respond(request.method, str(request.url), request.headers, body)
+        return _httpx_response(request, result)
+
+    async def handle_async_request(self, request):
+        body = json.loads(await request.aread() or b'null')
+        result = await self.standin.arespond(request.method, str(request.url), request.headers, body)
+        return _httpx_response(request, result)
+
+
+class SupabaseStandInServer:
+    """
+    Serves a SupabaseStandIn over HTTP/1.1 with keep-alive, one thread per connection.
+    """
+
+    def __init__(self, standin, host='127.0.0.1', port=0):
+        """
+        Bind the server.
+
+        Args:
+            standin: The SupabaseStandIn to serve
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+        """
+        self.standin = standin
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                    result = (400, {'code': 'PGRST102', 'message': 'Invalid JSON body'}, {})
+                else:
+                    result = standin.respond(self.command, self.path, dict(self.headers.items()), body)
+
+                status, payload, headers = result
+                content = b'' if payload is None else json.dumps(payload, default=str).encode('utf-8')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(content)
+
+            do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_port}"
+        self._thread = None
+
+    def start(self):
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def close(self):
+        if self._thread is not None:
+            self.httpd.shutdown()
+        self.httpd.server_close()
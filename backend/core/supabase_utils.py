@@ -4,17 +4,44 @@ This module provides helper functions for interacting with Supabase.
 """
 import os
 import json
-import requests
+import threading
 from dotenv import load_dotenv
 from supabase import create_client
 
+from core.http_pool import get_http_client, _setting
+from core.supabase_metrics import get_recorder
+from core.circuit_breaker import BackendSelector, DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT
+from core.supabase_bulk import bulk_send, upsert_request
+
 # Load environment variables
 load_dotenv()
 
+# Backends tried for each operation, in priority order
+BACKENDS = ['sdk', 'direct']
+
+
+def _is_backend_failure(backend, exc):
+    """
+    Decide whether an error means the backend is unhealthy.
+    
+    Client errors (4xx other than timeouts and rate limits) mean the backend
+    answered correctly and the request itself was wrong, so they don't count
+    against its circuit breaker. They are also raised to the caller without
+    trying the next backend, which would reject the same request.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
 class SupabaseClient:
     """Singleton class to manage Supabase connection"""
     _instance = None
     _client = None
+    _admin_client = None
+    _admin_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -34,6 +61,14 @@ class SupabaseClient:
             cls._supabase_url = supabase_url
             cls._supabase_key = supabase_key
             cls._service_key = service_key
+            
+            # Per-operation circuit breakers for the SDK and direct REST backends
+            cls._backends = BackendSelector(
+                BACKENDS,
+                failure_threshold=_setting('SUPABASE_BREAKER_FAILURE_THRESHOLD', DEFAULT_FAILURE_THRESHOLD, int),
+                reset_timeout=_setting('SUPABASE_BREAKER_RESET_TIMEOUT', DEFAULT_RESET_TIMEOUT, float),
+                is_failure=_is_backend_failure,
+            )
         return cls._instance
 
     @property
@@ -42,78 +77,140 @@ class SupabaseClient:
         return self._client
     
     def get_admin_client(self):
-        """Get a Supabase client with service role permissions for admin operations"""
+        """Get the Supabase client with service role permissions for admin operations (created once)"""
         if not self._service_key:
             raise ValueError("SUPABASE_SERVICE_KEY is not set in environment variables")
-        return create_client(self._supabase_url, self._service_key)
+        if SupabaseClient._admin_client is None:
+            with SupabaseClient._admin_lock:
+                if SupabaseClient._admin_client is None:
+                    SupabaseClient._admin_client = create_client(self._supabase_url, self._service_key)
+        return SupabaseClient._admin_client
+    
+    def _call(self, operation, sdk, direct):
+        """
+        Run an operation on the SDK or the direct REST API, whichever is healthy.
+        
+        The SDK is preferred. A backend that fails repeatedly for an operation
+        has its circuit opened and is skipped until a later probe succeeds.
+        
+        Args:
+            operation: Operation name used for health tracking
+            sdk: Zero-argument callable using the SDK
+            direct: Zero-argument callable using the direct REST API
+            
+        Returns:
+            The result of the backend that served the call
+        """
+        def timed_sdk():
+            # Direct calls are recorded by the HTTP pool; SDK calls have no status
+            with get_recorder().timed('sdk', operation, 'SDK'):
+                return sdk()
+        
+        return self._backends.call(operation, {'sdk': timed_sdk, 'direct': direct})
+    
+    def health(self):
+        """
+        Get circuit breaker state per operation and backend.
+        
+        Returns:
+            Dictionary mapping operation names to ``{backend: breaker stats}``
+        """
+        return self._backends.stats()
 
     # Direct API methods (fallback if client has issues)
-    def _direct_api_call(self, endpoint, method="GET", data=None, params=None, use_service_key=False):
+    def _direct_api_call(self, endpoint, method="GET", data=None, params=None, use_service_key=False, headers=None):
         """Make a direct API call to Supabase REST API"""
         headers = {
             "apikey": self._service_key if use_service_key else self._supabase_key,
             "Authorization": f"Bearer {self._service_key if use_service_key else self._supabase_key}",
             "Content-Type": "application/json",
-            "Prefer": "return=representation"
+            "Prefer": "return=representation",
+            **(headers or {})
         }
         
-        url = f"{self._supabase_url}/rest/v1/{endpoint}"
+        # Auth (GoTrue) endpoints live under /auth/v1, everything else is PostgREST
+        if endpoint.startswith("auth/"):
+            url = f"{self._supabase_url}/auth/v1/{endpoint[len('auth/'):]}"
+        else:
+            url = f"{self._supabase_url}/rest/v1/{endpoint}"
         
+        # Send over the shared keep-alive connection pool
+        http = get_http_client()
         if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
+            response = http.get(url, headers=headers, params=params)
         elif method == "POST":
-            response = requests.post(url, headers=headers, json=data, params=params)
+            response = http.post(url, headers=headers, json=data, params=params)
         elif method == "PUT":
-            response = requests.put(url, headers=headers, json=data, params=params)
+            response = http.put(url, headers=headers, json=data, params=params)
         elif method == "PATCH":
-            response = requests.patch(url, headers=headers, json=data, params=params)
+            response = http.patch(url, headers=headers, json=data, params=params)
         elif method == "DELETE":
-            response = requests.delete(url, headers=headers, params=params)
+            response = http.delete(url, headers=headers, params=params)
         else:
             raise ValueError(f"Unsupported method: {method}")
         
         # Handle errors
         response.raise_for_status()
         
-        # Return JSON response
-        return response.json()
+        # Return JSON response (return=minimal writes have no body)
+        if response.content:
+            return response.json()
+        return None
 
     # User management methods
     def get_user(self, user_id):
-        """Get user data from Supabase"""
-        try:
-            # Try using the client
-            return self.client.auth.admin.get_user_by_id(user_id)
-        except Exception:
-            # Fallback to direct API call
-            return self._direct_api_call(f"auth/users/{user_id}", use_service_key=True)
+        """
+        Get user data from Supabase.
+        
+        Both backends call the GoTrue admin API with the service role key; the
+        anon client is not allowed to read other users.
+        """
+        return self._call(
+            "get_user",
+            sdk=lambda: self.get_admin_client().auth.admin.get_user_by_id(user_id),
+            direct=lambda: self._direct_api_call(f"auth/admin/users/{user_id}", use_service_key=True),
+        )
     
     def create_user(self, email, password, user_data=None):
         """Create a new user in Supabase Auth"""
-        try:
-            # Try using the client
-            admin_client = self.get_admin_client()
-            return admin_client.auth.admin.create_user({
-                "email": email,
-                "password": password,
-                "email_confirm": True,
-                "user_metadata": user_data or {}
-            })
-        except Exception:
-            # Fallback to direct API call
-            data = {
-                "email": email,
-                "password": password,
-                "email_confirm": True,
-                "user_metadata": user_data or {}
-            }
-            return self._direct_api_call("auth/users", method="POST", data=data, use_service_key=True)
+        data = {
+            "email": email,
+            "password": password,
+            "email_confirm": True,
+            "user_metadata": user_data or {}
+        }
+        return self._call(
+            "create_user",
+            sdk=lambda: self.get_admin_client().auth.admin.create_user(data),
+            direct=lambda: self._direct_api_call("auth/admin/users", method="POST", data=data, use_service_key=True),
+        )
+
+    def list_users(self, page=1, per_page=1000):
+        """
+        List one page of users from Supabase Auth via the admin API.
+
+        Args:
+            page: 1-based page number
+            per_page: Number of users per page
+
+        Returns:
+            List of user dictionaries
+        """
+        def sdk():
+            users = self.get_admin_client().auth.admin.list_users(page=page, per_page=per_page)
+            return [user.model_dump() if hasattr(user, "model_dump") else dict(user) for user in users]
+        
+        def direct():
+            params = {"page": page, "per_page": per_page}
+            data = self._direct_api_call("auth/admin/users", params=params, use_service_key=True)
+            return data.get("users", []) if isinstance(data, dict) else data
+        
+        return self._call("list_users", sdk=sdk, direct=direct)
     
     # Database operations with fallbacks
     def get_table_data(self, table_name, query=None):
         """Get data from a Supabase table with optional query parameters"""
-        try:
-            # Try using the client
+        def sdk():
             request = self.client.table(table_name).select("*")
             if query:
                 # Apply filters, ordering, etc. from the query dictionary
@@ -126,8 +223,8 @@ class SupabaseClient:
                     request = request.limit(query["limit"])
             
             return request.execute()
-        except Exception as e:
-            # Fallback to direct API call
+        
+        def direct():
             params = {}
             if query:
                 if "filter" in query:
@@ -145,35 +242,65 @@ class SupabaseClient:
                 "data": data,
                 "count": len(data)
             })
+        
+        return self._call("get_table_data", sdk=sdk, direct=direct)
     
     def insert_data(self, table_name, data):
         """Insert data into a Supabase table"""
-        try:
-            # Try using the client
-            return self.client.table(table_name).insert(data).execute()
-        except Exception:
-            # Fallback to direct API call
-            return self._direct_api_call(table_name, method="POST", data=data)
+        return self._call(
+            "insert_data",
+            sdk=lambda: self.client.table(table_name).insert(data).execute(),
+            direct=lambda: self._direct_api_call(table_name, method="POST", data=data),
+        )
+    
+    def bulk_upsert(self, table_name, rows, chunk_size=None, on_conflict=None, returning="minimal",
+                    ignore_duplicates=False, max_concurrency=None, use_service_key=False):
+        """
+        Insert or update many rows in chunked, concurrent requests.
+        
+        Chunks go straight to the REST API over the pooled connection rather
+        than through the SDK, so a failed chunk is reported once instead of
+        being re-sent by a fallback.
+        
+        Args:
+            table_name: The table name
+            rows: Any iterable of records; it is consumed lazily
+            chunk_size: Records per request (default SUPABASE_BULK_CHUNK_SIZE)
+            on_conflict: Comma-separated unique columns to upsert on (default: primary key)
+            returning: "minimal" (no response body) or "representation" (collect the rows)
+            ignore_duplicates: Skip conflicting records instead of merging them
+            max_concurrency: Requests in flight at once (default SUPABASE_BULK_CONCURRENCY)
+            use_service_key: Whether to use the service role key (bypasses RLS)
+        
+        Returns:
+            Dictionary with row and chunk counts, per-chunk errors and elapsed time
+        """
+        def send(chunk):
+            params, headers = upsert_request(chunk, on_conflict, returning, ignore_duplicates)
+            return self._direct_api_call(
+                table_name, method="POST", data=chunk, params=params,
+                use_service_key=use_service_key, headers=headers
+            )
+        
+        return bulk_send(send, rows, chunk_size, max_concurrency, returning)
     
     def update_data(self, table_name, data, match_column, match_value):
         """Update data in a Supabase table"""
-        try:
-            # Try using the client
-            return self.client.table(table_name).update(data).eq(match_column, match_value).execute()
-        except Exception:
-            # Fallback to direct API call
-            params = {match_column: f"eq.{match_value}"}
-            return self._direct_api_call(table_name, method="PATCH", data=data, params=params)
+        params = {match_column: f"eq.{match_value}"}
+        return self._call(
+            "update_data",
+            sdk=lambda: self.client.table(table_name).update(data).eq(match_column, match_value).execute(),
+            direct=lambda: self._direct_api_call(table_name, method="PATCH", data=data, params=params),
+        )
     
     def delete_data(self, table_name, match_column, match_value):
         """Delete data from a Supabase table"""
-        try:
-            # Try using the client
-            return self.client.table(table_name).delete().eq(match_column, match_value).execute()
-        except Exception:
-            # Fallback to direct API call
-            params = {match_column: f"eq.{match_value}"}
-            return self._direct_api_call(table_name, method="DELETE", params=params)
+        params = {match_column: f"eq.{match_value}"}
+        return self._call(
+            "delete_data",
+            sdk=lambda: self.client.table(table_name).delete().eq(match_column, match_value).execute(),
+            direct=lambda: self._direct_api_call(table_name, method="DELETE", params=params),
+        )
 
 # Create a singleton instance for easy import
 supabase = SupabaseClient() 
\ No newline at end of file
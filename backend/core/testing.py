@@ -0,0 +1,57 @@
+"""
+Test helpers shared by the app test suites.
+Serve a fresh ``SupabaseStandIn`` to the Supabase clients and configure a
+cache that behaves like the shared production cache.
+"""
+import os
+import uuid
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from core.async_supabase import AsyncDirectSupabaseClient
+from core.direct_supabase import DirectSupabaseClient
+from core.supabase_standin import SupabaseStandIn, SupabaseStandInServer
+
+
+def timestamp(seconds):
+    """An ISO timestamp ``seconds`` after a fixed origin."""
+    return (datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)).isoformat()
+
+
+def shared_cache_settings():
+    """
+    A CACHES setting the auth caches treat as shared.
+
+    The caches skip the per-process LocMemCache, so tests use a file based
+    cache in a fresh directory instead of Redis.
+    """
+    return {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='test-cache-'),
+    }}
+
+
+class StandInTestMixin:
+    """Serves a fresh stand-in over HTTP in every test."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin = SupabaseStandIn()
+        self.server = SupabaseStandInServer(self.standin).start()
+        self.addCleanup(self.server.close)
+
+    def direct_client(self, service_key='service'):
+        """A ``DirectSupabaseClient`` talking to the stand-in server."""
+        env = {'SUPABASE_URL': self.server.url, 'SUPABASE_KEY': 'anon', 'SUPABASE_SERVICE_KEY': service_key}
+        with mock.patch.dict(os.environ, env):
+            return DirectSupabaseClient()
+
+    def async_direct_client(self, **kwargs):
+        """
+        An ``AsyncDirectSupabaseClient`` on the stand-in's transport.
+
+        Each client gets its own project URL, and so its own select cache.
+        """
+        return AsyncDirectSupabaseClient(f"http://{uuid.uuid4().hex}.standin", 'anon', service_key='service',
+                                         transport=self.standin.transport(), **kwargs)
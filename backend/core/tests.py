@@ -1,3 +1,932 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.auth_benchmark import AuthBenchmark
+from core.change_feed import ChangeEvent, ChangeFeed
+from core.circuit_breaker import BackendSelector, CircuitBreaker, CircuitOpenError
+from core.course_mirror import CourseMirror
+from core.http_pool import PooledHTTPClient
+from core.direct_supabase import Q, keyset_params
+from core.jwks import JWKSKeyStore
+from core.notification_counts import reconcile_unread_counts, unread_count
+from core.notification_hub import NotificationHub
+from core.notification_inbox import inbox_page
+from core.models import Course, CourseEnrollment, SyncState
+from core.singleflight import AsyncSingleFlight, SingleFlight
+from core.supabase_bulk import iter_chunks, iter_indexed_chunks
+from core.supabase_cache import SelectCache, select_cache_key
+from core.supabase_metrics import CallRecorder, PrometheusSink, RingBufferSink, target_from_url
+from core.supabase_standin import SupabaseStandIn, SupabaseStandInServer, TokenMinter
+from core.supabase_utils import _is_backend_failure
+from core.testing import StandInTestMixin, shared_cache_settings, timestamp
+
+
+class JWKSKeyStoreTests(StandInTestMixin, SimpleTestCase):
+    """Process-wide JWKS key cache (user-001)."""
+
+    def store(self, **kwargs):
+        return JWKSKeyStore(f"{self.server.url}/auth/v1/jwks", **kwargs)
+
+    def test_keys_are_served_from_memory(self):
+        store = self.store()
+        kid = self.standin.minter.kid
+
+        self.assertIsNotNone(store.get_key(kid))
+        self.assertIsNotNone(store.get_key(kid))
+
+        self.assertEqual((store.stats()['refreshes'], store.stats()['hits']), (1, 2))
+        self.assertEqual(self.standin.requests, 1)
+
+    def test_unknown_kid_refetches_once_per_interval(self):
+        store = self.store(min_refresh_interval=60)
+        store.get_key(self.standin.minter.kid)
+        self.standin._minter = TokenMinter(kid='rotated')
+
+        self.assertIsNone(store.get_key('rotated'))
+        self.assertEqual(self.standin.requests, 1)
+
+        store.clear()
+        self.assertIsNotNone(store.get_key('rotated'))
+
+    def test_stale_keys_refresh_in_the_background(self):
+        store = self.store(ttl=0, min_refresh_interval=0)
+        kid = self.standin.minter.kid
+        store.get_key(kid)
+
+        self.assertIsNotNone(store.get_key(kid))
+        store._background_refresh.join(5)
+
+        self.assertEqual((store.stats()['refreshes'], store.stats()['background_refreshes']), (2, 1))
+
+    def test_failed_first_fetch_sets_the_refetch_floor(self):
+        store = JWKSKeyStore('http://jwks.invalid/auth/v1/jwks', min_refresh_interval=60)
+
+        with mock.patch('core.jwks.requests.get', side_effect=requests.ConnectionError('down')) as get:
+            for _ in range(3):
+                with self.assertRaises(requests.RequestException):
+                    store.get_key('any')
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(store.stats()['refresh_errors'], 1)
+
+    async def test_failed_first_async_fetch_sets_the_refetch_floor(self):
+        store = JWKSKeyStore('http://jwks.invalid/auth/v1/jwks', min_refresh_interval=60)
+
+        with mock.patch('core.jwks.httpx.AsyncClient.get', side_effect=httpx.ConnectError('down')) as get:
+            for _ in range(3):
+                with self.assertRaises(httpx.HTTPError):
+                    await store.aget_key('any')
+
+        self.assertEqual(get.call_count, 1)
+
+
+class AuthBenchmarkTests(TestCase):
+    """Authentication hot-path benchmark (user-009)."""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                       SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_paths_without_a_cache_are_timed_once(self):
+        benchmark = AuthBenchmark(iterations=3)
+
+        results = benchmark.run()
+
+        self.assertEqual(sorted(results), [
+            'drf_token.uncached', 'session.uncached',
+            'supabase_backend.cold', 'supabase_backend.warm', 'supabase_jwt.cold', 'supabase_jwt.warm',
+        ])
+        self.assertEqual([note.split(':')[0] for note in benchmark.notes], ['session', 'drf_token'])
+
+    @override_settings(CACHES=shared_cache_settings(), SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_paths_are_timed_cold_and_warm(self):
+        benchmark = AuthBenchmark(iterations=3, paths=['session', 'drf_token'])
+
+        results = benchmark.run()
+
+        self.assertEqual(sorted(results), ['drf_token.cold', 'drf_token.warm', 'session.cold', 'session.warm'])
+        self.assertEqual(results['session.warm']['requests'], 3)
+        self.assertEqual(benchmark.notes, [])
+
+
+class PooledHTTPClientTests(StandInTestMixin, SimpleTestCase):
+    """Keep-alive pool with timeouts and retries (user-010)."""
+
+    def pooled(self, **kwargs):
+        client = PooledHTTPClient(backoff_factor=0, backoff_jitter=0, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_are_reused(self):
+        client = self.pooled()
+        for _ in range(5):
+            client.get(f"{self.server.url}/rest/v1/courses").raise_for_status()
+
+        stats = client.stats()
+        self.assertEqual((stats['calls'], stats['connections_opened'], stats['connections_reused']), (5, 1, 4))
+
+    def test_idempotent_verbs_are_retried(self):
+        self.standin.error_rate = 1.0
+        client = self.pooled(retries=2)
+
+        response = client.get(f"{self.server.url}/rest/v1/courses")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.standin.requests, 3)
+        self.assertEqual((client.stats()['retries'], client.stats()['errors']), (2, 1))
+
+    def test_inserts_are_not_retried(self):
+        self.standin.error_rate = 1.0
+        client = self.pooled(retries=2)
+
+        response = client.post(f"{self.server.url}/rest/v1/courses", json={'title': 'New'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.standin.requests, 1)
+
+
+class AsyncClientTests(StandInTestMixin, SimpleTestCase):
+    """Async REST client with a per-host concurrency limit (user-011)."""
+
+    async def test_requests_to_one_host_are_bounded(self):
+        self.standin.latency = 0.02
+        client = self.async_direct_client(max_per_host=2)
+
+        # Distinct filters, so no two selects share a request
+        results = await asyncio.gather(*[client.select('profiles', filters={'id': i}) for i in range(6)])
+
+        self.assertEqual(results, [[]] * 6)
+        self.assertEqual(self.standin.requests, 6)
+        self.assertEqual((client.stats()['max_in_flight'], self.standin.max_in_flight), (2, 2))
+
+    async def test_error_statuses_raise(self):
+        self.standin.error_rate = 1.0
+        client = self.async_direct_client()
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await client.select('profiles')
+
+        self.assertEqual(client.stats()['errors'], 1)
+
+
+class StandInAdminTests(StandInTestMixin, SimpleTestCase):
+    """Stand-in admin API ordering (user-008)."""
+
+    def test_users_are_listed_newest_first(self):
+        client = self.direct_client()
+        for i in range(3):
+            client.sign_up(f"user{i}@example.com", 'password')
+
+        page = client._api_request('auth/admin/users', params={'page': 1, 'per_page': 2}, use_service_key=True)
+
+        self.assertEqual([user['email'] for user in page['users']],
+                         ['user2@example.com', 'user1@example.com'])
+
+
+class SelectCacheTests(StandInTestMixin, SimpleTestCase):
+    """Select caching with write invalidation (user-012)."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin.seed('courses', [{'id': 1, 'title': 'Intro'}, {'id': 2, 'title': 'Advanced'}])
+
+    async def test_repeated_select_is_served_from_cache(self):
+        client = self.async_direct_client()
+        first = await client.select('courses', order='id.asc')
+        second = await client.select('courses', order='id.asc')
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.standin.requests, 1)
+        self.assertEqual(client.select_cache.stats()['hits'], 1)
+
+    async def test_write_invalidates_cached_selects(self):
+        client = self.async_direct_client()
+        await client.select('courses')
+        await client.insert('courses', {'id': 3, 'title': 'New'})
+
+        rows = await client.select('courses')
+        self.assertEqual(sorted(row['id'] for row in rows), [1, 2, 3])
+
+    async def test_fresh_select_bypasses_cache(self):
+        client = self.async_direct_client()
+        await client.select('courses')
+        await client.select('courses', fresh=True)
+
+        self.assertEqual(self.standin.requests, 2)
+        self.assertEqual(client.select_cache.stats()['bypasses'], 1)
+
+    def test_sync_client_selects_are_cached_and_invalidated(self):
+        client = self.direct_client()
+        client.select('courses')
+        client.insert('courses', {'id': 3, 'title': 'New'})
+
+        self.assertEqual(len(client.select('courses')), 3)
+        self.assertEqual(len(client.select('courses')), 3)
+        self.assertEqual(self.standin.requests, 3)
+
+    def test_read_started_before_a_write_is_not_cached(self):
+        cache = SelectCache(table_ttls={'courses': 60})
+        key = select_cache_key('courses')
+        generation = cache.generation('courses')
+
+        cache.invalidate('courses')
+        cache.set(key, [{'id': 1}], generation)
+
+        self.assertIsNone(cache.get(key))
+
+    def test_tables_without_ttl_are_not_cached(self):
+        cache = SelectCache(table_ttls={'courses': 60})
+        key = select_cache_key('profiles')
+        cache.set(key, [{'id': 1}])
+
+        self.assertIsNone(cache.get(key))
+
+
+class SingleFlightTests(StandInTestMixin, SimpleTestCase):
+    """Coalescing of identical concurrent selects (user-013)."""
+
+    async def test_concurrent_identical_selects_share_one_request(self):
+        self.standin.latency = 0.05
+        # profiles has no cache TTL, so only coalescing can save requests
+        self.standin.seed('profiles', [{'id': 1}])
+        client = self.async_direct_client()
+
+        results = await asyncio.gather(*[client.select('profiles') for _ in range(5)])
+
+        self.assertEqual(self.standin.requests, 1)
+        self.assertEqual(results, [[{'id': 1}]] * 5)
+        # Joined callers get their own copy
+        self.assertIsNot(results[0], results[1])
+
+    async def test_a_cancelled_caller_does_not_cancel_the_flight(self):
+        group = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return 'rows'
+
+        first = asyncio.ensure_future(group.do('key', load))
+        second = asyncio.ensure_future(group.do('key', load))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        self.assertEqual(await second, 'rows')
+        self.assertEqual(group.stats(), {'in_flight': 0, 'flights': 1, 'shared': 1})
+
+    def test_threads_share_one_call_and_its_error(self):
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        errors = []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            raise RuntimeError('down')
+
+        def caller():
+            try:
+                group.do('key', load)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=caller) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        while group.stats()['shared'] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *waiters]:
+            thread.join(5)
+
+        self.assertEqual((len(calls), len(errors)), (1, 4))
+
+
+class BulkUpsertTests(StandInTestMixin, SimpleTestCase):
+    """Chunked bulk upserts (user-014)."""
+
+    def test_chunks_hold_rows_with_the_same_keys(self):
+        rows = [{'id': 1, 'a': 1}, {'id': 2}, {'id': 3, 'a': 3}, {'id': 4}, {'id': 5, 'a': 5}]
+
+        chunks = list(iter_indexed_chunks(rows, 2))
+
+        self.assertEqual(chunks, [
+            ([0, 2], [{'id': 1, 'a': 1}, {'id': 3, 'a': 3}]),
+            ([1, 3], [{'id': 2}, {'id': 4}]),
+            ([4], [{'id': 5, 'a': 5}]),
+        ])
+
+    def test_buffered_rows_are_capped_across_key_sets(self):
+        # Every row has its own shape except for the repeated {'id', 'a'}
+        rows = [{'id': 0, 'a': 0}, {'id': 1, 'a': 1}] + [{'id': i, f'c{i}': i} for i in range(2, 6)]
+
+        chunks = list(iter_indexed_chunks(rows, 10, max_buffered=3))
+
+        # The largest buffer goes first once three rows wait
+        self.assertEqual([indexes for indexes, chunk in chunks], [[0, 1], [2], [3], [4], [5]])
+        self.assertEqual(list(iter_chunks(rows, 10, max_buffered=3))[0], rows[:2])
+
+    def test_chunk_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            list(iter_chunks([{'id': 1}], 0))
+
+    async def test_rows_are_sent_in_chunks(self):
+        client = self.async_direct_client()
+
+        result = await client.bulk_upsert('courses', ({'id': i, 'title': f'C{i}'} for i in range(7)),
+                                          chunk_size=3, max_concurrency=2)
+
+        self.assertEqual((result['rows'], result['upserted'], result['chunks']), (7, 7, 3))
+        self.assertEqual(self.standin.requests, 3)
+        self.assertEqual(len(self.standin.rows('courses')), 7)
+
+    async def test_partial_rows_keep_existing_values(self):
+        self.standin.seed('courses', [{'id': 1, 'title': 'Keep', 'price': 5}, {'id': 2, 'title': 'Old', 'price': 7}])
+        client = self.async_direct_client()
+
+        await client.bulk_upsert('courses', [{'id': 1, 'price': 9}, {'id': 2, 'title': 'New'}], on_conflict='id')
+
+        rows = sorted(self.standin.rows('courses'), key=lambda row: row['id'])
+        self.assertEqual(rows, [{'id': 1, 'title': 'Keep', 'price': 9}, {'id': 2, 'title': 'New', 'price': 7}])
+
+    def test_failed_chunks_report_their_input_rows(self):
+        self.standin.error_rate = 1.0
+        rows = [{'id': 0}, {'id': 1, 'title': 'A'}, {'id': 2}, {'id': 3, 'title': 'B'}]
+
+        result = self.direct_client().bulk_upsert('courses', rows, chunk_size=2)
+
+        self.assertEqual((result['upserted'], result['failed'], result['failed_chunks']), (0, 4, 2))
+        self.assertEqual([error['row_indexes'] for error in result['errors']], [[0, 2], [1, 3]])
+        self.assertEqual([error['status'] for error in result['errors']], [503, 503])
+
+
+class KeysetIterationTests(StandInTestMixin, SimpleTestCase):
+    """Keyset-paginated row iterators (user-015)."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin.seed('courses', [{'id': i, 'level': 'beginner' if i % 2 else 'advanced'} for i in range(1, 8)])
+
+    def test_iter_rows_pages_by_key(self):
+        rows = list(self.direct_client().iter_rows('courses', page_size=3))
+
+        self.assertEqual([row['id'] for row in rows], list(range(1, 8)))
+        # Pages of 3, 3 and 1 rows; the short page ends the walk
+        self.assertEqual(self.standin.requests, 3)
+
+    def test_iter_rows_resumes_after_a_key_with_filters(self):
+        rows = list(self.direct_client().iter_rows('courses', filters={'level': 'beginner'}, page_size=2,
+                                                   start_after=1))
+
+        self.assertEqual([row['id'] for row in rows], [3, 5, 7])
+
+    async def test_async_iter_rows_matches(self):
+        client = self.async_direct_client()
+
+        rows = [row async for row in client.iter_rows('courses', page_size=3)]
+
+        self.assertEqual([row['id'] for row in rows], list(range(1, 8)))
+
+    def test_keyset_params_continue_after_the_last_key(self):
+        params = keyset_params('title', page_size=10, after=42)
+
+        self.assertEqual(params, {'limit': 10, 'order': 'id.asc', 'select': 'title,id', 'id': 'gt.42'})
+        with self.assertRaises(ValueError):
+            keyset_params(filters={'id': 1})
+
+
+class QueryBuilderTests(StandInTestMixin, SimpleTestCase):
+    """Query builder with logic groups, embedding and counts (user-016)."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin.seed('courses', [
+            {'id': i, 'title': f'Course {i}', 'price': i * 10, 'is_active': i != 3} for i in range(1, 6)
+        ])
+
+    def test_build_renders_filters_groups_and_headers(self):
+        query = (self.direct_client().query('courses')
+                 .select('id,title')
+                 .embed('profiles', 'full_name', alias='instructor')
+                 .eq('is_active', True)
+                 .in_('level', ['beginner', 'a,b'])
+                 .or_(Q.ilike('title', '*django*'), Q.and_(Q.lt('price', 20), Q.is_('image_url', None)))
+                 .order('created_at', desc=True, nulls='last')
+                 .range(0, 9)
+                 .count('exact'))
+
+        params, headers = query.build()
+
+        self.assertEqual(params, [
+            ('select', 'id,title,instructor:profiles(full_name)'),
+            ('is_active', 'eq.true'),
+            ('level', 'in.(beginner,"a,b")'),
+            ('or', '(title.ilike.*django*,and(price.lt.20,image_url.is.null))'),
+            ('order', 'created_at.desc.nullslast'),
+        ])
+        self.assertEqual(headers, {'Range-Unit': 'items', 'Range': '0-9', 'Prefer': 'count=exact'})
+
+    def test_execute_filters_and_counts_upstream(self):
+        result = (self.direct_client().query('courses')
+                  .eq('is_active', True)
+                  .or_(Q.lt('price', 20), Q.gt('price', 40))
+                  .order('id')
+                  .count('exact')
+                  .execute())
+
+        self.assertEqual([row['id'] for row in result.data], [1, 5])
+        self.assertEqual(result.count, 2)
+
+    def test_count_only_transfers_no_rows(self):
+        result = self.direct_client().query('courses').eq('is_active', True).count_only()
+
+        self.assertEqual((result.data, result.count), ([], 4))
+
+    async def test_async_query_matches(self):
+        result = await self.async_direct_client().query('courses').gte('price', 30).order('id').execute()
+
+        self.assertEqual([row['id'] for row in result.data], [3, 4, 5])
+
+    def test_service_key_queries_need_a_service_key(self):
+        with self.assertRaises(ValueError):
+            self.direct_client(service_key='').query('courses').with_service_key().execute()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Circuit breaker states and backend fallback (user-017)."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('core.circuit_breaker.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure(RuntimeError('down'))
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker.record_failure(RuntimeError('down'))
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_half_open_allows_one_probe(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        self.now += 30
+
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+    def test_probe_outcome_closes_or_reopens(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        self.now += 30
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.now += 30
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_selector_falls_back_and_skips_open_backends(self):
+        selector = BackendSelector(['sdk', 'direct'], failure_threshold=1)
+        sdk = mock.Mock(side_effect=RuntimeError('sdk broken'))
+        direct = mock.Mock(return_value='rows')
+
+        self.assertEqual(selector.call('select', {'sdk': sdk, 'direct': direct}), 'rows')
+        self.assertEqual(selector.call('select', {'sdk': sdk, 'direct': direct}), 'rows')
+
+        self.assertEqual(sdk.call_count, 1)
+        self.assertEqual(selector.stats()['select']['sdk']['state'], CircuitBreaker.OPEN)
+
+    def test_selector_raises_when_every_circuit_is_open(self):
+        selector = BackendSelector(['direct'], failure_threshold=1)
+        with self.assertRaises(RuntimeError):
+            selector.call('select', {'direct': mock.Mock(side_effect=RuntimeError('down'))})
+
+        with self.assertRaises(CircuitOpenError):
+            selector.call('select', {'direct': mock.Mock()})
+
+    def test_errors_that_are_not_failures_keep_the_circuit_closed(self):
+        selector = BackendSelector(['direct'], failure_threshold=1, is_failure=lambda backend, e: False)
+
+        with self.assertRaises(KeyError):
+            selector.call('get_user', {'direct': mock.Mock(side_effect=KeyError('missing'))})
+
+        self.assertEqual(selector.breaker('get_user', 'direct').state, CircuitBreaker.CLOSED)
+
+    def test_client_errors_are_not_backend_failures(self):
+        def http_error(status):
+            response = requests.Response()
+            response.status_code = status
+            return requests.HTTPError(response=response)
+
+        self.assertFalse(_is_backend_failure('direct', http_error(404)))
+        self.assertTrue(_is_backend_failure('direct', http_error(429)))
+        self.assertTrue(_is_backend_failure('direct', http_error(503)))
+        self.assertTrue(_is_backend_failure('sdk', RuntimeError('connection reset')))
+
+
+class SupabaseMetricsTests(StandInTestMixin, SimpleTestCase):
+    """Per-target latency, size and error metrics (user-019)."""
+
+    def setUp(self):
+        super().setUp()
+        self.ring = RingBufferSink()
+        self.prometheus = PrometheusSink(buckets=(0.1, 1.0))
+        patcher = mock.patch('core.supabase_metrics._recorder', CallRecorder([self.ring, self.prometheus]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_urls_are_named_by_table_or_endpoint(self):
+        self.assertEqual(target_from_url('http://x/rest/v1/courses?id=eq.1'), 'courses')
+        self.assertEqual(target_from_url('http://x/rest/v1/rpc/unread_count'), 'rpc/unread_count')
+        self.assertEqual(target_from_url('http://x/auth/v1/admin/users/1234'), 'auth/admin/users')
+
+    def test_client_calls_are_recorded_per_table(self):
+        self.standin.seed('courses', [{'id': 1, 'title': 'Intro'}])
+        client = self.direct_client()
+        client.query('courses').execute()
+        # A client error, so the pool doesn't retry it
+        self.standin.error_rate, self.standin.error_status = 1.0, 400
+        with self.assertRaises(requests.HTTPError):
+            client.query('courses').execute()
+
+        summary = self.ring.summary()['GET courses']
+        self.assertEqual((summary['calls'], summary['errors']), (2, 1))
+        self.assertEqual([(record.status, record.error) for record in self.ring.records()],
+                         [(200, None), (400, 'HTTP400')])
+        self.assertGreater(self.ring.records()[0].response_bytes, 0)
+
+    def test_prometheus_sink_renders_histograms_and_errors(self):
+        recorder = CallRecorder([self.prometheus])
+        recorder.record('rest', 'courses', 'GET', 200, 0.05, response_bytes=10)
+        recorder.record('rest', 'courses', 'GET', 503, 2.0, error='HTTP503')
+
+        text = self.prometheus.render()
+
+        self.assertIn('supabase_request_duration_seconds_bucket{client="rest",target="courses",'
+                      'verb="GET",status="200",le="0.1"} 1', text)
+        self.assertIn('supabase_errors_total{client="rest",target="courses",verb="GET",error="HTTP503"} 1', text)
+        self.assertIn('supabase_response_bytes_total{client="rest",target="courses",verb="GET"} 10', text)
+
+    def test_a_failing_sink_never_breaks_the_call(self):
+        broken = mock.Mock()
+        broken.emit.side_effect = RuntimeError('sink down')
+        recorder = CallRecorder([broken, self.ring], slow_call_ms=0)
+
+        with self.assertLogs('core.supabase_metrics', 'ERROR'):
+            recorder.record('rest', 'courses', 'GET', 200, 0.01)
+
+        self.assertEqual(len(self.ring.records()), 1)
+
+    def test_slow_calls_are_logged(self):
+        recorder = CallRecorder([], slow_call_ms=100)
+
+        with self.assertLogs('core.supabase_metrics.slow', 'WARNING'):
+            recorder.record('rest', 'courses', 'GET', 200, 0.5)
+
+
+class StandInServerTests(StandInTestMixin, SimpleTestCase):
+    """HTTP stand-in with SQLite storage and fault injection (user-020)."""
+
+    def test_sign_up_sign_in_and_read_the_user(self):
+        client = self.direct_client()
+        client.sign_up('one@example.com', 'password', {'role': 'student'})
+
+        session = client.sign_in('one@example.com', 'password')
+        user = client.get_user(session['access_token'])
+
+        self.assertEqual((user['email'], user['user_metadata']), ('one@example.com', {'role': 'student'}))
+        with self.assertRaises(requests.HTTPError) as raised:
+            client.sign_in('one@example.com', 'wrong')
+        self.assertEqual(raised.exception.response.status_code, 400)
+
+    def test_not_null_columns_reject_writes(self):
+        self.standin.require('courses', 'title')
+
+        with self.assertRaises(requests.HTTPError) as raised:
+            self.direct_client().insert('courses', {'price': 5})
+
+        self.assertEqual(raised.exception.response.json()['code'], '23502')
+        self.assertEqual(self.standin.rows('courses'), [])
+
+    def test_faults_are_limited_to_their_paths_and_reproducible(self):
+        def injected(seed):
+            standin = SupabaseStandIn(error_rate=0.5, error_status=400, fault_paths=['rest/v1/courses'], seed=seed)
+            statuses = [standin.respond('GET', 'http://standin/rest/v1/courses')[0] for _ in range(20)]
+            self.assertEqual(standin.respond('GET', 'http://standin/rest/v1/lessons')[0], 200)
+            return statuses
+
+        statuses = injected(seed=7)
+
+        self.assertEqual(statuses, injected(seed=7))
+        self.assertEqual(set(statuses), {200, 400})
+
+    def test_rows_users_and_signing_key_survive_a_restart(self):
+        database = os.path.join(tempfile.mkdtemp(prefix='standin-'), 'standin.sqlite3')
+        first = SupabaseStandIn(database=database)
+        first.seed('courses', [{'title': 'Intro'}])
+        self.server = SupabaseStandInServer(first).start()
+        self.addCleanup(self.server.close)
+        self.direct_client().sign_up('one@example.com', 'password')
+        token = first.minter.mint('user-1', 'one@example.com')
+        first.close()
+
+        second = SupabaseStandIn(database=database)
+        self.addCleanup(second.close)
+
+        self.assertEqual(second.rows('courses'), [{'id': 1, 'title': 'Intro'}])
+        self.assertIn('one@example.com', second.users)
+        self.assertEqual(second.minter.decode(token)['sub'], 'user-1')
+
+
+class CourseMirrorTests(StandInTestMixin, TestCase):
+    """Incremental course mirror (user-021)."""
+
+    def course(self, course_id, updated, **fields):
+        return {'id': course_id, 'title': f'Course {course_id}', 'price': 10, 'is_active': True,
+                'created_at': timestamp(0), 'updated_at': timestamp(updated), **fields}
+
+    def mirror(self, **kwargs):
+        return CourseMirror(client=self.direct_client(), page_size=2, full_sync_interval=3600, **kwargs)
+
+    def test_creates_courses_and_stores_the_watermark(self):
+        self.standin.seed('courses', [self.course(1, 10), self.course(2, 20), self.course(3, 30)])
+
+        result = self.mirror().sync()
+
+        self.assertEqual((result['created'], result['pages']), (3, 2))
+        self.assertEqual(sorted(Course.objects.values_list('supabase_id', flat=True)), [1, 2, 3])
+        state = SyncState.objects.get()
+        self.assertEqual((state.watermark, state.watermark_key), (timestamp(30), '3'))
+
+    def test_applies_updates_and_skips_unchanged_rows(self):
+        self.standin.seed('courses', [self.course(1, 10), self.course(2, 20)])
+        mirror = self.mirror()
+        mirror.sync()
+
+        self.standin.tables['courses'][0].update(title='Renamed', is_active=False, updated_at=timestamp(40))
+        result = mirror.sync()
+
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        course = Course.objects.get(supabase_id=1)
+        self.assertEqual(course.title, 'Renamed')
+        self.assertFalse(course.is_published)
+
+    def test_picks_up_rows_committed_behind_the_watermark(self):
+        self.standin.seed('courses', [self.course(1, 10), self.course(2, 20)])
+        mirror = self.mirror()
+        mirror.sync()
+
+        self.standin.tables['courses'].append(self.course(3, 15))
+        result = mirror.sync()
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(SyncState.objects.get().watermark, timestamp(20))
+
+    def test_full_run_deletes_or_unpublishes_removed_courses(self):
+        self.standin.seed('courses', [self.course(1, 10), self.course(2, 20), self.course(3, 30)])
+        mirror = self.mirror()
+        mirror.sync()
+        user = User.objects.create_user('student')
+        CourseEnrollment.objects.create(user=user, course=Course.objects.get(supabase_id=2))
+
+        self.standin.tables['courses'] = [self.course(3, 30)]
+        result = mirror.sync(full=True)
+
+        self.assertEqual((result['deleted'], result['unpublished']), (1, 1))
+        self.assertFalse(Course.objects.filter(supabase_id=1).exists())
+        self.assertFalse(Course.objects.get(supabase_id=2).is_published)
+
+    def test_fails_without_a_service_key(self):
+        self.standin.seed('courses', [self.course(1, 10)])
+        mirror = CourseMirror(client=self.direct_client(service_key=''))
+
+        with self.assertRaises(ValueError):
+            mirror.sync()
+        self.assertFalse(Course.objects.exists())
+        self.assertIn('SUPABASE_SERVICE_KEY', SyncState.objects.get().last_error)
+
+
+class ChangeFeedTests(SimpleTestCase):
+    """Change feed de-duplication and catch-up (user-022)."""
+
+    def feed(self, **kwargs):
+        return ChangeFeed(channels=['new_notification'], connect_params={}, **kwargs)
+
+    async def test_duplicate_events_are_dropped(self):
+        feed = self.feed()
+        feed._setup()
+        event = {'id': 'n1', 'user_id': 'u1', 'created_at': timestamp(1)}
+
+        self.assertTrue(feed._accept(ChangeEvent('new_notification', event)))
+        self.assertFalse(feed._accept(ChangeEvent('new_notification', dict(event), replayed=True)))
+
+        stats = feed.stats()['channels']['new_notification']
+        self.assertEqual((stats['received'], stats['duplicates']), (1, 1))
+        self.assertEqual(feed.stats()['queue_depth'], 1)
+
+    async def test_catch_up_pages_from_the_watermark(self):
+        rows = [{'id': f'n{i}', 'user_id': 'u1', 'created_at': datetime(2026, 1, 1, 0, 0, i, tzinfo=timezone.utc)}
+                for i in range(5)]
+        queries = []
+
+        def fetch_missed(channel, since, after_id):
+            queries.append((since, after_id))
+            later = [row for row in rows if (row['created_at'], row['id']) > (since, after_id)]
+            return later[:2]
+
+        feed = self.feed(since=rows[1]['created_at'], catch_up_overlap=0)
+        feed._setup()
+        # Delivered live before the connection dropped
+        feed._accept(ChangeEvent('new_notification', {'id': 'n2', 'created_at': rows[2]['created_at'].isoformat()}))
+
+        with mock.patch('core.change_feed.CATCH_UP_PAGE_SIZE', 2), \
+                mock.patch.object(feed, '_fetch_missed', side_effect=fetch_missed):
+            await feed._catch_up()
+
+        replayed = []
+        while not feed._queue.empty():
+            replayed.append(feed._queue.get_nowait())
+        self.assertEqual([event.id for event in replayed], ['n2', 'n3', 'n4'])
+        self.assertTrue(all(event.replayed for event in replayed[1:]))
+        # Catch-up starts at the newest created_at seen, not the initial since
+        self.assertEqual(queries[0], (rows[2]['created_at'], ''))
+        self.assertEqual(feed.stats()['channels']['new_notification']['duplicates'], 1)
+
+
+class NotificationHubTests(StandInTestMixin, SimpleTestCase):
+    """SSE replay, de-duplication and stream lifetime (user-023)."""
+
+    def setUp(self):
+        super().setUp()
+        self.standin.seed('notifications', [
+            {'id': f'n{i:02d}', 'user_id': 'u1', 'created_at': timestamp(i)} for i in range(6)
+        ])
+
+    def hub(self, **kwargs):
+        feed = ChangeFeed(channels=['new_notification'], connect_params={})
+        return NotificationHub(client=self.async_direct_client(), feed=feed, heartbeat=60, **kwargs)
+
+    async def collect(self, stream, count):
+        ids = []
+        async for message in stream:
+            if message.startswith('id: '):
+                ids.append(message.split('\n')[0].rsplit('/', 1)[1])
+                if len(ids) == count:
+                    break
+        await stream.aclose()
+        return ids
+
+    async def drain(self, stream):
+        return [message async for message in stream]
+
+    async def test_resume_replays_every_page_after_the_cursor(self):
+        hub = self.hub(replay_limit=2)
+        try:
+            ids = await self.collect(hub.stream('u1', last_event_id=f"{timestamp(0)}/n00"), 5)
+        finally:
+            hub.close()
+
+        self.assertEqual(ids, ['n01', 'n02', 'n03', 'n04', 'n05'])
+        self.assertEqual(hub.replayed, 5)
+
+    async def test_live_notifications_already_replayed_are_skipped(self):
+        hub = self.hub()
+        try:
+            stream = hub.stream('u1', last_event_id=f"{timestamp(3)}/n03")
+            replayed = [await stream.__anext__() for _ in range(3)]
+
+            # The change feed delivers a replayed row again, then a new one
+            hub.deliver('u1', {'id': 'n05', 'created_at': timestamp(5)})
+            hub.deliver('u1', {'id': 'n06', 'created_at': timestamp(6)})
+            live = await stream.__anext__()
+            await stream.aclose()
+        finally:
+            hub.close()
+
+        self.assertEqual(replayed[0], 'retry: 3000\n\n')
+        self.assertIn('n05', replayed[2])
+        self.assertIn('n06', live)
+        self.assertEqual(hub.stats()['connections'], 0)
+
+    async def test_overflowing_stream_is_closed(self):
+        hub = self.hub(queue_size=1)
+        try:
+            stream = hub.stream('u1')
+            await stream.__anext__()
+
+            for i in range(3):
+                hub.deliver('u1', {'id': f'x{i}', 'created_at': timestamp(10 + i)})
+            ids = await self.collect(stream, 10)
+        finally:
+            hub.close()
+
+        self.assertEqual(ids, ['x0'])
+        self.assertEqual(hub.overflows, 1)
+
+    async def test_idle_stream_ends_at_its_deadline_without_a_heartbeat(self):
+        hub = self.hub(max_duration=0.2)
+        try:
+            messages = await asyncio.wait_for(self.collect(hub.stream('u1'), 1), 5)
+        finally:
+            hub.close()
+
+        self.assertEqual(messages, [])
+        self.assertEqual(hub.stats()['connections'], 0)
+
+    async def test_busy_stream_ends_once_the_token_expires(self):
+        hub = self.hub()
+
+        async def publish_forever():
+            for i in itertools.count():
+                hub.deliver('u1', {'id': f'x{i:04d}', 'created_at': timestamp(10 + i)})
+                await asyncio.sleep(0.02)
+
+        publisher = asyncio.ensure_future(publish_forever())
+        try:
+            stream = hub.stream('u1', expires_at=time.time() + 0.3)
+            messages = await asyncio.wait_for(self.drain(stream), 5)
+        finally:
+            publisher.cancel()
+            hub.close()
+
+        # Events kept arriving, yet the stream closed at the deadline
+        self.assertGreater(len(messages), 2)
+        self.assertEqual(hub.stats()['connections'], 0)
+
+
+class NotificationCountTests(StandInTestMixin, SimpleTestCase):
+    """Trigger-maintained unread counters (user-024)."""
+
+    def test_count_is_read_from_the_user_counter(self):
+        self.standin.seed('notification_unread_counts', [{'id': 1, 'user_id': 'u1', 'unread': 4}])
+        client = self.direct_client()
+
+        self.assertEqual(unread_count('u1', client=client), 4)
+        # Users without a counter have nothing unread
+        self.assertEqual(unread_count('u2', client=client), 0)
+
+    def test_reconciliation_runs_batches_until_one_is_short(self):
+        client = mock.Mock()
+        client.rpc.side_effect = [{'checked': 2, 'repaired': 1}, {'checked': 2, 'repaired': 0},
+                                  {'checked': 1, 'repaired': 1}]
+
+        with self.assertLogs('core.notification_counts', 'WARNING'):
+            result = reconcile_unread_counts(client=client, batch_size=2)
+
+        self.assertEqual(result, {'checked': 5, 'repaired': 2, 'batches': 3})
+        client.rpc.assert_called_with('reconcile_notification_unread_counts', {'max_users': 2},
+                                      use_service_key=True)
+
+
+class NotificationInboxTests(StandInTestMixin, SimpleTestCase):
+    """Keyset-paginated notification inbox (user-025)."""
+
+    def test_inbox_pages_with_a_cursor(self):
+        self.standin.seed('notifications', [
+            {'id': f'n{i:02d}', 'user_id': 'u1', 'type': 'course', 'read': i % 2 == 0,
+             'created_at': timestamp(i)}
+            for i in range(7)
+        ] + [{'id': 'other', 'user_id': 'u2', 'type': 'course', 'read': False, 'created_at': timestamp(3)}])
+        client = self.direct_client()
+
+        seen = []
+        cursor = None
+        while True:
+            page = inbox_page('u1', limit=3, cursor=cursor, client=client)
+            seen.extend(row['id'] for row in page['results'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [f'n{i:02d}' for i in range(6, -1, -1)])
+        unread = inbox_page('u1', status='unread', client=client)['results']
+        self.assertEqual([row['id'] for row in unread], ['n05', 'n03', 'n01'])
+
+    def test_inbox_rejects_a_bad_cursor(self):
+        with self.assertRaises(ValueError):
+            inbox_page('u1', cursor='not-a-cursor', client=self.direct_client())
@@ -37,6 +37,111 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 
+# Shared keep-alive HTTP pool for Supabase REST/auth calls
+SUPABASE_HTTP_POOL_CONNECTIONS = int(os.getenv('SUPABASE_HTTP_POOL_CONNECTIONS', '10'))
+SUPABASE_HTTP_POOL_MAXSIZE = int(os.getenv('SUPABASE_HTTP_POOL_MAXSIZE', '20'))
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_HTTP_CONNECT_TIMEOUT', '3.05'))
+SUPABASE_HTTP_READ_TIMEOUT = float(os.getenv('SUPABASE_HTTP_READ_TIMEOUT', '10'))
+SUPABASE_HTTP_RETRIES = int(os.getenv('SUPABASE_HTTP_RETRIES', '3'))
+SUPABASE_HTTP_BACKOFF_FACTOR = float(os.getenv('SUPABASE_HTTP_BACKOFF_FACTOR', '0.2'))
+SUPABASE_HTTP_BACKOFF_JITTER = float(os.getenv('SUPABASE_HTTP_BACKOFF_JITTER', '0.2'))
+
+# Async Supabase client (core.async_supabase) connection pool and per-host concurrency
+SUPABASE_ASYNC_MAX_CONNECTIONS = int(os.getenv('SUPABASE_ASYNC_MAX_CONNECTIONS', '100'))
+SUPABASE_ASYNC_MAX_KEEPALIVE = int(os.getenv('SUPABASE_ASYNC_MAX_KEEPALIVE', '20'))
+SUPABASE_ASYNC_MAX_PER_HOST = int(os.getenv('SUPABASE_ASYNC_MAX_PER_HOST', '20'))
+
+# Supabase select result cache: default TTL (0 = off), per-table TTLs ("table=seconds,...") and size
+SUPABASE_SELECT_CACHE_TTL = float(os.getenv('SUPABASE_SELECT_CACHE_TTL', '0'))
+SUPABASE_SELECT_CACHE_TABLE_TTLS = os.getenv('SUPABASE_SELECT_CACHE_TABLE_TTLS', 'courses=60')
+SUPABASE_SELECT_CACHE_SIZE = int(os.getenv('SUPABASE_SELECT_CACHE_SIZE', '1024'))
+
+# Supabase bulk_upsert: rows per request and requests in flight
+SUPABASE_BULK_CHUNK_SIZE = int(os.getenv('SUPABASE_BULK_CHUNK_SIZE', '500'))
+SUPABASE_BULK_CONCURRENCY = int(os.getenv('SUPABASE_BULK_CONCURRENCY', '4'))
+
+# SupabaseClient SDK/REST circuit breakers: consecutive failures to open, seconds before a probe
+SUPABASE_BREAKER_FAILURE_THRESHOLD = int(os.getenv('SUPABASE_BREAKER_FAILURE_THRESHOLD', '3'))
+SUPABASE_BREAKER_RESET_TIMEOUT = float(os.getenv('SUPABASE_BREAKER_RESET_TIMEOUT', '30'))
+
+# Supabase profile IDs per batched id=in.(...) query
+SUPABASE_PROFILE_BATCH_SIZE = int(os.getenv('SUPABASE_PROFILE_BATCH_SIZE', '100'))
+
+# Supabase call instrumentation: sinks ("logging", "ring", "prometheus" or dotted class paths),
+# ring buffer size and the latency (ms) at which calls are logged as slow (0 = off)
+SUPABASE_METRICS_SINKS = os.getenv('SUPABASE_METRICS_SINKS', 'ring,prometheus')
+SUPABASE_METRICS_RING_SIZE = int(os.getenv('SUPABASE_METRICS_RING_SIZE', '1000'))
+SUPABASE_SLOW_CALL_MS = float(os.getenv('SUPABASE_SLOW_CALL_MS', '1000'))
+
+# Local mirror of the Supabase courses table: keyset page size, seconds between
+# full runs that detect deletions, the oldest mirror (seconds) the course list
+# is served from (0 = always read Supabase), and seconds before the watermark
+# each run re-reads to pick up rows that committed late
+SUPABASE_COURSE_MIRROR_PAGE_SIZE = int(os.getenv('SUPABASE_COURSE_MIRROR_PAGE_SIZE', '500'))
+SUPABASE_COURSE_MIRROR_FULL_SYNC_INTERVAL = int(os.getenv('SUPABASE_COURSE_MIRROR_FULL_SYNC_INTERVAL', '3600'))
+SUPABASE_COURSE_MIRROR_MAX_STALENESS = int(os.getenv('SUPABASE_COURSE_MIRROR_MAX_STALENESS', '300'))
+SUPABASE_COURSE_MIRROR_OVERLAP = int(os.getenv('SUPABASE_COURSE_MIRROR_OVERLAP', '60'))
+
+# Postgres LISTEN/NOTIFY change feed (manage.py listen_changes). The DSN defaults
+# to the Django database and must be a session-mode (direct) connection.
+SUPABASE_CHANGE_FEED_DSN = os.getenv('SUPABASE_CHANGE_FEED_DSN', '')
+SUPABASE_CHANGE_FEED_CHANNELS = os.getenv('SUPABASE_CHANGE_FEED_CHANNELS', 'new_notification')
+SUPABASE_CHANGE_FEED_QUEUE_SIZE = int(os.getenv('SUPABASE_CHANGE_FEED_QUEUE_SIZE', '1000'))
+SUPABASE_CHANGE_FEED_WORKERS = int(os.getenv('SUPABASE_CHANGE_FEED_WORKERS', '1'))
+SUPABASE_CHANGE_FEED_CATCH_UP_OVERLAP = float(os.getenv('SUPABASE_CHANGE_FEED_CATCH_UP_OVERLAP', '5'))
+# Handlers per channel, as dotted paths to callables taking a ChangeEvent
+SUPABASE_CHANGE_FEED_HANDLERS = {
+    'new_notification': ['core.change_feed.invalidate_select_cache'],
+}
+
+# Server-Sent Events notification streams (/api/notifications/stream/): pending
+# notifications per stream before a slow client is dropped, keep-alive interval
+# (seconds), notifications per replay query for Last-Event-ID, longest stream (seconds),
+# and whether each ASGI worker starts its own LISTEN change feed
+SUPABASE_SSE_QUEUE_SIZE = int(os.getenv('SUPABASE_SSE_QUEUE_SIZE', '100'))
+SUPABASE_SSE_HEARTBEAT = float(os.getenv('SUPABASE_SSE_HEARTBEAT', '15'))
+SUPABASE_SSE_REPLAY_LIMIT = int(os.getenv('SUPABASE_SSE_REPLAY_LIMIT', '500'))
+SUPABASE_SSE_MAX_DURATION = int(os.getenv('SUPABASE_SSE_MAX_DURATION', '3600'))
+SUPABASE_SSE_CHANGE_FEED = os.getenv('SUPABASE_SSE_CHANGE_FEED', 'True').lower() == 'true'
+
+# Unread notification counters: drifted users repaired per reconciliation call
+SUPABASE_UNREAD_RECONCILE_BATCH_SIZE = int(os.getenv('SUPABASE_UNREAD_RECONCILE_BATCH_SIZE', '1000'))
+
+# Supabase JWKS key cache (seconds)
+SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL', f"{SUPABASE_URL}/auth/v1/jwks" if SUPABASE_URL else None)
+SUPABASE_JWKS_TTL = int(os.getenv('SUPABASE_JWKS_TTL', '300'))
+SUPABASE_JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('SUPABASE_JWKS_MIN_REFRESH_INTERVAL', '30'))
+SUPABASE_JWKS_TIMEOUT = float(os.getenv('SUPABASE_JWKS_TIMEOUT', '5'))
+
+# Supabase JWT verification: 'jwks' fetches public keys from SUPABASE_JWKS_URL,
+# 'local' verifies in-process with SUPABASE_JWT_SECRET (HS256) and/or
+# SUPABASE_JWT_PUBLIC_KEY (PEM, JWK or JWKS JSON) without outbound HTTP
+SUPABASE_JWT_VERIFICATION_MODE = os.getenv('SUPABASE_JWT_VERIFICATION_MODE', 'jwks').lower()
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET', '')
+SUPABASE_JWT_PUBLIC_KEY = os.getenv('SUPABASE_JWT_PUBLIC_KEY', '')
+# kid of a PEM SUPABASE_JWT_PUBLIC_KEY; without it the PEM key matches any kid
+SUPABASE_JWT_KEY_ID = os.getenv('SUPABASE_JWT_KEY_ID', '')
+# In local mode, fall back to JWKS for tokens no local key matches
+SUPABASE_JWT_JWKS_FALLBACK = os.getenv('SUPABASE_JWT_JWKS_FALLBACK', 'False').lower() == 'true'
+
+# Cache of verified Supabase JWT claims, keyed by token digest until expiry
+SUPABASE_JWT_CACHE_ENABLED = os.getenv('SUPABASE_JWT_CACHE_ENABLED', 'True').lower() == 'true'
+SUPABASE_JWT_CACHE_SIZE = int(os.getenv('SUPABASE_JWT_CACHE_SIZE', '10000'))
+
+# Short-lived cache of token digests that failed verification (0 disables)
+SUPABASE_JWT_NEGATIVE_CACHE_TTL = int(os.getenv('SUPABASE_JWT_NEGATIVE_CACHE_TTL', '30'))
+SUPABASE_JWT_NEGATIVE_CACHE_SIZE = int(os.getenv('SUPABASE_JWT_NEGATIVE_CACHE_SIZE', '10000'))
+
+# Offload signature checks in the async auth path to a small thread pool
+SUPABASE_JWT_VERIFY_IN_THREAD = os.getenv('SUPABASE_JWT_VERIFY_IN_THREAD', 'False').lower() == 'true'
+SUPABASE_JWT_VERIFY_THREADS = int(os.getenv('SUPABASE_JWT_VERIFY_THREADS', '4'))
+
+# Seconds a Supabase user resolved to a Django user stays cached (0 disables)
+SUPABASE_USER_CACHE_TTL = int(os.getenv('SUPABASE_USER_CACHE_TTL', '60'))
+# Cap on that TTL when CACHES is per process (no REDIS_URL), since a saved user
+# is only dropped from the cache of the worker that saved it
+SUPABASE_USER_LOCAL_CACHE_TTL = int(os.getenv('SUPABASE_USER_LOCAL_CACHE_TTL', '5'))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -118,6 +223,27 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/ref/settings/#caches
+
+# Auth token and Supabase user caches are invalidated on save/delete, which
+# only reaches other worker processes through a shared backend. Set REDIS_URL
+# in production: without it each process gets its own memory cache, the auth
+# token cache is off and Supabase users are cached for a few seconds only.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -180,7 +306,7 @@ INSTALLED_PACKAGES = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',  # TokenAuthentication with cached key lookups
         'api.authentication.SupabaseJWTAuthentication',  # Add Supabase JWT authentication
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -190,6 +316,9 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10
 }
 
+# Seconds a DRF auth token key stays in the shared cache (0 disables)
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # In production, set this to False and use CORS_ALLOWED_ORIGINS
 # CORS_ALLOWED_ORIGINS = [
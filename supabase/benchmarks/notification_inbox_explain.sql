@@ -0,0 +1,182 @@
+-- EXPLAIN benchmark for the notification inbox queries at 10M rows
+--
+-- Run against a database with the migrations applied (a local or branch
+-- database, not production: loading writes a few GB to a temp table and
+-- takes several minutes):
+--
+--   psql "$DATABASE_URL" -v ON_ERROR_STOP=1 -f supabase/benchmarks/notification_inbox_explain.sql
+--
+-- The rows go into a session-local copy of public.notifications with the same
+-- indexes, so nothing needs auth.users rows and nothing outlives the session.
+-- Each inbox query is written the way PostgREST renders the filters that
+-- core.notification_inbox sends. The script fails if a plan sorts, scans the
+-- table sequentially, misses the expected index, or discards more than a
+-- handful of rows, and prints each query's time and buffers otherwise.
+--
+-- Inbox pages are expected to be plain Index Scans, not Index Only Scans: they
+-- return whole rows, and covering title and content with INCLUDE would copy
+-- unbounded text into both indexes (and fail inserts past the btree row size
+-- limit) to save 21 heap fetches per page. Only the unread count, which needs
+-- nothing beyond the key columns, is checked for an Index Only Scan.
+
+\timing on
+
+DROP TABLE IF EXISTS pg_temp.inbox_bench;
+CREATE TEMPORARY TABLE inbox_bench (LIKE public.notifications INCLUDING DEFAULTS INCLUDING INDEXES);
+
+-- 100,000 users with ~98 notifications each, plus one heavy user with
+-- 200,000, about 20% unread, one per second going back in time
+INSERT INTO inbox_bench (id, user_id, type, title, content, read, created_at)
+SELECT
+    gen_random_uuid(),
+    CASE WHEN g <= 200000
+         THEN '00000000-0000-0000-0000-000000000000'::uuid
+         ELSE ('00000000-0000-0000-0000-' || lpad(to_hex(g % 100000 + 1), 12, '0'))::uuid
+    END,
+    (ARRAY['system', 'course', 'survey', 'achievement', 'reminder'])[g % 5 + 1],
+    'Notification ' || g,
+    'Benchmark notification body',
+    random() >= 0.2,
+    TIMESTAMP WITH TIME ZONE '2026-10-01 00:00:00+00' - g * INTERVAL '1 second'
+FROM generate_series(1, 10000000) AS g;
+
+-- Sets the visibility map too, which index-only scans depend on
+VACUUM ANALYZE inbox_bench;
+
+-- Run a query under EXPLAIN ANALYZE and check the plan's shape
+CREATE OR REPLACE FUNCTION pg_temp.check_plan(
+    label TEXT,
+    query TEXT,
+    expected_index TEXT,
+    expected_scan TEXT DEFAULT 'Index Scan',
+    max_rows_removed BIGINT DEFAULT 10
+) RETURNS VOID AS $$
+DECLARE
+  plan JSONB;
+  removed BIGINT;
+BEGIN
+  EXECUTE 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' || query INTO plan;
+
+  IF jsonb_path_exists(plan, '$.** ? (@."Node Type" == "Seq Scan" || @."Node Type" == "Sort")') THEN
+    RAISE EXCEPTION '%: plan sorts or scans sequentially: %', label, jsonb_pretty(plan);
+  END IF;
+  IF NOT jsonb_path_exists(plan, '$.** ? (@."Node Type" == $scan && @."Index Name" == $index)',
+                           jsonb_build_object('scan', expected_scan, 'index', expected_index)) THEN
+    RAISE EXCEPTION '%: expected % on %: %', label, expected_scan, expected_index, jsonb_pretty(plan);
+  END IF;
+
+  SELECT COALESCE(sum(value::BIGINT), 0) INTO removed
+  FROM jsonb_path_query(plan, '$.**."Rows Removed by Filter"') AS value;
+  IF removed > max_rows_removed THEN
+    RAISE EXCEPTION '%: % rows removed by filter: %', label, removed, jsonb_pretty(plan);
+  END IF;
+
+  RAISE NOTICE '% ok: % on %, % ms, % shared buffers, % rows removed', label, expected_scan, expected_index,
+    plan -> 0 ->> 'Execution Time',
+    (plan -> 0 -> 'Plan' ->> 'Shared Hit Blocks')::BIGINT + (plan -> 0 -> 'Plan' ->> 'Shared Read Blocks')::BIGINT,
+    removed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Index names on the copy are generated, so look them up by column list
+SELECT
+    (SELECT indexname FROM pg_indexes
+     WHERE tablename = 'inbox_bench' AND indexdef LIKE '%(user_id, read, created_at DESC, id DESC)') AS read_index,
+    (SELECT indexname FROM pg_indexes
+     WHERE tablename = 'inbox_bench' AND indexdef LIKE '%(user_id, created_at DESC, id DESC)') AS all_index
+\gset
+
+-- A cursor 150,000 notifications deep into the heavy user's inbox, and one
+-- into their unread notifications
+SELECT created_at AS deep_created_at, id AS deep_id
+FROM inbox_bench
+WHERE user_id = '00000000-0000-0000-0000-000000000000'
+ORDER BY created_at DESC, id DESC
+OFFSET 150000 LIMIT 1
+\gset
+SELECT created_at AS deep_unread_created_at, id AS deep_unread_id
+FROM inbox_bench
+WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = false
+ORDER BY created_at DESC, id DESC
+OFFSET 30000 LIMIT 1
+\gset
+
+SELECT pg_temp.check_plan(
+    'unread, first page',
+    $q$SELECT * FROM inbox_bench
+       WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = false
+       ORDER BY created_at DESC, id DESC LIMIT 21$q$,
+    :'read_index');
+
+SELECT pg_temp.check_plan(
+    'unread, deep page',
+    format($q$SELECT * FROM inbox_bench
+              WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = false
+                AND created_at <= %1$L
+                AND (created_at < %1$L OR (created_at = %1$L AND id < %2$L))
+              ORDER BY created_at DESC, id DESC LIMIT 21$q$, :'deep_unread_created_at', :'deep_unread_id'),
+    :'read_index');
+
+SELECT pg_temp.check_plan(
+    'read, first page',
+    $q$SELECT * FROM inbox_bench
+       WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = true
+       ORDER BY created_at DESC, id DESC LIMIT 21$q$,
+    :'read_index');
+
+SELECT pg_temp.check_plan(
+    'all, first page',
+    $q$SELECT * FROM inbox_bench
+       WHERE user_id = '00000000-0000-0000-0000-000000000000'
+       ORDER BY created_at DESC, id DESC LIMIT 21$q$,
+    :'all_index');
+
+SELECT pg_temp.check_plan(
+    'all, deep page',
+    format($q$SELECT * FROM inbox_bench
+              WHERE user_id = '00000000-0000-0000-0000-000000000000'
+                AND created_at <= %1$L
+                AND (created_at < %1$L OR (created_at = %1$L AND id < %2$L))
+              ORDER BY created_at DESC, id DESC LIMIT 21$q$, :'deep_created_at', :'deep_id'),
+    :'all_index');
+
+-- Type filters ride on the same index; each page discards the other types
+-- it passes over, so allow for them
+SELECT pg_temp.check_plan(
+    'unread of one type, first page',
+    $q$SELECT * FROM inbox_bench
+       WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = false AND type = 'course'
+       ORDER BY created_at DESC, id DESC LIMIT 21$q$,
+    :'read_index', 'Index Scan', 1000);
+
+-- The count behind the badge and the counter reconciliation never reads the table
+SELECT pg_temp.check_plan(
+    'unread count',
+    $q$SELECT count(*) FROM inbox_bench
+       WHERE user_id = '00000000-0000-0000-0000-000000000000' AND read = false$q$,
+    :'read_index', 'Index Only Scan');
+
+DROP TABLE inbox_bench;
+
+-- RLS: as an authenticated user, auth.uid() should be an InitPlan evaluated
+-- once, with its result used as the index key, not a per-row filter
+BEGIN;
+SELECT set_config('request.jwt.claims',
+                  '{"sub": "00000000-0000-0000-0000-000000000000", "role": "authenticated"}', true);
+SET LOCAL ROLE authenticated;
+
+DO $$
+DECLARE
+  plan JSONB;
+BEGIN
+  EXECUTE 'EXPLAIN (FORMAT JSON) SELECT * FROM public.notifications '
+          'WHERE read = false ORDER BY created_at DESC, id DESC LIMIT 21'
+  INTO plan;
+  IF NOT jsonb_path_exists(plan, '$.** ? (@."Parent Relationship" == "InitPlan")') THEN
+    RAISE EXCEPTION 'RLS: auth.uid() is not evaluated once per statement: %', jsonb_pretty(plan);
+  END IF;
+  RAISE NOTICE 'RLS ok: auth.uid() evaluated once per statement';
+END;
+$$;
+
+ROLLBACK;
@@ -0,0 +1,20 @@
+-- Include created_at in new_notification payloads, so listeners can measure
+-- lag and know where to resume catching up after a reconnect
+CREATE OR REPLACE FUNCTION public.handle_new_notification()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM pg_notify(
+    'new_notification',
+    json_build_object(
+      'type', NEW.type,
+      'user_id', NEW.user_id,
+      'id', NEW.id,
+      'created_at', NEW.created_at
+    )::text
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Catch-up queries page through notifications by (created_at, id)
+CREATE INDEX IF NOT EXISTS notifications_created_at_id_idx ON public.notifications(created_at, id);
@@ -0,0 +1,150 @@
+-- Per-user unread notification counters, so the badge is a primary-key read
+-- instead of count(*) over the user's notifications
+CREATE TABLE IF NOT EXISTS public.notification_unread_counts (
+    user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+    unread INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.notification_unread_counts ENABLE ROW LEVEL SECURITY;
+
+-- Users can read their own counter; only the trigger and reconciliation
+-- functions below write to the table
+CREATE POLICY "Users can read their own unread count"
+    ON public.notification_unread_counts
+    FOR SELECT
+    USING ((SELECT auth.uid()) = user_id);
+
+-- Keep writers out until the triggers and the backfill are both in place
+LOCK TABLE public.notifications IN SHARE ROW EXCLUSIVE MODE;
+
+-- Apply a statement's net change per user, so marking many notifications
+-- read updates each counter once rather than once per row
+CREATE OR REPLACE FUNCTION public.apply_notification_unread_deltas()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO public.notification_unread_counts AS c (user_id, unread)
+    SELECT user_id, count(*) FROM new_rows WHERE NOT read GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE
+      SET unread = c.unread + EXCLUDED.unread, updated_at = NOW();
+
+  ELSIF TG_OP = 'DELETE' THEN
+    -- Only ever update here: when a user is deleted, the cascade may remove
+    -- their counter before their notifications, and it mustn't be recreated
+    UPDATE public.notification_unread_counts AS c
+      SET unread = GREATEST(c.unread - d.unread, 0), updated_at = NOW()
+      FROM (SELECT user_id, count(*) AS unread FROM old_rows WHERE NOT read GROUP BY user_id) d
+      WHERE c.user_id = d.user_id;
+
+  ELSE
+    -- Read flips and user_id changes: +1 for each row unread after the
+    -- statement, -1 for each row unread before it
+    WITH deltas AS (
+      SELECT user_id, sum(delta) AS delta FROM (
+        SELECT user_id, 1 AS delta FROM new_rows WHERE NOT read
+        UNION ALL
+        SELECT user_id, -1 AS delta FROM old_rows WHERE NOT read
+      ) changes
+      GROUP BY user_id
+    )
+    INSERT INTO public.notification_unread_counts AS c (user_id, unread)
+    SELECT user_id, delta FROM deltas WHERE delta > 0
+    ON CONFLICT (user_id) DO UPDATE
+      SET unread = c.unread + EXCLUDED.unread, updated_at = NOW();
+
+    WITH deltas AS (
+      SELECT user_id, sum(delta) AS delta FROM (
+        SELECT user_id, 1 AS delta FROM new_rows WHERE NOT read
+        UNION ALL
+        SELECT user_id, -1 AS delta FROM old_rows WHERE NOT read
+      ) changes
+      GROUP BY user_id
+    )
+    UPDATE public.notification_unread_counts AS c
+      SET unread = GREATEST(c.unread + d.delta, 0), updated_at = NOW()
+      FROM deltas d
+      WHERE c.user_id = d.user_id AND d.delta < 0;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Transition tables allow one event per trigger, so each event gets its own
+-- trigger on the shared function
+DROP TRIGGER IF EXISTS notification_unread_on_insert ON public.notifications;
+CREATE TRIGGER notification_unread_on_insert
+  AFTER INSERT ON public.notifications
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE PROCEDURE public.apply_notification_unread_deltas();
+
+DROP TRIGGER IF EXISTS notification_unread_on_update ON public.notifications;
+CREATE TRIGGER notification_unread_on_update
+  AFTER UPDATE ON public.notifications
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE PROCEDURE public.apply_notification_unread_deltas();
+
+DROP TRIGGER IF EXISTS notification_unread_on_delete ON public.notifications;
+CREATE TRIGGER notification_unread_on_delete
+  AFTER DELETE ON public.notifications
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE PROCEDURE public.apply_notification_unread_deltas();
+
+-- Repair drifted counters, at most max_users per call. Each drifted counter
+-- is locked before it is recounted, so a concurrent insert either commits
+-- before the recount sees it or applies its delta after the repair.
+-- Returns {"checked": <drifted users found>, "repaired": <counters changed>};
+-- callers repeat while checked = max_users.
+CREATE OR REPLACE FUNCTION public.reconcile_notification_unread_counts(max_users INTEGER DEFAULT 1000)
+RETURNS JSON AS $$
+DECLARE
+  drifted UUID;
+  actual INTEGER;
+  checked INTEGER := 0;
+  repaired INTEGER := 0;
+BEGIN
+  FOR drifted IN
+    SELECT COALESCE(a.user_id, c.user_id)
+    FROM (
+      SELECT user_id, count(*) AS unread
+      FROM public.notifications
+      WHERE NOT read
+      GROUP BY user_id
+    ) a
+    FULL JOIN public.notification_unread_counts c ON c.user_id = a.user_id
+    WHERE COALESCE(a.unread, 0) <> COALESCE(c.unread, 0)
+    LIMIT max_users
+  LOOP
+    checked := checked + 1;
+
+    INSERT INTO public.notification_unread_counts (user_id, unread)
+    VALUES (drifted, 0)
+    ON CONFLICT (user_id) DO NOTHING;
+    PERFORM 1 FROM public.notification_unread_counts WHERE user_id = drifted FOR UPDATE;
+
+    SELECT count(*) INTO actual
+    FROM public.notifications
+    WHERE user_id = drifted AND NOT read;
+
+    UPDATE public.notification_unread_counts
+      SET unread = actual, updated_at = NOW()
+      WHERE user_id = drifted AND unread <> actual;
+    IF FOUND THEN
+      repaired := repaired + 1;
+    END IF;
+  END LOOP;
+
+  RETURN json_build_object('checked', checked, 'repaired', repaired);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.reconcile_notification_unread_counts(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reconcile_notification_unread_counts(INTEGER) TO service_role;
+
+-- Backfill existing notifications
+INSERT INTO public.notification_unread_counts (user_id, unread)
+SELECT user_id, count(*)
+FROM public.notifications
+WHERE NOT read
+GROUP BY user_id
+ON CONFLICT (user_id) DO UPDATE SET unread = EXCLUDED.unread, updated_at = NOW();
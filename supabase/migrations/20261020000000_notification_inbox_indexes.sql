@@ -0,0 +1,37 @@
+-- Indexes for the keyset-paginated inbox (GET /api/notifications/), which
+-- pages newest first by (created_at, id) within one user's notifications
+
+-- Unread/read inbox pages and unread counts: equality on user_id and read,
+-- then already in page order
+CREATE INDEX IF NOT EXISTS notifications_user_read_created_at_idx
+    ON public.notifications(user_id, read, created_at DESC, id DESC);
+
+-- Unfiltered inbox pages. A scan of the index above would have to merge its
+-- read and unread halves with a sort, so this one serves pages across both
+CREATE INDEX IF NOT EXISTS notifications_user_created_at_idx
+    ON public.notifications(user_id, created_at DESC, id DESC);
+
+-- Both are covered by the indexes above: user_id is their leading column,
+-- and read on its own splits the table into two halves no query wants
+DROP INDEX IF EXISTS public.notifications_user_id_idx;
+DROP INDEX IF EXISTS public.notifications_read_idx;
+
+-- Wrap auth.uid() in a subquery so Postgres evaluates it once per statement
+-- (as an InitPlan) instead of once per row, and can use it as an index key
+DROP POLICY IF EXISTS "Users can read their own notifications" ON public.notifications;
+CREATE POLICY "Users can read their own notifications"
+    ON public.notifications
+    FOR SELECT
+    USING ((SELECT auth.uid()) = user_id);
+
+DROP POLICY IF EXISTS "Users can update their own notifications" ON public.notifications;
+CREATE POLICY "Users can update their own notifications"
+    ON public.notifications
+    FOR UPDATE
+    USING ((SELECT auth.uid()) = user_id);
+
+DROP POLICY IF EXISTS "Users can insert notifications" ON public.notifications;
+CREATE POLICY "Users can insert notifications"
+    ON public.notifications
+    FOR INSERT
+    WITH CHECK ((SELECT auth.uid()) = user_id);